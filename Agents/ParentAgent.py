@@ -5,7 +5,6 @@ import sys
 import torch
 import shutil
 import json
-from torchsummary import summary
 
 
 ''' The parent handler includes the nessesary function for all agent and will automatically save crusial 
@@ -41,6 +40,10 @@ class ParentAgent(metaclass=PostInitCaller):
     def end_of_episode_update(self):
         pass
 
+    def is_collecting_before_training(self):
+        ''' True while the agent only fills its memory and does not update yet '''
+        return False
+
     def __get_storage_information(self):
         module_location = self.__module__.split(".")
         general_model_folder = join(os.getcwd(), module_location[0], module_location[1], module_location[2], self.MODEL_FOLDER_NAME)
@@ -80,6 +83,7 @@ class ParentAgent(metaclass=PostInitCaller):
 
         if "policy" in agent_dict:
             if "observation_space" in agent_dict:
+                from torchsummary import summary
                 old_stdout = sys.stdout
                 new_stdout = io.StringIO()
                 sys.stdout = new_stdout
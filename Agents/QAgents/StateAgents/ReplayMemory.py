@@ -3,7 +3,6 @@ import random
 
 from collections import namedtuple, deque
 import numpy as np
-import pandas as pd
 import torch
 from os.path import join
 
@@ -33,6 +32,7 @@ class ReplayMemory(object):
         return headerNames + ['action', 'reward', 'done']
 
     def save_to_dataframe(self, location, save_name='DefaultName', previous_df=None):
+        import pandas as pd
         all_transitions = Transition(*zip(*self.memory))
         header_names = self.get_header_names(all_transitions.state_grid[0].shape[0], all_transitions.state_pos[0].shape[0])
         df = pd.DataFrame(
@@ -55,6 +55,7 @@ class ReplayMemory(object):
 
     @staticmethod
     def load_from_dataframe(file_data, file_data_as_dataframe=False, desiredSize=500000):
+        import pandas as pd
         if file_data_as_dataframe:
             df = file_data
         else:
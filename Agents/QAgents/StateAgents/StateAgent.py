@@ -2,7 +2,6 @@
 from functools import total_ordering
 import numpy as np
 from numpy import isin
-import pandas as pd
 from Agents.ParentAgent import ParentAgent
 
 import random
@@ -79,15 +78,21 @@ class StateAgent(ParentAgent):
         return state_matrix
 
     def __clean_up_states(self, ob, gpu_if_possible):
-        ob = torch.from_numpy(ob).float().view(self.agent_action_batch_size, 1, -1)
+        ob = torch.from_numpy(np.asarray(ob)).float().view(-1, 1, self.observation_space)
         if gpu_if_possible:
             ob = ob.to(self.train_device)
         else:
             ob = ob.cpu()
         return ob
 
-    def __get_any_action(self, actions, full_stack, epsilon):
-        full_obs = self.game_state[full_stack, :]
+    def __get_env_rows(self, env_ids):
+        ''' Rows of the per env histories, env_ids select the envs of a partial batch from ParallelEnvironments.step_wait '''
+        if env_ids is None:
+            return torch.arange(self.agent_action_batch_size)
+        return torch.as_tensor(np.asarray(env_ids), dtype=torch.long)
+
+    def __get_any_action(self, actions, game_state, full_stack, epsilon):
+        full_obs = game_state[full_stack, :]
         if full_obs.shape[0] != 0 and random.random() > epsilon:
             action_values = self.policy.forward(full_obs, True)
             if random.random() < self.arg_max_chance or self.eval_mode:
@@ -99,12 +104,12 @@ class StateAgent(ParentAgent):
         return actions.tolist()
 
     '''  '''
-    def __get_action_limited(self, actions, full_stack, epsilon, limit_actions):
+    def __get_action_limited(self, actions, game_state, full_stack, epsilon, limit_actions):
         if limit_actions.sum() != 0:
             new_actions = (torch.rand(limit_actions.sum()) * 2).type(torch.int)
             actions[limit_actions] = new_actions
         if random.random() < epsilon:
-            action_values = self.policy.forward(self.game_state, True)
+            action_values = self.policy.forward(game_state, True)
             if random.random() < self.arg_max_chance or self.eval_mode:
                 limited_action_values = action_values[limit_actions,:2]
                 actions[limit_actions] = torch.argmax(limited_action_values, dim=1).type(torch.int).cpu()
@@ -122,19 +127,21 @@ class StateAgent(ParentAgent):
         return actions.tolist()
 
 
-    def get_action(self, ob, epsilon, limit_actions=None):
+    def get_action(self, ob, epsilon, limit_actions=None, env_ids=None):
         ob = self.__clean_up_states(ob, True)
-        self.game_state = self.__update_state_matrix(self.game_state, ob)
-        full_stack = torch.sum(self.game_state, axis=-1)[:,0] != 0
+        rows = self.__get_env_rows(env_ids)
+        game_state = self.__update_state_matrix(self.game_state[rows], ob)
+        self.game_state[rows] = game_state
+        full_stack = torch.sum(game_state, axis=-1)[:,0] != 0
         with torch.no_grad():
-            actions = (torch.rand(self.agent_action_batch_size) * self.a_space).type(torch.int)
+            actions = (torch.rand(game_state.shape[0]) * self.a_space).type(torch.int)
             if limit_actions is not None:
                 if isinstance(limit_actions, bool):
                     limit_actions = [limit_actions]
                 limit_actions = torch.tensor(limit_actions).to(self.train_device)
-                return self.__get_action_limited(actions, full_stack, epsilon, limit_actions)
+                return self.__get_action_limited(actions, game_state, full_stack, epsilon, limit_actions)
             else:
-                return self.__get_any_action(actions, full_stack, epsilon)
+                return self.__get_any_action(actions, game_state, full_stack, epsilon)
 
     def step_update(self):
         if self.eval_mode:
@@ -190,7 +197,10 @@ class StateAgent(ParentAgent):
     def expects_one_action_value(self):
         return True
 
-    def store_transition(self, state, next_state, actions, rewards, dones):
+    def is_collecting_before_training(self):
+        return len(self.replay_memory) < self.memory_size_before_training
+
+    def store_transition(self, state, next_state, actions, rewards, dones, env_ids=None):
         if self.eval_mode:
             return
         if isinstance(actions, tuple):
@@ -198,22 +208,25 @@ class StateAgent(ParentAgent):
 
         state = self.__clean_up_states(state, False)
         next_state = self.__clean_up_states(next_state, False)
-        self.save_state = self.__update_state_matrix(self.save_state, state)
-        self.next_save_state = self.__update_state_matrix(self.next_save_state, next_state)
+        rows = self.__get_env_rows(env_ids)
+        save_state = self.__update_state_matrix(self.save_state[rows], state)
+        next_save_state = self.__update_state_matrix(self.next_save_state[rows], next_state)
+        self.save_state[rows] = save_state
+        self.next_save_state[rows] = next_save_state
         dones = torch.tensor(dones).cpu().byte()
         rewards = torch.tensor(rewards).cpu().type(torch.float32)
         actions = torch.tensor(actions).cpu()
 
         if self.agent_action_batch_size == 1:
-            if torch.sum(self.save_state, axis=-1)[:,0] != 0:
-                self.push_to_memory(self.save_state.view(-1), 
-                                    self.next_save_state.view(-1), 
+            if torch.sum(save_state, axis=-1)[:,0] != 0:
+                self.push_to_memory(save_state.view(-1), 
+                                    next_save_state.view(-1), 
                                     actions, rewards, dones)
 
         else:
-            full_stack = torch.sum(self.save_state, axis=-1)[:,0] != 0
-            state_to_store = self.save_state[full_stack].cpu()
-            next_state_to_store = self.next_save_state[full_stack].cpu()
+            full_stack = torch.sum(save_state, axis=-1)[:,0] != 0
+            state_to_store = save_state[full_stack].cpu()
+            next_state_to_store = next_save_state[full_stack].cpu()
             actions_to_store = actions[full_stack]
             rewards_to_store = rewards[full_stack]
             dones_to_store = dones[full_stack]
@@ -223,11 +236,12 @@ class StateAgent(ParentAgent):
                                     actions_to_store[i], rewards_to_store[i], dones_to_store[i])
 
             if torch.sum(dones) != 0:
+                done_rows = rows[dones==True]
                 # This should be on GPU
-                self.game_state[dones==True] = torch.zeros((self.history_length, self.observation_space)).to(self.train_device)
+                self.game_state[done_rows] = torch.zeros((self.history_length, self.observation_space)).to(self.train_device)
                 # These must be on CPU to not take up GPU memory
-                self.save_state[dones==True] = torch.zeros((self.history_length, self.observation_space)).cpu()
-                self.next_save_state[dones==True] = torch.zeros((self.history_length, self.observation_space)).cpu()
+                self.save_state[done_rows] = torch.zeros((self.history_length, self.observation_space)).cpu()
+                self.next_save_state[done_rows] = torch.zeros((self.history_length, self.observation_space)).cpu()
 
     def push_to_memory(self, *args):
         self.replay_memory.push(*args)
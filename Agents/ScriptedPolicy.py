@@ -0,0 +1,58 @@
+import numpy as np
+
+
+''' Hand written policy for filling the replay memory before the agent trains. It reads a batch of feature
+observations (see SpidermanEnv.get_observation) at once: without a web it shoots one forward and up at the closest
+ray that hits something in reach, with one web it releases once it has swung past the anchor while moving up, and
+with two webs it releases the older one. The release angle is drawn per decision so the transitions vary. '''
+
+class ScriptedPolicy:
+
+    # Observation columns
+    AMMO = 0
+    VELOCITY_X = 1
+    VELOCITY_Y = 2
+    SPEED = 3
+    FIRST_WEB = 6 # sin, cos and distance of the player seen from the anchor, -1 without a web
+    SECOND_WEB = 9
+    RAYS = 12
+    # Actions
+    WAIT = 0
+    RELEASE = 1
+    FIRST_SHOOT_ACTION = 2
+    SHOOT_ANGLES = (300, 330, 270) # Degrees in screen coordinates, 270 is straight up
+    MIN_WEB_LENGTH = 0.1 # Of the max web range
+    MAX_WEB_LENGTH = 0.8
+    RELEASE_ANGLES = (0, 30) # Degrees the player has swung past the anchor before releasing
+    SLOW_SPEED = 0.06 # Of the observed max speed, a player this slow on one web shoots a second one
+
+    def __init__(self, number_of_rays=24, rope_actions=12, max_ammo=10, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.ammo_per_web = 1 / max_ammo
+        self.shoot_actions = np.array([self.FIRST_SHOOT_ACTION + angle * rope_actions // 360 for angle in self.SHOOT_ANGLES])
+        self.shoot_rays = self.RAYS + np.array([angle * number_of_rays // 360 for angle in self.SHOOT_ANGLES])
+        self.observation_size = self.RAYS + number_of_rays
+
+    def get_actions(self, observations):
+        ''' observations (B, observation size) -> actions (B,) '''
+        observations = np.asarray(observations).reshape(-1, self.observation_size)
+        actions = np.full(observations.shape[0], self.WAIT, dtype=np.int64)
+        has_first_web = observations[:, self.FIRST_WEB + 2] != -1
+        has_second_web = observations[:, self.SECOND_WEB + 2] != -1
+
+        # Shoot at the first of the preferred angles whose ray ends at something in reach
+        distances = observations[:, self.shoot_rays]
+        in_reach = (distances > self.MIN_WEB_LENGTH) & (distances < self.MAX_WEB_LENGTH)
+        can_shoot = in_reach.any(axis=1) & (observations[:, self.AMMO] >= self.ammo_per_web)
+        # A player hanging still below its only web or past it shoots the next one, the older one is released after
+        stuck = has_first_web & ~has_second_web & (observations[:, self.SPEED] < self.SLOW_SPEED) & (observations[:, self.FIRST_WEB + 1] >= 0.5)
+        shoot = (~has_first_web | stuck) & can_shoot
+        actions[shoot] = self.shoot_actions[np.argmax(in_reach[shoot], axis=1)]
+
+        # (cos + 1) / 2 of the player seen from the anchor is above 0.5 + sin(angle) / 2 once it swung past by angle
+        release_angles = np.radians(self.rng.uniform(*self.RELEASE_ANGLES, size=observations.shape[0]))
+        past_anchor = observations[:, self.FIRST_WEB + 1] > 0.5 + np.sin(release_angles) / 2
+        moving_up = (observations[:, self.VELOCITY_Y] < 0) & (observations[:, self.VELOCITY_X] > 0)
+        actions[has_first_web & ~has_second_web & past_anchor & moving_up] = self.RELEASE
+        actions[has_second_web] = self.RELEASE
+        return actions
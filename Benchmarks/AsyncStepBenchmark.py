@@ -0,0 +1,100 @@
+import multiprocessing as mp
+import time
+
+import numpy as np
+from Environment.SpidermanEnv import SpidermanEnv
+from ParallelHandler.ParallelEnvironments import ParallelEnvironments
+
+
+''' Compares the synchronous ParallelEnvironments.step with step_async and step_wait returning the first
+batch_size envs that finished. Every batch costs LEARNER_TIME seconds of sleep standing in for the inference and
+update of the learner, which the workers that are not in the batch use to keep stepping. Reports the env steps per
+second and the time per batch the learner waits for the envs. First checks that synchronous steps after step_async
+of only some workers, which leaves the workers on different shared buffers, return the same results as the pipe
+transport. Run from the repository root:
+    python -m Benchmarks.AsyncStepBenchmark '''
+
+SEED = 123
+PROCESSES = 8
+ENVS_PER_PROCESS = 4
+BATCHES = 300
+LEARNER_TIME = 0.005
+ACTIONS = 14
+BATCH_SIZES = (32, 16, 8)
+MIXED_STEPS = 20
+
+
+def play_mixed(shared, actions):
+    ''' Steps the first half of the workers alone, then all envs together, and returns every result '''
+    ParallelEnvironments.USE_SHARED_MEMORY = shared
+    env = ParallelEnvironments(SpidermanEnv, PROCESSES, ENVS_PER_PROCESS, False)
+    n_envs = PROCESSES * ENVS_PER_PROCESS
+    results = [env.reset().copy()]
+    env_ids = np.arange(n_envs // 2)
+    env.step_async(actions[0][env_ids], env_ids)
+    obs, rewards, dones, _, _ = env.step_wait()
+    results.extend(np.copy(result) for result in (obs, rewards, dones))
+    for step in range(1, MIXED_STEPS):
+        obs, rewards, dones, _ = env.step(actions[step])
+        results.extend(np.copy(result) for result in (obs, rewards, dones))
+    env.close()
+    return results
+
+
+def check_mixed(rng):
+    actions = rng.integers(0, ACTIONS, (MIXED_STEPS, PROCESSES * ENVS_PER_PROCESS))
+    shared_results = play_mixed(True, actions)
+    pipe_results = play_mixed(False, actions)
+    ParallelEnvironments.USE_SHARED_MEMORY = True
+    return all(np.array_equal(shared, pipe) for shared, pipe in zip(shared_results, pipe_results))
+
+
+def measure_sync(rng):
+    env = ParallelEnvironments(SpidermanEnv, PROCESSES, ENVS_PER_PROCESS, False)
+    n_envs = PROCESSES * ENVS_PER_PROCESS
+    env.reset()
+    wait_time = 0
+    start_time = time.perf_counter()
+    for _ in range(BATCHES):
+        time.sleep(LEARNER_TIME)
+        wait_start = time.perf_counter()
+        env.step(rng.integers(0, ACTIONS, n_envs))
+        wait_time += time.perf_counter() - wait_start
+    elapsed = time.perf_counter() - start_time
+    env.close()
+    return n_envs * BATCHES / elapsed, wait_time / BATCHES
+
+
+def measure_async(rng, batch_size):
+    env = ParallelEnvironments(SpidermanEnv, PROCESSES, ENVS_PER_PROCESS, False)
+    obs = env.reset()
+    env_ids = np.arange(obs.shape[0])
+    steps, wait_time = 0, 0
+    start_time = time.perf_counter()
+    for _ in range(BATCHES):
+        time.sleep(LEARNER_TIME)
+        env.step_async(rng.integers(0, ACTIONS, len(env_ids)), env_ids)
+        wait_start = time.perf_counter()
+        obs, _, _, _, env_ids = env.step_wait(batch_size)
+        wait_time += time.perf_counter() - wait_start
+        steps += len(env_ids)
+    elapsed = time.perf_counter() - start_time
+    if len(env.stepping_workers) != 0:
+        env.step_wait()
+    env.close()
+    return steps / elapsed, wait_time / BATCHES
+
+
+def main():
+    mp.set_start_method('spawn')
+    print(f'Cores: {mp.cpu_count()}, {PROCESSES} x {ENVS_PER_PROCESS} envs, {LEARNER_TIME * 1000:.0f} ms learner time per batch')
+    print(f'Same results with the pipes after stepping half of the workers alone: {check_mixed(np.random.default_rng(SEED))}')
+    speed, wait_time = measure_sync(np.random.default_rng(SEED))
+    print(f'  step                  {speed:7.0f} env steps per second, {wait_time * 1000:6.2f} ms waiting per batch')
+    for batch_size in BATCH_SIZES:
+        speed, wait_time = measure_async(np.random.default_rng(SEED), batch_size)
+        print(f'  step_wait of {batch_size:2} envs   {speed:7.0f} env steps per second, {wait_time * 1000:6.2f} ms waiting per batch')
+
+
+if __name__ == '__main__':
+    main()
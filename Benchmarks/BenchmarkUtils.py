@@ -0,0 +1,80 @@
+import math
+import random
+import time
+
+import numpy as np
+
+
+''' Shared helpers for the benchmark and validation scripts '''
+
+class BenchmarkUtils:
+
+    @staticmethod
+    def get_action_sequences(games, steps, seed, wait_chance=0.6):
+        ''' Random actions where most steps do nothing, like an agent swinging on a web '''
+        rng = np.random.default_rng(seed)
+        actions = rng.integers(0, 14, size=(games, steps))
+        actions[rng.random((games, steps)) < wait_chance] = 0
+        return actions
+
+    @staticmethod
+    def play_episodes(env, actions, seed, record_positions=False):
+        ''' Plays one seeded episode per action row, returns lengths, scores, rewards, steps per second and positions '''
+        return BenchmarkUtils.__play(env, actions.shape[0], actions.shape[1], seed, lambda game, step, observation: actions[game, step], record_positions)
+
+    @staticmethod
+    def play_policy_episodes(env, policy_class, games, max_steps, seed, record_positions=False):
+        ''' Like play_episodes with the actions of a policy_class(seed=...) with get_actions, seeded per game so
+        envs that play the same observations get the same actions '''
+        policy = None
+        def get_action(game, step, observation):
+            nonlocal policy
+            if step == 0:
+                policy = policy_class(seed=seed + game)
+            return policy.get_actions(observation)[0]
+        return BenchmarkUtils.__play(env, games, max_steps, seed, get_action, record_positions)
+
+    @staticmethod
+    def __play(env, games, max_steps, seed, get_action, record_positions):
+        lengths, scores, rewards = [], [], []
+        positions = np.full((games, max_steps, 2), np.nan)
+        steps = 0
+        start_time = time.perf_counter()
+        for game in range(games):
+            random.seed(seed + game)
+            observation = env.reset()
+            total_reward = 0
+            for step in range(max_steps):
+                observation, reward, done, info = env.step(get_action(game, step, observation))
+                total_reward += reward
+                if record_positions:
+                    positions[game, step] = env.player.get_pos()
+                if done:
+                    break
+            steps += step + 1
+            lengths.append(step + 1)
+            scores.append(info['score'])
+            rewards.append(total_reward)
+        steps_per_second = steps / (time.perf_counter() - start_time)
+        return np.array(lengths), np.array(scores), np.array(rewards), steps_per_second, positions
+
+    @staticmethod
+    def ks_two_sample(a, b):
+        ''' Two sample Kolmogorov-Smirnov statistic with its asymptotic p-value '''
+        a, b = np.sort(a), np.sort(b)
+        values = np.concatenate([a, b])
+        cdf_a = np.searchsorted(a, values, side='right') / len(a)
+        cdf_b = np.searchsorted(b, values, side='right') / len(b)
+        statistic = np.max(np.abs(cdf_a - cdf_b))
+        effective_n = len(a) * len(b) / (len(a) + len(b))
+        lam = (math.sqrt(effective_n) + 0.12 + 0.11 / math.sqrt(effective_n)) * statistic
+        if lam < 0.2:
+            # The series does not converge for small values where the p-value is 1 anyway
+            return statistic, 1.0
+        p_value = 2 * sum((-1)**(k - 1) * math.exp(-2 * k**2 * lam**2) for k in range(1, 101))
+        return statistic, min(max(p_value, 0), 1)
+
+    @staticmethod
+    def print_distribution(name, label_a, a, label_b, b):
+        statistic, p_value = BenchmarkUtils.ks_two_sample(a, b)
+        print(f'{name:8} {label_a} {np.mean(a):9.2f} +- {np.std(a):8.2f} | {label_b} {np.mean(b):9.2f} +- {np.std(b):8.2f} | KS {statistic:.3f} p={p_value:.3f}')
@@ -0,0 +1,58 @@
+import multiprocessing as mp
+import time
+
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+from ParallelHandler.EnvExecutors import EnvExecutors
+from ParallelHandler.ParallelEnvironments import ParallelEnvironments
+from ParallelHandler.SerialEnvironment import SerialEnvironment
+
+
+''' Measures envs * steps per second of a SerialEnvironment of 4 envs with every EnvExecutors option, then of the
+32 env layouts of processes x envs per process x executor run through ParallelEnvironments, the first one being the
+Trainer default. Threads can only help when pymunk's C calls, which release the GIL, are a large part of a step,
+and all layouts are bound by the number of cores. Run from the repository root:
+    python -m Benchmarks.EnvExecutorBenchmark '''
+
+SEED = 123
+STEPS = 500
+WARMUP_STEPS = 20
+SERIAL_ENVS = 4
+LAYOUTS = (
+    (8, 4, EnvExecutors.Serial),
+    (8, 4, EnvExecutors.Thread),
+    (4, 8, EnvExecutors.Thread),
+    (32, 1, EnvExecutors.Serial),
+    (1, 32, EnvExecutors.Thread),
+    (1, 32, EnvExecutors.Process),
+)
+
+
+def measure(env, n_envs):
+    actions = BenchmarkUtils.get_action_sequences(n_envs, WARMUP_STEPS + STEPS, SEED).T
+    env.reset()
+    for step in range(WARMUP_STEPS):
+        env.step(actions[step])
+    start_time = time.perf_counter()
+    for step in range(WARMUP_STEPS, WARMUP_STEPS + STEPS):
+        env.step(actions[step])
+    return n_envs * STEPS / (time.perf_counter() - start_time)
+
+
+def main():
+    mp.set_start_method('spawn')
+    print(f'Cores: {mp.cpu_count()}')
+    print(f'SerialEnvironment of {SERIAL_ENVS} envs:')
+    for executor in EnvExecutors:
+        env = SerialEnvironment(SpidermanEnv, SERIAL_ENVS, executor=executor)
+        print(f'  {executor.value:8} {measure(env, SERIAL_ENVS):8.0f} env steps per second')
+        env.close()
+    print("32 envs, processes x envs per process:")
+    for processes, envs_per_process, executor in LAYOUTS:
+        env = ParallelEnvironments(SpidermanEnv, processes, envs_per_process, False, executor=executor)
+        print(f'  {processes:2} x {envs_per_process:2} {executor.value:8} {measure(env, processes * envs_per_process):8.0f} env steps per second')
+        env.close()
+
+
+if __name__ == '__main__':
+    main()
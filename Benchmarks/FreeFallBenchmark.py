@@ -0,0 +1,64 @@
+import pymunk
+import numpy as np
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+
+
+''' Plays the same seeded episodes with and without SpidermanEnv.USE_FREE_FALL and checks that the rewards and the
+player positions after every step are exactly the same. Reports the share of frames that did not need a pymunk step
+and the best steps per second of a few alternating runs, once for the usual action mix and once for a mix that releases its webs half of the
+time it acts, which leaves the player flying more often. Run from the repository root:
+    python -m Benchmarks.FreeFallBenchmark '''
+
+SEED = 123
+GAMES = 200
+MAX_STEPS = 2000
+RELEASE_CHANCES = (None, 0.5)
+REPEATS = 3
+
+
+class StepCounter:
+
+    def __init__(self):
+        self.calls = 0
+        self.step = pymunk.Space.step
+
+    def __enter__(self):
+        def counted(space, dt):
+            self.calls += 1
+            return self.step(space, dt)
+        pymunk.Space.step = counted
+        return self
+
+    def __exit__(self, *args):
+        pymunk.Space.step = self.step
+
+
+def play(free_fall, actions):
+    env = SpidermanEnv(max_steps=actions.shape[1])
+    env.USE_FREE_FALL = free_fall
+    with StepCounter() as counter:
+        lengths, _, rewards, speed, positions = BenchmarkUtils.play_episodes(env, actions, SEED, record_positions=True)
+    return lengths, rewards, positions, speed, counter.calls
+
+
+def main():
+    for release_chance in RELEASE_CHANCES:
+        actions = BenchmarkUtils.get_action_sequences(GAMES, MAX_STEPS, SEED)
+        if release_chance is not None:
+            release = np.random.default_rng(SEED).random(actions.shape) < release_chance
+            actions[(actions != 0) & release] = 1
+        speed, fall_speed = 0, 0
+        for _ in range(REPEATS):
+            lengths, rewards, positions, repeat_speed, physics_steps = play(False, actions)
+            fall_lengths, fall_rewards, fall_positions, repeat_fall_speed, fall_physics_steps = play(True, actions)
+            speed, fall_speed = max(speed, repeat_speed), max(fall_speed, repeat_fall_speed)
+        same = np.array_equal(lengths, fall_lengths) and np.array_equal(rewards, fall_rewards) and np.array_equal(positions, fall_positions, equal_nan=True)
+        print(f'{"Random actions" if release_chance is None else "Release chance %.1f" % release_chance}: same episodes {same}, mean length {lengths.mean():.1f} steps')
+        print(f'  frames without pymunk: {1 - fall_physics_steps / physics_steps:.1%}')
+        print(f'  steps per second without free fall: {speed:8.0f}')
+        print(f'  steps per second with free fall   : {fall_speed:8.0f}  ({fall_speed / speed:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import time
+
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+from Environment.Utils.RenderModes import RenderModes
+
+
+''' Steps a seeded action sequence without rendering, with a RenderModes.RgbArray frame taken after every step and
+with every frame recorded by a VideoWriter. Reports the steps per second of each, the shape of the frames and how many
+frames the writer encoded and dropped. Needs no display. Run from the repository root:
+    python -m Benchmarks.HeadlessRenderBenchmark '''
+
+SEED = 123
+STEPS = 300
+
+
+def play(render, path=None):
+    env = SpidermanEnv(render=render, render_mode=RenderModes.RgbArray)
+    if path is not None:
+        env.start_recording(path)
+    actions = BenchmarkUtils.get_action_sequences(1, STEPS, SEED)[0]
+    env.reset()
+    start_time = time.perf_counter()
+    frame = None
+    for action in actions:
+        _, _, done, _ = env.step(action)
+        if render and path is None:
+            frame = env.render()
+        if done:
+            env.reset()
+    speed = STEPS / (time.perf_counter() - start_time)
+    writer = env.video_writer
+    env.close()
+    return speed, frame, writer
+
+
+def main():
+    speed, _, _ = play(False)
+    print(f'no rendering          : {speed:8.0f} steps per second')
+    render_speed, frame, _ = play(True)
+    print(f'rgb_array every step  : {render_speed:8.0f} steps per second, frames of {frame.shape} {frame.dtype}')
+    with tempfile.TemporaryDirectory() as folder:
+        record_speed, _, writer = play(True, os.path.join(folder, "episode.mp4"))
+        print(f'every frame recorded  : {record_speed:8.0f} steps per second, {writer.written_frames} frames written, {writer.dropped_frames} dropped')
+        print(f'  written to {os.listdir(folder)}')
+
+
+if __name__ == '__main__':
+    main()
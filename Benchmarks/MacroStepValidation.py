@@ -0,0 +1,37 @@
+from Agents.ScriptedPolicy import ScriptedPolicy
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+
+
+''' Plays the same seeded episodes with and without SpidermanEnv.USE_MACRO_STEP, compares the episode outcome
+distributions (KS test) and the steps per second. The actions come from ScriptedPolicy, whose episodes last long
+enough for the differences of the skipped frames to add up, random actions lose within a few dozen steps. Run from
+the repository root:
+    python -m Benchmarks.MacroStepValidation '''
+
+SEED = 123
+GAMES = 300
+MAX_STEPS = 2000
+
+
+def play(macro_step):
+    env = SpidermanEnv(max_steps=MAX_STEPS)
+    env.USE_MACRO_STEP = macro_step
+    return BenchmarkUtils.play_policy_episodes(env, ScriptedPolicy, GAMES, MAX_STEPS, SEED)
+
+
+def main():
+    frame_lengths, frame_scores, frame_rewards, frame_speed, _ = play(False)
+    macro_lengths, macro_scores, macro_rewards, macro_speed, _ = play(True)
+
+    print("Episode outcomes, a high p-value means the distributions can not be told apart:")
+    BenchmarkUtils.print_distribution("length", "frames", frame_lengths, "macro", macro_lengths)
+    BenchmarkUtils.print_distribution("score", "frames", frame_scores, "macro", macro_scores)
+    BenchmarkUtils.print_distribution("reward", "frames", frame_rewards, "macro", macro_rewards)
+    print("Steps per second:")
+    print(f'  every frame : {frame_speed:8.0f}')
+    print(f'  macro step  : {macro_speed:8.0f}  ({macro_speed / frame_speed:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pymunk
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+from ParallelHandler.SerialEnvironment import SerialEnvironment
+
+
+''' Soak test for the memory of a worker: steps a SerialEnvironment of ENVS envs for STEPS steps (2 million env
+steps, about an hour here) like a ParallelEnvironments worker does, building the next worlds after every step, with
+tracemalloc running. Every SAMPLE_STEPS steps it collects garbage and samples the RSS, the traced Python memory per
+env subsystem (by the file that allocated it) and the number of live pymunk objects. After the first WARMUP_SHARE of
+the run the growth per finished episode is fitted, and the test fails with exit code 1 when the RSS or the traced
+memory grows faster than MAX_GROWTH_PER_EPISODE bytes. Set DEBUG_POS to soak the deep copied player history too. Run
+from the repository root:
+    python -m Benchmarks.MemorySoakTest '''
+
+SEED = 123
+ENVS = 4
+STEPS = 500000
+SAMPLE_STEPS = 10000
+WARMUP_SHARE = 0.2
+MAX_GROWTH_PER_EPISODE = 1024
+DEBUG_POS = False
+# Env subsystems and the files whose allocations are counted for them, the rest is "other"
+SUBSYSTEMS = {
+    "space" : (os.path.dirname(pymunk.__file__), "SharedSpace.py", "PhysicsPool.py"),
+    "generator" : ("ObstacleGenerator.py", "ObstacleStore.py", "LevelTape.py"),
+    "player" : ("PlayerController.py", "RayQueryService.py", "RaySensor.py", "Entity.py", "Web.py"),
+    "camera" : ("Camera.py",),
+    "env" : ("SpidermanEnv.py", "SerialEnvironment.py"),
+}
+PYMUNK_TYPES = (pymunk.Space, pymunk.Body, pymunk.Shape, pymunk.Constraint)
+
+
+def get_rss():
+    ''' Resident set size in bytes, the peak where /proc is missing '''
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # resource is Unix only
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_subsystem(filename):
+    for subsystem, paths in SUBSYSTEMS.items():
+        if any(filename.startswith(path) if os.path.isabs(path) else filename.endswith(path) for path in paths):
+            return subsystem
+    return "other"
+
+
+def sample():
+    gc.collect()
+    traced = dict.fromkeys(list(SUBSYSTEMS) + ["other"], 0)
+    for stat in tracemalloc.take_snapshot().statistics("filename"):
+        traced[get_subsystem(stat.traceback[0].filename)] += stat.size
+    pymunk_objects = sum(isinstance(obj, PYMUNK_TYPES) for obj in gc.get_objects())
+    return {"rss" : get_rss(), "traced" : sum(traced.values()), **traced, "pymunk objects" : pymunk_objects}
+
+
+def print_sample(steps, episodes, values):
+    subsystems = "  ".join(f'{name} {values[name] / 1024:7.0f}' for name in list(SUBSYSTEMS) + ["other"])
+    print(f'{steps:9} steps {episodes:7} episodes  rss {values["rss"] / 2**20:7.1f} MB  traced {values["traced"] / 2**20:6.1f} MB  KB: {subsystems}  pymunk objects {values["pymunk objects"]}', flush=True)
+
+
+def main():
+    tracemalloc.start()
+    env = SerialEnvironment(SpidermanEnv, ENVS)
+    for e in env.envs:
+        e.debug_pos = DEBUG_POS
+    env.reset()
+    env.prepare_resets()
+    actions = BenchmarkUtils.get_action_sequences(ENVS, SAMPLE_STEPS, SEED).T
+    episodes, samples = 0, []
+    start_time = time.perf_counter()
+    for step in range(1, STEPS + 1):
+        _, _, dones, _ = env.step(actions[step % SAMPLE_STEPS])
+        env.prepare_resets()
+        episodes += np.count_nonzero(dones)
+        if step % SAMPLE_STEPS == 0:
+            samples.append((episodes, sample()))
+            print_sample(step, episodes, samples[-1][1])
+    print(f'{STEPS * ENVS / (time.perf_counter() - start_time):.0f} env steps per second with tracemalloc')
+
+    fitted = samples[int(len(samples) * WARMUP_SHARE):]
+    if len(fitted) < 2:
+        raise Exception("too few samples after the warmup, run more steps")
+    episode_counts = np.array([episodes for episodes, _ in fitted])
+    print(f'Growth per episode over the last {len(fitted)} samples:')
+    failed = []
+    for name in fitted[0][1]:
+        growth = np.polyfit(episode_counts, [values[name] for _, values in fitted], 1)[0]
+        print(f'  {name:15} {growth:10.1f} {"objects" if name == "pymunk objects" else "bytes"}')
+        if name in ("rss", "traced") and growth > MAX_GROWTH_PER_EPISODE:
+            failed.append(name)
+    if failed:
+        print(f'FAILED: {" and ".join(failed)} grow more than {MAX_GROWTH_PER_EPISODE} bytes per episode')
+        sys.exit(1)
+    print("PASSED")
+
+
+if __name__ == '__main__':
+    main()
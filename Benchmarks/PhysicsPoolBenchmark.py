@@ -0,0 +1,57 @@
+import random
+import time
+
+import numpy as np
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+
+
+''' Plays the same seeded episodes with and without SpidermanEnv.USE_PHYSICS_POOL, reports the pymunk bodies, shapes
+and joints allocated and reused per episode, the steps per second and whether both runs played the same games.
+Run from the repository root:
+    python -m Benchmarks.PhysicsPoolBenchmark '''
+
+SEED = 123
+GAMES = 300
+MAX_STEPS = 2000
+
+
+def play(use_pool, actions):
+    env = SpidermanEnv(max_steps=actions.shape[1])
+    env.USE_PHYSICS_POOL = use_pool
+    lengths, allocations, allocations_avoided = [], [], []
+    last_counters = {"allocations" : 0, "allocations_avoided" : 0}
+    steps = 0
+    start_time = time.perf_counter()
+    for game in range(actions.shape[0]):
+        random.seed(SEED + game)
+        env.reset()
+        for step in range(actions.shape[1]):
+            _, _, done, _ = env.step(actions[game, step])
+            if done:
+                break
+        steps += step + 1
+        lengths.append(step + 1)
+        if use_pool:
+            # The pool is kept across resets, its counters add up over the episodes
+            counters = env.physics_pool.get_counters()
+            allocations.append(counters['allocations'] - last_counters['allocations'])
+            allocations_avoided.append(counters['allocations_avoided'] - last_counters['allocations_avoided'])
+            last_counters = counters
+    return np.array(lengths), np.array(allocations), np.array(allocations_avoided), steps / (time.perf_counter() - start_time)
+
+
+def main():
+    actions = BenchmarkUtils.get_action_sequences(GAMES, MAX_STEPS, SEED)
+    lengths, _, _, speed = play(False, actions)
+    pool_lengths, allocations, allocations_avoided, pool_speed = play(True, actions)
+    print(f'Same episodes with the pool: {np.array_equal(lengths, pool_lengths)}, mean length {lengths.mean():.1f} steps')
+    print(f'Per episode with the pool: {allocations.mean():.1f} allocations, {allocations_avoided.mean():.1f} avoided')
+    print(f'Per 1000 steps: {allocations.sum() / pool_lengths.sum() * 1000:.1f} allocations, {allocations_avoided.sum() / pool_lengths.sum() * 1000:.1f} avoided')
+    print("Steps per second:")
+    print(f'  no pool   : {speed:8.0f}')
+    print(f'  pool      : {pool_speed:8.0f}  ({pool_speed / speed:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
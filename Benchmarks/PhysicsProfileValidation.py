@@ -0,0 +1,41 @@
+import numpy as np
+from Agents.ScriptedPolicy import ScriptedPolicy
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+
+
+''' Plays the same seeded episodes with ScriptedPolicy under every SpidermanEnv.PHYSICS_PROFILES entry, random
+actions lose within a few dozen steps. Reports the steps per second, how far the player ends up from where it is
+with the default profile after a number of actions (median and 90th percentile over the games still running in both)
+and the episode outcome distributions against the default (KS test). Run from the repository root:
+    python -m Benchmarks.PhysicsProfileValidation '''
+
+SEED = 123
+GAMES = 300
+MAX_STEPS = 2000
+DIVERGENCE_STEPS = (1, 5, 20, 50, 100)
+
+
+def play(profile):
+    env = SpidermanEnv(max_steps=MAX_STEPS, physics_profile=profile)
+    return BenchmarkUtils.play_policy_episodes(env, ScriptedPolicy, GAMES, MAX_STEPS, SEED, record_positions=True)
+
+
+def main():
+    results = {profile : play(profile) for profile in SpidermanEnv.PHYSICS_PROFILES}
+    base_lengths, base_scores, base_rewards, base_speed, base_positions = results["default"]
+    for profile, (lengths, scores, rewards, speed, positions) in results.items():
+        settings = SpidermanEnv.PHYSICS_PROFILES[profile]
+        print(f'{profile}: {settings["frames"]} frames of {settings["frame_time"]:.4f} s, {settings["iterations"]} iterations, {speed:.0f} steps per second ({speed / base_speed:.2f}x)')
+        if profile == "default":
+            continue
+        distances = np.linalg.norm(positions - base_positions, axis=2)
+        divergence = ', '.join(f'{step}: {np.nanmedian(distances[:, step - 1]):.1f} / {np.nanpercentile(distances[:, step - 1], 90):.1f}' for step in DIVERGENCE_STEPS)
+        print(f'  distance to the default path in pixels after n actions, median / 90th percentile  {divergence}')
+        BenchmarkUtils.print_distribution("length", "default", base_lengths, profile, lengths)
+        BenchmarkUtils.print_distribution("score", "default", base_scores, profile, scores)
+        BenchmarkUtils.print_distribution("reward", "default", base_rewards, profile, rewards)
+
+
+if __name__ == '__main__':
+    main()
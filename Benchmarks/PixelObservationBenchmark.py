@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+from Environment.Utils.ObservationModes import ObservationModes
+from Environment.Utils.RenderModes import RenderModes
+
+
+''' Plays the same seeded actions with ObservationModes.Features and with ObservationModes.Pixels at a few
+resolutions and reports the steps per second and the time of one observation. For comparison the same frame is also
+drawn by the offscreen pygame renderer and scaled down to the pixel resolution. Run from the repository root:
+    python -m Benchmarks.PixelObservationBenchmark '''
+
+SEED = 123
+GAMES = 50
+MAX_STEPS = 1000
+OBSERVATIONS = 2000
+RESOLUTIONS = ((64, 36), (96, 54), (160, 90))
+
+
+def measure_observation(env, observe):
+    start_time = time.perf_counter()
+    for _ in range(OBSERVATIONS):
+        observe()
+    return (time.perf_counter() - start_time) / OBSERVATIONS * 1e6
+
+
+def measure(observation_mode, actions):
+    env = SpidermanEnv(max_steps=actions.shape[1], observation_mode=observation_mode)
+    _, _, _, speed, _ = BenchmarkUtils.play_episodes(env, actions, SEED)
+    return speed, measure_observation(env, env.get_observation)
+
+
+def measure_pygame(resolution):
+    import pygame
+    env = SpidermanEnv(render=True, render_mode=RenderModes.RgbArray)
+    env.reset()
+    def observe():
+        env.render()
+        small = pygame.transform.smoothscale(env.renderer.screen, resolution)
+        return np.frombuffer(pygame.image.tobytes(small, "RGB"), dtype=np.uint8)
+    return measure_observation(env, observe)
+
+
+def main():
+    actions = BenchmarkUtils.get_action_sequences(GAMES, MAX_STEPS, SEED)
+    speed, observation_time = measure(ObservationModes.Features, actions)
+    print(f'features          : {speed:6.0f} steps per second, {observation_time:7.1f} us per observation')
+    default_resolution = SpidermanEnv.PIXEL_RESOLUTION
+    for resolution in RESOLUTIONS:
+        SpidermanEnv.PIXEL_RESOLUTION = resolution
+        speed, observation_time = measure(ObservationModes.Pixels, actions)
+        size = SpidermanEnv.PIXEL_STACK * resolution[0] * resolution[1]
+        print(f'pixels {resolution[0]:3}x{resolution[1]:3}    : {speed:6.0f} steps per second, {observation_time:7.1f} us per observation of {size} bytes')
+    SpidermanEnv.PIXEL_RESOLUTION = default_resolution
+    print(f'pygame and scaling: {measure_pygame(default_resolution):7.1f} us per {default_resolution[0]}x{default_resolution[1]} frame')
+
+
+if __name__ == '__main__':
+    main()
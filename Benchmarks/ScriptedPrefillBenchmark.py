@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+from Agents.ScriptedPolicy import ScriptedPolicy
+from Environment.SpidermanEnv import SpidermanEnv
+from ParallelHandler.VectorEnvironment import VectorEnvironment
+
+
+''' Fills a replay memory the way StateAgent does before its first update, once with the random actions it takes
+until then, once with ScriptedPolicy and once with half of the actions from each. A transition is only stored once an
+env has HISTORY_LENGTH observations of its episode, so short episodes fill the memory slowly. Reports the env steps
+per second, the time of one policy call for the batch, the finished episodes and the time until MEMORY_SIZE
+transitions are stored. Needs no torch. Run from the repository root:
+    python -m Benchmarks.ScriptedPrefillBenchmark '''
+
+SEED = 123
+ENVS = 32
+ACTIONS = 14
+HISTORY_LENGTH = 30 # StateAgent.history_length
+MEMORY_SIZE = 80000 # StateAgent.memory_size_before_training
+SCRIPTED_RATIOS = (0, 0.5, 1)
+
+
+def prefill(scripted_ratio):
+    rng = np.random.default_rng(SEED)
+    policy = ScriptedPolicy(seed=SEED)
+    env = VectorEnvironment(SpidermanEnv, ENVS)
+    obs = env.reset(SEED)
+    episode_steps = np.zeros(ENVS, dtype=np.int64)
+    lengths, scores = [], []
+    stored, steps, policy_time = 0, 0, 0
+    start_time = time.perf_counter()
+    while stored < MEMORY_SIZE:
+        policy_start = time.perf_counter()
+        actions = rng.integers(0, ACTIONS, ENVS)
+        use_scripted = rng.random(ENVS) < scripted_ratio
+        actions[use_scripted] = policy.get_actions(obs[use_scripted])
+        policy_time += time.perf_counter() - policy_start
+        obs, _, dones, infos = env.step(actions)
+        episode_steps += 1
+        stored += np.count_nonzero(episode_steps >= HISTORY_LENGTH)
+        lengths.extend(episode_steps[dones])
+        scores.extend(infos['total_score'])
+        episode_steps[dones] = 0
+        steps += 1
+    elapsed = time.perf_counter() - start_time
+    env.close()
+    return elapsed, steps, policy_time / steps, np.array(lengths), np.array(scores)
+
+
+def main():
+    print(f'{ENVS} envs, first update after {MEMORY_SIZE} stored transitions')
+    for scripted_ratio in SCRIPTED_RATIOS:
+        elapsed, steps, policy_time, lengths, scores = prefill(scripted_ratio)
+        print(f'scripted share {scripted_ratio:.1f}: first update after {elapsed:6.1f} s, {steps * ENVS / elapsed:6.0f} env steps per second, {policy_time * 1e6:6.1f} us per policy call')
+        print(f'  {len(lengths)} episodes, mean length {lengths.mean():.1f}, mean score {scores.mean():.2f}, {MEMORY_SIZE / (steps * ENVS):.0%} of the steps stored')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import multiprocessing as mp
+import pickle
+import time
+from functools import partial
+
+import numpy as np
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+from Environment.Utils.ObservationModes import ObservationModes
+from ParallelHandler.ParallelEnvironments import ParallelEnvironments
+
+
+''' Measures envs * steps per second of ParallelEnvironments with the step results pickled through the pipes and with
+ParallelEnvironments.USE_SHARED_MEMORY, for feature and pixel observations. The bytes a worker sends per step are the
+pickled size of its step results or of its buffer index. Run from the repository root:
+    python -m Benchmarks.SharedMemoryTransportBenchmark '''
+
+SEED = 123
+STEPS = 500
+WARMUP_STEPS = 20
+LAYOUTS = ((8, 4), (32, 1))
+OBSERVATION_MODES = (ObservationModes.Features, ObservationModes.Pixels)
+
+
+def measure(env, n_envs):
+    actions = BenchmarkUtils.get_action_sequences(n_envs, WARMUP_STEPS + STEPS, SEED).T
+    env.reset()
+    for step in range(WARMUP_STEPS):
+        env.step(actions[step])
+    start_time = time.perf_counter()
+    for step in range(WARMUP_STEPS, WARMUP_STEPS + STEPS):
+        obs, rewards, dones, _ = env.step(actions[step])
+    return n_envs * STEPS / (time.perf_counter() - start_time), (obs, rewards, dones)
+
+
+def get_sent_bytes(shared, results, envs_per_process):
+    if shared:
+        return len(pickle.dumps(0))
+    obs, rewards, dones = (np.array(result[:envs_per_process]) for result in results)
+    infos = {'totalReward' : [], 'total_score' : []}
+    return len(pickle.dumps((obs, rewards, dones, infos)))
+
+
+def main():
+    mp.set_start_method('spawn')
+    print(f'Cores: {mp.cpu_count()}')
+    for observation_mode in OBSERVATION_MODES:
+        environment_class = partial(SpidermanEnv, observation_mode=observation_mode)
+        print(f'{observation_mode.name}, processes x envs per process:')
+        for processes, envs_per_process in LAYOUTS:
+            for shared in (False, True):
+                ParallelEnvironments.USE_SHARED_MEMORY = shared
+                env = ParallelEnvironments(environment_class, processes, envs_per_process, False)
+                speed, results = measure(env, processes * envs_per_process)
+                transport = "shared memory" if shared else "pipe"
+                print(f'  {processes:2} x {envs_per_process:2} {transport:13} {speed:8.0f} env steps per second, {get_sent_bytes(shared, results, envs_per_process):7} bytes sent per worker and step')
+                env.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import random
+import time
+
+import numpy as np
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+from ParallelHandler.SerialEnvironment import SerialEnvironment
+
+
+''' Steps a SerialEnvironment of K envs with a pymunk space per env and with all envs in one shared space, with the
+same seeded actions. Reports envs * steps per second for both ray backends and compares the scores and lengths of
+the finished episodes. Run from the repository root:
+    python -m Benchmarks.SharedSpaceBenchmark '''
+
+SEED = 123
+STEPS = 1000
+ENV_COUNTS = (1, 4, 8, 16)
+OUTCOME_ENVS = 8
+OUTCOME_STEPS = 5000
+
+
+def play(n_envs, shared_space, steps):
+    random.seed(SEED)
+    env = SerialEnvironment(SpidermanEnv, n_envs, shared_space)
+    env.reset()
+    actions = BenchmarkUtils.get_action_sequences(n_envs, steps, SEED).T
+    scores, lengths, episode_steps = [], [], np.zeros(n_envs, dtype=np.int64)
+    start_time = time.perf_counter()
+    for step in range(steps):
+        _, _, dones, infos = env.step(actions[step])
+        episode_steps += 1
+        scores.extend(infos['total_score'])
+        lengths.extend(episode_steps[dones])
+        episode_steps[dones] = 0
+    return n_envs * steps / (time.perf_counter() - start_time), np.array(scores), np.array(lengths)
+
+
+def main():
+    print(f'{"rays":8}{"envs":>6}{"own spaces":>14}{"shared space":>14}')
+    for vectorized_rays in (True, False):
+        SpidermanEnv.USE_VECTORIZED_RAYS = vectorized_rays
+        for n_envs in ENV_COUNTS:
+            speed, _, _ = play(n_envs, False, STEPS)
+            shared_speed, _, _ = play(n_envs, True, STEPS)
+            print(f'{"numpy" if vectorized_rays else "pymunk":8}{n_envs:6}{speed:14.0f}{shared_speed:14.0f}  ({shared_speed / speed:.2f}x)')
+    SpidermanEnv.USE_VECTORIZED_RAYS = True
+    _, scores, lengths = play(OUTCOME_ENVS, False, OUTCOME_STEPS)
+    _, shared_scores, shared_lengths = play(OUTCOME_ENVS, True, OUTCOME_STEPS)
+    print("Finished episodes, a high p-value means the distributions can not be told apart:")
+    BenchmarkUtils.print_distribution("length", "own", lengths, "shared", shared_lengths)
+    BenchmarkUtils.print_distribution("score", "own", scores, "shared", shared_scores)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+
+''' Startup cost of the entry points, every measurement in a fresh interpreter started from the repository root.
+Reports the import time of each module in IMPORTS and the heavy dependencies it loaded, the time from the imports of
+a main module to the first reset of PROCESSES spawned workers, which re-import the main module, for a main module that
+imports each of WORKER_ENTRIES, and the time until the first step of a parallel Trainer as Game.start_game creates
+it, which needs torch. Run from the repository root:
+    python -m Benchmarks.StartupTimeBenchmark '''
+
+REPEATS = 3
+PROCESSES = 8
+ENVS_PER_PROCESS = 4
+IMPORTS = ("Environment.SpidermanEnv", "ParallelHandler.ParallelEnvironments", "Utils.Trainer", "Game")
+WORKER_ENTRIES = ("ParallelHandler.ParallelEnvironments", "Game")
+HEAVY_MODULES = ("pygame", "torch", "torchsummary", "pandas", "gym")
+
+IMPORT_SCRIPT = '''
+import sys, time
+start_time = time.perf_counter()
+sys.path.insert(0, {root!r})
+import {module}
+print(time.perf_counter() - start_time)
+print(" ".join(name for name in {heavy_modules} if name in sys.modules))
+'''
+WORKER_SCRIPT = '''
+import sys, time
+start_time = time.perf_counter()
+sys.path.insert(0, {root!r})
+import {entry}
+from Environment.SpidermanEnv import SpidermanEnv
+from ParallelHandler.ParallelEnvironments import ParallelEnvironments
+if __name__ == '__main__':
+    env = ParallelEnvironments(SpidermanEnv, {processes}, {envs_per_process})
+    env.reset()
+    print(time.perf_counter() - start_time)
+    env.close()
+'''
+TRAINER_SCRIPT = '''
+import sys, time
+start_time = time.perf_counter()
+sys.path.insert(0, {root!r})
+from Game import Agents, Trainer
+if __name__ == '__main__':
+    trainer = Trainer(Agents.StateAgent, True, 1, False)
+    obs = trainer.reset()
+    trainer.step(trainer.get_actions(obs, 0))
+    print(time.perf_counter() - start_time)
+    trainer.env.close()
+'''
+
+
+def run(script):
+    ''' Output lines of script run as a file, or None when it failed '''
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as file:
+        file.write(script)
+    try:
+        result = subprocess.run([sys.executable, file.name], capture_output=True, text=True, cwd=os.getcwd())
+    finally:
+        os.remove(file.name)
+    if result.returncode != 0:
+        print(f'  failed: {result.stderr.strip().splitlines()[-1]}')
+        return None
+    return result.stdout.strip().splitlines()
+
+
+def measure(script):
+    times, last_lines = [], None
+    for _ in range(REPEATS):
+        lines = run(script)
+        if lines is None:
+            return None, None
+        times.append(float(lines[0]))
+        last_lines = lines
+    return np.median(times), last_lines
+
+
+def main():
+    root = os.getcwd()
+    print(f'Median of {REPEATS} fresh interpreters')
+    print('Imports:')
+    for module in IMPORTS:
+        import_time, lines = measure(IMPORT_SCRIPT.format(root=root, module=module, heavy_modules=HEAVY_MODULES))
+        if import_time is not None:
+            heavy = lines[1] if len(lines) > 1 else "none"
+            print(f'  {module:38} {import_time * 1000:7.0f} ms, loads {heavy}')
+    print(f'Workers, {PROCESSES} x {ENVS_PER_PROCESS} envs:')
+    for entry in WORKER_ENTRIES:
+        worker_time, _ = measure(WORKER_SCRIPT.format(root=root, entry=entry, processes=PROCESSES, envs_per_process=ENVS_PER_PROCESS))
+        if worker_time is not None:
+            print(f'  main importing {entry:38} {worker_time * 1000:7.0f} ms to the first reset')
+    print('Trainer:')
+    if importlib.util.find_spec("torch") is None:
+        print('  skipped, torch is not installed')
+        return
+    trainer_time, _ = measure(TRAINER_SCRIPT.format(root=root))
+    if trainer_time is not None:
+        print(f'  main importing {"Game":38} {trainer_time * 1000:7.0f} ms to the first step')
+
+
+if __name__ == '__main__':
+    main()
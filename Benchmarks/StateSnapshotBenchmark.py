@@ -0,0 +1,105 @@
+import pickle
+import random
+import time
+
+import numpy as np
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from ParallelHandler.SerialEnvironment import SerialEnvironment
+from Environment.SpidermanEnv import SpidermanEnv
+
+
+''' Takes a snapshot with SpidermanEnv.get_state, checks that replaying the same actions from it gives the same
+trajectory every time, that clones restored from it generate the same obstacles and that restoring it into some envs
+of a SerialEnvironment leaves the observations of the others as they are. Measures restores per second and scores each
+of the 14 actions with short rollouts that fan out from the snapshot over a SerialEnvironment. Run from the
+repository root:
+    python -m Benchmarks.StateSnapshotBenchmark '''
+
+SEED = 123
+WARMUP_STEPS = 20
+ROLLOUT_STEPS = 30
+RESTORES = 3000
+CLONES = 3
+CLONE_SCROLL = 3000 # Pixels the clones scroll their obstacle generators, several new obstacles each
+
+
+def rollout(env, state, actions):
+    env.set_state(state)
+    trajectory = []
+    for action in actions:
+        _, reward, done, _ = env.step(action)
+        trajectory.append((tuple(env.player.get_pos()), reward))
+        if done:
+            break
+    return trajectory
+
+
+def generate_in_clones(state):
+    ''' Obstacle rectangles of CLONES envs restored from state after scrolling their generators in turns '''
+    clones = SerialEnvironment(SpidermanEnv, CLONES)
+    clones.set_states(state)
+    left_bar = clones.envs[0].camera.offset.x
+    for x in range(int(left_bar), int(left_bar) + CLONE_SCROLL, 50):
+        for clone in clones.envs:
+            clone.obstaclegenerator.step(x)
+    rectangles = [clone.obstaclegenerator.get_rectangles() for clone in clones.envs]
+    clones.close()
+    return rectangles
+
+
+def restore_partially(state, actions):
+    ''' Whether set_states into the first of CLONES stepped envs returns the snapshot's observation for it and the
+    current observation for the others '''
+    envs = SerialEnvironment(SpidermanEnv, CLONES)
+    envs.reset()
+    for step_actions in actions:
+        obs, _, _, _ = envs.step(step_actions)
+    current = obs.copy()
+    restored = envs.set_states([state], env_ids=[0])
+    expected = SpidermanEnv().set_state(state)
+    envs.close()
+    return np.array_equal(restored[0], expected[0]) and np.array_equal(restored[1:], current[1:])
+
+
+def main():
+    random.seed(SEED)
+    env = SpidermanEnv()
+    env.reset()
+    actions = BenchmarkUtils.get_action_sequences(1, WARMUP_STEPS + ROLLOUT_STEPS, SEED)[0]
+    for action in actions[:WARMUP_STEPS]:
+        env.step(action)
+    state = env.get_state()
+    print(f'Snapshot size: {len(pickle.dumps(state))} bytes pickled')
+
+    first = rollout(env, state, actions[WARMUP_STEPS:])
+    repeated = rollout(env, state, actions[WARMUP_STEPS:])
+    fresh = rollout(SpidermanEnv(), pickle.loads(pickle.dumps(state)), actions[WARMUP_STEPS:])
+    print(f'Same trajectory after restoring again: {first == repeated}, in a new env from the pickled state: {first == fresh}')
+
+    rectangles = generate_in_clones(state)
+    print(f'{CLONES} clones generate the same obstacles: {all(np.array_equal(rectangles[0], other) for other in rectangles[1:])}')
+    clone_actions = BenchmarkUtils.get_action_sequences(CLONES, WARMUP_STEPS + ROLLOUT_STEPS, SEED).T
+    print(f'Restoring one of {CLONES} envs keeps the observations of the others: {restore_partially(state, clone_actions)}')
+
+    start_time = time.perf_counter()
+    for _ in range(RESTORES):
+        env.set_state(state)
+    print(f'Restores per second: {RESTORES / (time.perf_counter() - start_time):8.0f}')
+
+    envs = SerialEnvironment(SpidermanEnv, env.action_space)
+    envs.set_states(state)
+    returns = np.zeros(env.action_space)
+    alive = np.ones(env.action_space, dtype=bool)
+    start_time = time.perf_counter()
+    for step in range(ROLLOUT_STEPS):
+        # Every env takes its own action first and then waits
+        step_actions = np.arange(env.action_space) if step == 0 else np.zeros(env.action_space, dtype=np.int64)
+        _, rewards, dones, _ = envs.step(step_actions)
+        returns += rewards * alive
+        alive &= ~dones
+    print(f'Rollouts of {ROLLOUT_STEPS} steps for all actions took {time.perf_counter() - start_time:.3f}s')
+    print('Return per first action:', np.round(returns, 2).tolist())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import time
+
+import numpy as np
+
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+from Environment.VectorSpidermanEnv import VectorSpidermanEnv
+
+
+''' Plays the same seeded games with the same action sequences in SpidermanEnv (pymunk) and VectorSpidermanEnv
+and compares trajectories and episode outcomes. Run from the repository root:
+    python -m Benchmarks.VectorEnvComparison '''
+
+SEED = 123
+GAMES = 64
+MAX_STEPS = 400
+CHECK_STEPS = [1, 5, 10, 25, 50]
+
+
+def play_pymunk_games(actions):
+    env = SpidermanEnv(max_steps=actions.shape[1])
+    lengths, scores, rewards, steps_per_second, positions = BenchmarkUtils.play_episodes(env, actions, SEED, record_positions=True)
+    return positions, lengths, scores, rewards, steps_per_second
+
+
+def play_vector_games(actions):
+    games = actions.shape[0]
+    positions = np.full(actions.shape + (2,), np.nan)
+    lengths = np.zeros(games, dtype=int)
+    scores = np.zeros(games)
+    rewards = np.zeros(games)
+    running = np.ones(games, dtype=bool)
+    start_time = time.time()
+    env = VectorSpidermanEnv(games, max_steps=actions.shape[1], seed=SEED)
+    for step in range(actions.shape[1]):
+        _, _, dones, info = env.step(actions[:, step])
+        # Finished games are already reset, their final values only exist in info
+        finished_ids = np.nonzero(dones)[0]
+        positions[running & ~dones, step] = env.position[running & ~dones]
+        first_finish = running[finished_ids]
+        lengths[finished_ids[first_finish]] = step + 1
+        scores[finished_ids[first_finish]] = np.array(info['total_score'])[first_finish]
+        rewards[finished_ids[first_finish]] = np.array(info['totalReward'])[first_finish]
+        running[finished_ids] = False
+        if not running.any():
+            break
+    lengths[running] = actions.shape[1]
+    scores[running] = env.score[running]
+    rewards[running] = env.rewards[running]
+    steps_per_second = lengths.sum() / (time.time() - start_time)
+    return positions, lengths, scores, rewards, steps_per_second
+
+
+def throughput(n_envs, steps=200):
+    env = VectorSpidermanEnv(n_envs, seed=SEED)
+    rng = np.random.default_rng(SEED)
+    start_time = time.time()
+    for _ in range(steps):
+        env.step(rng.integers(0, 14, size=n_envs))
+    return n_envs * steps / (time.time() - start_time)
+
+
+def main():
+    actions = BenchmarkUtils.get_action_sequences(GAMES, MAX_STEPS, SEED)
+    pymunk_positions, pymunk_lengths, pymunk_scores, pymunk_rewards, pymunk_speed = play_pymunk_games(actions)
+    vector_positions, vector_lengths, vector_scores, vector_rewards, vector_speed = play_vector_games(actions)
+
+    print("Trajectory divergence (median pixels over games still running in both):")
+    for step in CHECK_STEPS:
+        error = np.linalg.norm(pymunk_positions[:, step - 1] - vector_positions[:, step - 1], axis=1)
+        error = error[~np.isnan(error)]
+        if len(error) != 0:
+            print(f'  step {step:3}: {np.median(error):8.3f}  ({len(error)} games)')
+    print("Episode outcomes:")
+    BenchmarkUtils.print_distribution("length", "pymunk", pymunk_lengths, "vector", vector_lengths)
+    BenchmarkUtils.print_distribution("score", "pymunk", pymunk_scores, "vector", vector_scores)
+    BenchmarkUtils.print_distribution("reward", "pymunk", pymunk_rewards, "vector", vector_rewards)
+    print("Steps per second:")
+    print(f'  pymunk single env : {pymunk_speed:10.0f}')
+    print(f'  vector {GAMES:4} envs  : {vector_speed:10.0f}')
+    for n_envs in [256, 1024]:
+        print(f'  vector {n_envs:4} envs  : {throughput(n_envs):10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+import multiprocessing as mp
+import time
+
+import numpy as np
+from Environment.SpidermanEnv import SpidermanEnv
+from ParallelHandler.ParallelEnvironments import ParallelEnvironments
+
+
+''' Measures the time from creating ParallelEnvironments to its first reset, and of closing it again, with workers
+spawned for every instance and with ParallelEnvironments.USE_WORKER_POOL. The first pooled start includes starting the
+forkserver and forking the workers, every following one is a restart as Trainer.restart_environment does it. Run from
+the repository root:
+    python -m Benchmarks.WorkerPoolBenchmark '''
+
+PROCESSES = 8
+ENVS_PER_PROCESS = 4
+RESTARTS = 5
+
+
+def measure(use_worker_pool):
+    ParallelEnvironments.USE_WORKER_POOL = use_worker_pool
+    start_times, close_times = [], []
+    for _ in range(RESTARTS + 1):
+        start_time = time.perf_counter()
+        env = ParallelEnvironments(SpidermanEnv, PROCESSES, ENVS_PER_PROCESS, False)
+        env.reset()
+        start_times.append(time.perf_counter() - start_time)
+        env.step(np.zeros(PROCESSES * ENVS_PER_PROCESS, dtype=np.int64))
+        close_start = time.perf_counter()
+        env.close()
+        close_times.append(time.perf_counter() - close_start)
+    return start_times[0], np.median(start_times[1:]), np.median(close_times)
+
+
+def main():
+    mp.set_start_method('spawn')
+    print(f'Cores: {mp.cpu_count()}, {PROCESSES} x {ENVS_PER_PROCESS} envs, median of {RESTARTS} restarts')
+    for use_worker_pool in (False, True):
+        first_start, restart, close = measure(use_worker_pool)
+        name = "worker pool" if use_worker_pool else "spawn"
+        print(f'  {name:11}  first start {first_start * 1000:6.0f} ms, restart {restart * 1000:6.0f} ms, close {close * 1000:5.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import random
+import time
+
+import numpy as np
+from Benchmarks.BenchmarkUtils import BenchmarkUtils
+from Environment.SpidermanEnv import SpidermanEnv
+
+
+''' Plays the same seeded episodes with the default geometry (one static body per obstacle, two roof boxes and the
+default bounding box tree) and with SpidermanEnv.USE_WORLD_GEOMETRY with the tree and a few spatial hash sizes.
+Reports the time per call spent in env_space.step, in segment queries and in the obstacle generator step, and the
+episode outcomes. The rays use the pymunk backend so every observation ray is a space query. Run from the repository root:
+    python -m Benchmarks.WorldGeometryBenchmark '''
+
+SEED = 123
+GAMES = 200
+MAX_STEPS = 2000
+# (cell size, cells), a cell size of None keeps the bounding box tree
+SPATIAL_HASHES = ((None, 100), (50, 100), (100, 100), (200, 100), (100, 1000))
+
+
+class CallTimer:
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0
+
+    def wrap(self, function):
+        def timed(*args):
+            start_time = time.perf_counter()
+            result = function(*args)
+            self.seconds += time.perf_counter() - start_time
+            self.calls += 1
+            return result
+        return timed
+
+    def get_micro_seconds_per_call(self):
+        return self.seconds / max(self.calls, 1) * 1e6
+
+
+def play(world_geometry, actions, spatial_hash=(SpidermanEnv.SPATIAL_HASH_CELL_SIZE, SpidermanEnv.SPATIAL_HASH_CELLS)):
+    env = SpidermanEnv(max_steps=actions.shape[1])
+    env.USE_VECTORIZED_RAYS = False
+    env.USE_WORLD_GEOMETRY = world_geometry
+    env.SPATIAL_HASH_CELL_SIZE, env.SPATIAL_HASH_CELLS = spatial_hash
+    step_timer, query_timer, generator_timer = CallTimer(), CallTimer(), CallTimer()
+    lengths, scores = [], []
+    for game in range(actions.shape[0]):
+        random.seed(SEED + game)
+        env.reset()
+        env.env_space.step = step_timer.wrap(env.env_space.step)
+        env.env_space.segment_query_first = query_timer.wrap(env.env_space.segment_query_first)
+        env.obstaclegenerator.step = generator_timer.wrap(env.obstaclegenerator.step)
+        for step in range(actions.shape[1]):
+            _, _, done, info = env.step(actions[game, step])
+            if done:
+                break
+        lengths.append(step + 1)
+        scores.append(info['score'])
+    return np.array(lengths), np.array(scores), (step_timer, query_timer, generator_timer)
+
+
+def print_timers(name, timers):
+    print(f'{name:28}' + ''.join(f'{timer.get_micro_seconds_per_call():14.2f}' for timer in timers))
+
+
+def main():
+    actions = BenchmarkUtils.get_action_sequences(GAMES, MAX_STEPS, SEED)
+    base_lengths, base_scores, timers = play(False, actions)
+    print(f'{"mode":28}{"space.step us":>14}{"query us":>14}{"generator us":>14}')
+    print_timers("bodies, bb tree", timers)
+    for spatial_hash in SPATIAL_HASHES:
+        lengths, scores, timers = play(True, actions, spatial_hash)
+        print_timers("world, " + ("bb tree" if spatial_hash[0] is None else "hash %d px x %d" % spatial_hash), timers)
+        if spatial_hash == (SpidermanEnv.SPATIAL_HASH_CELL_SIZE, SpidermanEnv.SPATIAL_HASH_CELLS):
+            world_lengths, world_scores = lengths, scores
+    print("Episode outcomes with the default broadphase, a high p-value means the distributions can not be told apart:")
+    BenchmarkUtils.print_distribution("length", "bodies", base_lengths, "world", world_lengths)
+    BenchmarkUtils.print_distribution("score", "bodies", base_scores, "world", world_scores)
+
+
+if __name__ == '__main__':
+    main()
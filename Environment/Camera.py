@@ -1,25 +1,36 @@
-import os
-os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
-import pygame
-vec = pygame.math.Vector2
 from abc import ABC, abstractmethod
 import numpy as np
 
+class Offset:
+    ''' Mutable x and y of the camera, headless envs do not import pygame for its Vector2 '''
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
 class Camera:
 
     def __init__(self, player, display_size):
         self.player = player
-        self.offset = vec(0, 0)
+        self.offset = Offset(0, 0)
         self.DISPLAY_W = display_size[0]
         self.DISPLAY_H = display_size[1]
-        self.offset_float = vec(0, 0)
-        self.CONST = vec(300,0)
+        self.offset_float = Offset(0, 0)
+        self.CONST = Offset(300,0)
 
     def set_method(self, method):
         self.method = method
 
-    def scroll(self):
-        self.method.scroll()
+    def scroll(self, player_x=None):
+        self.method.scroll(player_x)
+
+    def get_state(self):
+        return (self.offset.x, self.offset.y, self.offset_float.x, self.offset_float.y, self.method.get_state())
+
+    def set_state(self, state):
+        self.offset.x, self.offset.y, self.offset_float.x, self.offset_float.y, method_state = state
+        self.method.set_state(method_state)
 
 class CamScroll(ABC):
 
@@ -28,13 +39,20 @@ class CamScroll(ABC):
         self.player = player
 
     @abstractmethod
-    def scroll(self):
+    def scroll(self, player_x=None):
+        ''' player_x replaces the position of the player body when given '''
         pass
 
     @abstractmethod
     def set_scroll_speed(self, speed):
         pass
 
+    def get_state(self):
+        return None
+
+    def set_state(self, state):
+        pass
+
 class Follow(CamScroll):
 
     def __init__(self, camera, player):
@@ -43,17 +61,20 @@ class Follow(CamScroll):
     def set_scroll_speed(self, speed):
         pass        
 
-    def scroll(self):
-        player_pos = self.player.get_pos()
-        self.camera.offset_float.x += (player_pos.x - self.camera.offset_float.x - self.camera.CONST.x)
+    def scroll(self, player_x=None):
+        player_x = self.player.get_pos().x if player_x is None else player_x
+        self.camera.offset_float.x += (player_x - self.camera.offset_float.x - self.camera.CONST.x)
         #self.camera.offset_float.y += (player_pos.y - self.camera.offset_float.y - self.camera.CONST.y)
         self.camera.offset.x, self.camera.offset.y = int(self.camera.offset_float.x), int(self.camera.offset_float.y)
         
 class Auto(CamScroll):
+
+    REFERENCE_FRAME_TIME = 1/50
     
-    def __init__(self, camera, player):
+    def __init__(self, camera, player, frame_time=REFERENCE_FRAME_TIME):
         CamScroll.__init__(self, camera, player)
-        self.max_speed = 2.4
+        # Pixels per frame, scaled so the camera moves as fast per second with other frame times
+        self.max_speed = 2.4 * (frame_time / self.REFERENCE_FRAME_TIME)
         self.min_offset = None
         self.current_tick = 0
         self.float_speed = 0
@@ -70,12 +91,18 @@ class Auto(CamScroll):
         self.last_scroll_speed = round(speed, 2)
         self.float_speed = self.max_speed * speed
 
-    def scroll(self):
+    def get_state(self):
+        return (self.min_offset, self.current_tick, self.float_speed, self.last_scroll_speed)
+
+    def set_state(self, state):
+        self.min_offset, self.current_tick, self.float_speed, self.last_scroll_speed = state
+
+    def scroll(self, player_x=None):
         if self.min_offset is None:
             self.min_offset = self.camera.offset.x
-        player_pos = self.player.get_pos()
-        #self.camera.offset_float.x += (player_pos.x - self.camera.offset_float.x - self.camera.CONST.x)
-        self.camera.offset_float.x = max(player_pos.x - self.camera.CONST.x, self.camera.offset_float.x + self.float_speed)
+        player_x = self.player.get_pos().x if player_x is None else player_x
+        #self.camera.offset_float.x += (player_x - self.camera.offset_float.x - self.camera.CONST.x)
+        self.camera.offset_float.x = max(player_x - self.camera.CONST.x, self.camera.offset_float.x + self.float_speed)
         self.camera.offset.x = round(self.camera.offset_float.x)
 
         
\ No newline at end of file
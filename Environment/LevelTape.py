@@ -0,0 +1,74 @@
+import os
+import random
+from os.path import dirname, exists, join
+
+import numpy as np
+import pymunk
+from Environment.ObstacleGenerator import ObstacleGenerator
+
+
+''' Level tapes are obstacles generated offline with a fixed seed and stored as one int32 array of shape
+(levels, obstacles, 4) with [x, y, width, height] rows. The file is memory mapped so every worker process
+shares the same pages and every run plays the same levels. Generate a tape from the repository root with:
+    python -m Environment.LevelTape '''
+
+class LevelTape:
+
+    LEVEL_FOLDER = join(os.getcwd(), "Environment", "Levels")
+    DEFAULT_NAME = "level_tape.npy"
+
+    __Instances = {}
+
+    @classmethod
+    def getInstance(cls, path=None):
+        # One memory map per process, shared by all envs of a worker
+        if path not in cls.__Instances:
+            cls.__Instances[path] = cls(path)
+        return cls.__Instances[path]
+
+    def __init__(self, path=None):
+        path = join(self.LEVEL_FOLDER, self.DEFAULT_NAME) if path is None else path
+        if not exists(path):
+            raise FileNotFoundError("Could not find level tape " + path + ", generate it with LevelTape.generate")
+        self.levels = np.load(path, mmap_mode='r')
+
+    def __len__(self):
+        return self.levels.shape[0]
+
+    def get_level(self, index):
+        return self.levels[index % len(self)]
+
+    @staticmethod
+    def generate_level(seed, number_of_obstacles, game_size):
+        ''' Runs the online ObstacleGenerator with its own seeded random and records every random obstacle '''
+        generator = ObstacleGenerator(pymunk.Space(), game_size, rng=random.Random(seed))
+        level = np.zeros((number_of_obstacles, 4), dtype=np.int32)
+        spawn_distance = game_size[0] * 1.5
+        left_bar = 0
+        count = 0
+        while count < number_of_obstacles:
+            generator.step(left_bar)
+            if generator.last_obstacle_addition == left_bar + spawn_distance:
+                left, top, right, bottom = generator.obstacle_store.get_rectangles()[-1]
+                level[count] = ((left + right) / 2, (top + bottom) / 2, right - left, bottom - top)
+                count += 1
+                # Jump straight to the first camera position where the next obstacle can spawn
+                left_bar = max(left_bar + 1, int(generator.last_obstacle_addition + generator.obstacle_fequency_pixels - spawn_distance) + 1)
+            else:
+                left_bar += 1
+        return level
+
+    @staticmethod
+    def generate(path=None, number_of_levels=64, number_of_obstacles=4096, seed=123, game_size=(1300, 715)):
+        path = join(LevelTape.LEVEL_FOLDER, LevelTape.DEFAULT_NAME) if path is None else path
+        os.makedirs(dirname(path), exist_ok=True)
+        levels = np.lib.format.open_memmap(path, mode='w+', dtype=np.int32, shape=(number_of_levels, number_of_obstacles, 4))
+        for i in range(number_of_levels):
+            levels[i] = LevelTape.generate_level(seed + i, number_of_obstacles, game_size)
+        levels.flush()
+        print("Saved", number_of_levels, "levels to", path)
+        return path
+
+
+if __name__ == '__main__':
+    LevelTape.generate()
@@ -1,18 +1,30 @@
+from Environment.Utils.Entity import Entity
 from Environment.Utils.ObjectShapes import ObjectShapes
 from Environment.Utils.ObjectType import ObjectType
-from Environment.Utils.BodyUtils import BodyUtils
+from Environment.Utils.ObstacleStore import ObstacleStore
+from Environment.Utils.RayQueryService import RayQueryService
+from Environment.Utils.RectangleUtils import RectangleUtils
 import pymunk
 import random
 import math
+import numpy as np
 
 
 class ObstacleGenerator:
 
     ROOF_SIZE = 40
 
-    def __init__(self, env_space, game_size):
+    def __init__(self, env_space, game_size, level=None, rng=random, world_geometry=False, physics_pool=None, instance=None):
         self.env_space = env_space
+        # Reuses the boxes of removed obstacles and roof pieces when given, see PhysicsPool
+        self.physics_pool = physics_pool
+        # Obstacles are shapes on the space's static body and the roof is one segment that is moved forward
+        self.world_geometry = world_geometry
         self.game_size = game_size
+        self.rng = rng
+        # Pre generated obstacles as [x, y, width, height] rows sorted by x, see LevelTape
+        self.level = level
+        self.level_index = 0
         self.reduce_fist_obstacle = 1000
         self.min_size = (50, 50)
         self.max_size = (400, 400)
@@ -22,112 +34,213 @@ class ObstacleGenerator:
         self.obstacle_fequency_pixels = 200
         self.last_obstacle_addition = 0
         self.obstacle_collision_type = 2
+        _, self.shape_filter, _ = RayQueryService.get_filters(instance)
 
         self.difficulty = 1
         self.roof_list = []
-        self.obstacles_list = []
+        self.roof_x = []
+        self.roof_rectangles = np.empty((0, 4))
+        self.obstacle_store = ObstacleStore()
         # Start Wall
         # self.obstacles_list.append(self.__create_obstacle(ObjectShapes.Rectangle, (-100, self.game_size[1]//2), (150, self.game_size[1])))
 
         # Fist obstacles
-        self.obstacles_list.append(self.__create_obstacle(ObjectShapes.Rectangle, (400, 300), (50, 200)))
-        self.obstacles_list.append(self.__create_obstacle(ObjectShapes.Rectangle, (75, self.game_size[1] - 50), (50, 100)))
-        self.obstacles_list.append(self.__create_obstacle(ObjectShapes.Rectangle, (1150, self.game_size[1] - 60), (50, 250)))
+        self.__add_obstacle((400, 300), (50, 200))
+        self.__add_obstacle((75, self.game_size[1] - 50), (50, 100))
+        self.__add_obstacle((1150, self.game_size[1] - 60), (50, 250))
+
+    @property
+    def obstacles_list(self):
+        return self.obstacle_store.get_objects()
 
 
 
     def __delete_shape(self, object_to_remove):
-        if isinstance(object_to_remove, dict):
-            self.env_space.remove(object_to_remove['shape'], object_to_remove['shape'].body)
+        shape = object_to_remove.shape if isinstance(object_to_remove, Entity) else object_to_remove
+        if shape.body is self.env_space.static_body:
+            self.env_space.remove(shape)
         else:
-            self.env_space.remove(object_to_remove, object_to_remove.body)
+            self.env_space.remove(shape, shape.body)
+        if self.physics_pool is not None and isinstance(shape, pymunk.Poly):
+            self.physics_pool.release_box(shape)
     
     def __create_obstacle(self, draw_shape : ObjectShapes, pos : tuple, size):
-        body = pymunk.Body(body_type=pymunk.Body.STATIC)
-        body.position = pos
-        if draw_shape == ObjectShapes.Rectangle:
-            shape = pymunk.Poly.create_box(body, size)
-        elif draw_shape == ObjectShapes.Circle:
-            shape = pymunk.Circle(body, size)
+        if self.physics_pool is not None and draw_shape == ObjectShapes.Rectangle:
+            shape = self.physics_pool.acquire_box(pos, size, self.env_space.static_body if self.world_geometry else None)
+            body = shape.body
+        elif self.world_geometry:
+            body = self.env_space.static_body
+            if draw_shape == ObjectShapes.Rectangle:
+                shape = pymunk.Poly.create_box_bb(body, pymunk.BB(*RectangleUtils.from_center(pos, size)))
+            elif draw_shape == ObjectShapes.Circle:
+                shape = pymunk.Circle(body, size, pos)
+            else:
+                raise("unrecognized shape")
         else:
-            raise("unrecognized shape")
+            body = pymunk.Body(body_type=pymunk.Body.STATIC)
+            body.position = pos
+            if draw_shape == ObjectShapes.Rectangle:
+                shape = pymunk.Poly.create_box(body, size)
+            elif draw_shape == ObjectShapes.Circle:
+                shape = pymunk.Circle(body, size)
+            else:
+                raise("unrecognized shape")
         shape.collision_type = self.obstacle_collision_type
-        self.env_space.add(body, shape)
-        return {
-            "shape" : shape,
-            "size" : size,
-            "drawShape" : draw_shape,
-            "type" : ObjectType.Obstacle,
-        }
+        shape.filter = self.shape_filter
+        if self.world_geometry:
+            self.env_space.add(shape)
+        else:
+            self.env_space.add(body, shape)
+        return Entity(shape, size, draw_shape, ObjectType.Obstacle)
+
+    def __add_obstacle(self, pos, size):
+        self.obstacle_store.insert(RectangleUtils.from_center(pos, size), self.__create_obstacle(ObjectShapes.Rectangle, pos, size))
 
     def __create_roof(self, left_bar):
-        body = pymunk.Body(body_type=pymunk.Body.STATIC)
-        body.position = (left_bar, self.ROOF_SIZE//2)
-        shape = pymunk.Poly.create_box(body, (self.game_size[0]*2, self.ROOF_SIZE))
+        if self.physics_pool is not None:
+            shape = self.physics_pool.acquire_box((left_bar, self.ROOF_SIZE//2), (self.game_size[0]*2, self.ROOF_SIZE))
+            body = shape.body
+        else:
+            body = pymunk.Body(body_type=pymunk.Body.STATIC)
+            body.position = (left_bar, self.ROOF_SIZE//2)
+            shape = pymunk.Poly.create_box(body, (self.game_size[0]*2, self.ROOF_SIZE))
         shape.collision_type = self.obstacle_collision_type
+        shape.filter = self.shape_filter
         self.env_space.add(body, shape)
-        return {
-            "shape" : shape,
-            "size" : (self.game_size[0]*2, self.ROOF_SIZE),
-            "drawShape" : ObjectShapes.Rectangle,
-            "type" : ObjectType.Roof,
-        }
+        return Entity(shape, (self.game_size[0]*2, self.ROOF_SIZE), ObjectShapes.Rectangle, ObjectType.Roof)
+
+    def __create_roof_segment(self):
+        shape = pymunk.Segment(self.env_space.static_body, (0, 0), (0, 0), self.ROOF_SIZE / 2)
+        shape.collision_type = self.obstacle_collision_type
+        shape.filter = self.shape_filter
+        roof = Entity(shape, None, ObjectShapes.Rectangle, ObjectType.Roof)
+        self.__move_roof_segment(roof)
+        self.env_space.add(shape)
+        return roof
+
+    def __move_roof_segment(self, roof):
+        # Covers the same range as the two roof boxes of the other mode, the rounded ends are out of sight
+        radius = self.ROOF_SIZE / 2
+        left, right = self.roof_x[0] - self.game_size[0], self.roof_x[-1] + self.game_size[0]
+        roof.shape.unsafe_set_endpoints((left + radius, radius), (right - radius, radius))
+        roof.size = (right - left, self.ROOF_SIZE)
+        if roof.shape.space is not None:
+            self.env_space.reindex_shape(roof.shape)
 
     def update_roof(self, left_bar):
         if len(self.roof_list) == 0:
-            self.roof_list.append(self.__create_roof(left_bar))
-            self.roof_list.append(self.__create_roof(left_bar + self.game_size[0]))
-        if left_bar - self.roof_list[0]['shape'].body.position.x > self.game_size[0]:
-            roof = self.roof_list.pop(0)
-            self.__delete_shape(roof)
-            self.roof_list.append(self.__create_roof(left_bar + self.game_size[0]))
+            self.roof_x = [left_bar, left_bar + self.game_size[0]]
+            if self.world_geometry:
+                self.roof_list.append(self.__create_roof_segment())
+            else:
+                self.roof_list = [self.__create_roof(x) for x in self.roof_x]
+        elif left_bar - self.roof_x[0] > self.game_size[0]:
+            self.roof_x = [self.roof_x[1], left_bar + self.game_size[0]]
+            if self.world_geometry:
+                self.__move_roof_segment(self.roof_list[0])
+            else:
+                roof = self.roof_list.pop(0)
+                self.__delete_shape(roof)
+                self.roof_list.append(self.__create_roof(self.roof_x[1]))
+        else:
+            return
+        self.__update_roof_rectangles()
+
+    def __update_roof_rectangles(self):
+        self.roof_rectangles = np.array([[roof.shape.bb.left, roof.shape.bb.bottom, roof.shape.bb.right, roof.shape.bb.top] for roof in self.roof_list]).reshape(-1, 4)
+
+    def stream_level_objects(self, left_bar):
+        x_spawn_pos = left_bar + self.game_size[0] * 1.5
+        while self.level_index < len(self.level) and self.level[self.level_index, 0] <= x_spawn_pos:
+            x, y, width, height = self.level[self.level_index].tolist()
+            self.__add_obstacle((x, y), (width, height))
+            self.last_obstacle_addition = x
+            self.level_index += 1
 
     def create_random_object(self, left_bar):
         x_spawn_pos = left_bar + self.game_size[0] * 1.5
         if x_spawn_pos > self.obstacle_fequency_pixels + self.last_obstacle_addition:
-            close_obstacle = [obstacle for obstacle in self.obstacles_list if obstacle['shape'].body.position.x > left_bar]
-            shape = None
+            # Obstacles with a center further left than this are always more than min_empty_distance away
+            window_start = x_spawn_pos - self.max_obstacle_side_length - self.min_empty_distance
+            close_obstacles = self.obstacle_store.window(max(left_bar, window_start))
             attempts = 15
             for _ in range(attempts):
-                x_length = int(random.random() * (self.max_obstacle_side_length - self.min_obstacle_side_length) + self.min_obstacle_side_length)
-                y_length = int(max(random.random() * (self.max_obstacle_side_length - x_length - self.min_obstacle_side_length), 0) + self.min_obstacle_side_length)
-                body = pymunk.Body(body_type=pymunk.Body.STATIC)
-                random_y_pos = int(random.random() * self.game_size[1])
-                body.position = (x_spawn_pos, random_y_pos)
-                shape = pymunk.Poly.create_box(body, (x_length, y_length))
-                no_close_obstacles = True
-                for other_obstacle in close_obstacle:
-                    distance = BodyUtils.distance_between_two_bodies_closest(shape.body, other_obstacle['shape'].body, body1_size=(x_length, y_length))
-                    if distance < self.min_empty_distance:
-                        no_close_obstacles = False
-                        shape = None
-                        break
-                if no_close_obstacles:
-                    shape.collision_type = self.obstacle_collision_type
-                    self.env_space.add(body, shape)
-                    self.obstacles_list.append({
-                        "shape" : shape,
-                        "size" : (x_length, y_length),
-                        "drawShape" : ObjectShapes.Rectangle,
-                        "type" : ObjectType.Obstacle,
-                    })
+                x_length = int(self.rng.random() * (self.max_obstacle_side_length - self.min_obstacle_side_length) + self.min_obstacle_side_length)
+                y_length = int(max(self.rng.random() * (self.max_obstacle_side_length - x_length - self.min_obstacle_side_length), 0) + self.min_obstacle_side_length)
+                random_y_pos = int(self.rng.random() * self.game_size[1])
+                candidate = RectangleUtils.from_center((x_spawn_pos, random_y_pos), (x_length, y_length), integer_half_size=True)
+                if len(close_obstacles) == 0 or RectangleUtils.closest_distance(candidate, close_obstacles).min() >= self.min_empty_distance:
+                    self.__add_obstacle((x_spawn_pos, random_y_pos), (x_length, y_length))
                     self.last_obstacle_addition = x_spawn_pos
                     break
 
-        
     def remove_old_obstacles(self, left_bar):
-        for obstacles in self.obstacles_list:
-            pos = obstacles['shape'].body.position
-            if pos.x < left_bar - 300:
-                if pos.x == -100 and pos.y == self.game_size[1]//2:
-                    if pos.x < self.reduce_fist_obstacle + 100:
-                        continue
-                self.obstacles_list.remove(obstacles)
-                self.__delete_shape(obstacles)
+        for obstacle in self.obstacle_store.evict_before(left_bar - 300):
+            self.__delete_shape(obstacle)
+
+    def get_rectangles(self):
+        return np.concatenate([self.roof_rectangles, self.obstacle_store.get_rectangles()])
+
+    def get_state(self):
+        return {
+            "rectangles" : self.obstacle_store.get_rectangles().copy(),
+            "roof_x" : tuple(self.roof_x),
+            "last_obstacle_addition" : self.last_obstacle_addition,
+            "level_index" : self.level_index,
+            "rng" : self.rng.getstate(),
+        }
+
+    def set_state(self, state):
+        ''' Obstacles and roof pieces that are in both the space and the state are kept, only the difference is
+        created or removed '''
+        current = dict(zip(map(tuple, self.obstacle_store.get_rectangles().tolist()), self.obstacle_store.get_objects()))
+        obstacle_store = ObstacleStore(max(64, 2 * len(state['rectangles'])))
+        for rectangle in state['rectangles'].tolist():
+            obstacle = current.pop(tuple(rectangle), None)
+            if obstacle is None:
+                left, top, right, bottom = rectangle
+                obstacle = self.__create_obstacle(ObjectShapes.Rectangle, ((left + right) / 2, (top + bottom) / 2), (int(right - left), int(bottom - top)))
+            obstacle_store.insert(rectangle, obstacle)
+        for obstacle in current.values():
+            self.__delete_shape(obstacle)
+        self.obstacle_store = obstacle_store
+
+        self.roof_x = list(state['roof_x'])
+        if self.world_geometry:
+            if len(self.roof_x) == 0:
+                for roof in self.roof_list:
+                    self.__delete_shape(roof)
+                self.roof_list = []
+            elif len(self.roof_list) == 0:
+                self.roof_list = [self.__create_roof_segment()]
+            else:
+                self.__move_roof_segment(self.roof_list[0])
+        else:
+            current = {roof.shape.body.position.x : roof for roof in self.roof_list}
+            self.roof_list = [current.pop(x, None) or self.__create_roof(x) for x in self.roof_x]
+            for roof in current.values():
+                self.__delete_shape(roof)
+        self.__update_roof_rectangles()
+
+        self.last_obstacle_addition = state['last_obstacle_addition']
+        self.level_index = state['level_index']
+        self.rng.setstate(state['rng'])
+
+    def has_work(self, left_bar):
+        ''' Whether step would change the roof or add obstacles, removing old obstacles can wait for a later step '''
+        if len(self.roof_list) == 0 or left_bar - self.roof_x[0] > self.game_size[0]:
+            return True
+        x_spawn_pos = left_bar + self.game_size[0] * 1.5
+        if self.level is not None and self.level_index < len(self.level):
+            return self.level[self.level_index, 0] <= x_spawn_pos
+        return x_spawn_pos > self.obstacle_fequency_pixels + self.last_obstacle_addition
 
     def step(self, left_bar):
         self.update_roof(left_bar)
         self.remove_old_obstacles(left_bar)
-        self.create_random_object(left_bar)
-        return self.roof_list, self.obstacles_list
+        if self.level is not None and self.level_index < len(self.level):
+            self.stream_level_objects(left_bar)
+        else:
+            self.create_random_object(left_bar)
+        return self.roof_list, self.obstacle_store.get_objects()
         
\ No newline at end of file
@@ -1,99 +1,110 @@
 import math
 import random
 import pymunk
+import numpy as np
 from Environment.Utils.BodyUtils import BodyUtils
 from Environment.Utils.MathUtils import MathUtils
 
+from Environment.Utils.Entity import Entity
 from Environment.Utils.ObjectShapes import ObjectShapes
 from Environment.Utils.ObjectType import ObjectType
+from Environment.Utils.RayQueryService import RayQueryService
+from Environment.Utils.Web import Web
 
 
 class PlayerController:
 
-    def __init__(self, env_space, start_point):
+    def __init__(self, env_space, start_point, physics_pool=None, instance=None, rng=random):
         self.player_size = 20
+        self.rng = rng
         self.env_space = env_space
+        self.shape_filter, _, _ = RayQueryService.get_filters(instance)
+        # Players in a shared space need their own collision type, else their contact callbacks replace each other
+        self.collision_type = 1 if instance is None else 1000 + instance
+        # Reuses the joints and anchors of released webs when given, see PhysicsPool
+        self.physics_pool = physics_pool
         self.object = self.__create_player(self.player_size, start_point)
         self.max_webs = 2
         self.lines = []
         self.current_timestep = 0
         self.max_speed = 600
         self.max_web_range = 1000
+        self.number_of_rays = 24
+        self.ray_queries = RayQueryService(env_space, self.number_of_rays, self.max_web_range, instance=instance)
+        self.observation_size = 6 + self.number_of_rays
+        # Shapes touching the player, counted by the collision callbacks
+        self.contacts = 0
+        env_space.on_collision(self.collision_type, begin=self.__begin_contact, separate=self.__end_contact)
 
     # -------------------------------------------------------------------------
     # Private functions
 
     def __create_player(self, size, start_point):
-        x_variation = int(random.random() * 150) - 50
-        y_variation = int(random.random() * 100) - 40
+        x_variation = int(self.rng.random() * 150) - 50
+        y_variation = int(self.rng.random() * 100) - 40
         self.body = pymunk.Body()
+        return Entity(self.__create_player_shape(size, (start_point[0] + x_variation, start_point[1] + y_variation)), size, ObjectShapes.Circle, ObjectType.Player)
+
+    def __create_player_shape(self, size, position):
         body = pymunk.Body(1, 100, body_type= pymunk.Body.DYNAMIC)
-        body.position = (start_point[0] + x_variation, start_point[1] + y_variation)
+        body.position = position
         shape = pymunk.Circle(body, size)
-        shape.collision_type = 1
+        shape.collision_type = self.collision_type
+        shape.filter = self.shape_filter
         self.env_space.add(body, shape)
-        return {
-            "shape" : shape,
-            "size" : size,
-            "drawShape" : ObjectShapes.Circle,
-            "type" : ObjectType.Player,
-        }
-
-    def __create_line(self, target, is_body=False, applied_time_step=None):
-        if not is_body:
+        return shape
+
+    def __create_line(self, target, is_body=False, applied_time_step=None, distance=None):
+        if self.physics_pool is not None and not is_body:
             target_pos = target
-            target = pymunk.Body(body_type=pymunk.Body.STATIC)
-            target.position = target_pos
-        distance = BodyUtils.distance_between_two_bodies_center(self.object['shape'].body, target)
-        #joint = pymunk.DampedSpring(self.player['shape'].body, target, (0,0), (0,0), distance, 10, 1)
-        joint = pymunk.SlideJoint(self.object['shape'].body, target, (0,0), (0,0), 0, distance)
+            if distance is None:
+                distance = BodyUtils.distance_between_body_and_point(self.object.shape.body, target_pos)
+            joint = self.physics_pool.acquire_joint(self.object.shape.body, target_pos, distance)
+        else:
+            if not is_body:
+                target_pos = target
+                target = pymunk.Body(body_type=pymunk.Body.STATIC)
+                target.position = target_pos
+            if distance is None:
+                distance = BodyUtils.distance_between_two_bodies_center(self.object.shape.body, target)
+            #joint = pymunk.DampedSpring(self.player.shape.body, target, (0,0), (0,0), distance, 10, 1)
+            joint = pymunk.SlideJoint(self.object.shape.body, target, (0,0), (0,0), 0, distance)
         self.env_space.add(joint)
         applied_time_step = self.current_timestep if applied_time_step is None else applied_time_step
-        return {
-            "shape" : joint,
-            "size" : 4,
-            "drawShape" : ObjectShapes.Line,
-            "type" : ObjectType.Net,
-            "target_point" : target_pos,
-            "applied_time_step" : applied_time_step
-        }
-
-    def __get_rays_from_body(self):
-        body = self.object['shape'].body
-        body_position = body.position
-        number_of_rays = 24
-        rays_list = []
-        for i in range(number_of_rays):
-            angle = math.radians(360/(number_of_rays) * i)
-            new_x = body_position[0]+ int(math.cos(angle) * self.max_web_range)
-            new_y = body_position[1]+ int(math.sin(angle) * self.max_web_range)
-            segment_q = self.env_space.segment_query(body_position, (new_x, new_y), 1, pymunk.ShapeFilter())
-            segment_q = [segment for segment in segment_q if segment.shape.body.position != body.position]
-            if len(segment_q) == 0:
-                rays_list.append(1)
-            else:
-                min_distance = 10000
-                for segment in segment_q:
-                    distance = round(BodyUtils.distance_between_body_and_point(body, segment.point), 3)
-                    if distance < min_distance:
-                        min_distance = distance
-                rays_list.append(min_distance / self.max_web_range)
-        return rays_list
+        return Web(joint, target_pos, applied_time_step)
+
+    def __begin_contact(self, arbiter, space, data):
+        self.contacts += 1
+
+    def __end_contact(self, arbiter, space, data):
+        self.contacts -= 1
+
+    def __remove_line(self, line):
+        self.env_space.remove(line.shape)
+        if self.physics_pool is not None:
+            self.physics_pool.release_joint(line.shape)
+
+    def __get_rays(self, rectangles=None):
+        rays = self.ray_queries.get_rays(self.get_pos(), rectangles)
+        rays = np.round(rays, 3, out=rays)
+        rays /= self.max_web_range
+        rays[~np.isfinite(rays)] = 1
+        return rays
 
     def __get_net_connection_points(self):
         body : pymunk.Body = self.get_body()
         connection_points = [-1, -1, -1, -1, -1, -1]
         if len(self.lines) == 1:
-            angle = MathUtils.angle_between_two_positions(body.position, self.lines[0]['target_point'])
+            angle = MathUtils.angle_between_two_positions(body.position, self.lines[0].target_point)
             connection_points[0] = (math.sin(angle) + 1) / 2
             connection_points[1] = (math.cos(angle) + 1) / 2
-            connection_points[2] = BodyUtils.distance_between_body_and_point(body, self.lines[0]['target_point']) / self.max_web_range
+            connection_points[2] = BodyUtils.distance_between_body_and_point(body, self.lines[0].target_point) / self.max_web_range
         elif len(self.lines) >= 2:
             for i, net in enumerate(self.lines):
-                angle = MathUtils.angle_between_two_positions(body.position, net['target_point'])
+                angle = MathUtils.angle_between_two_positions(body.position, net.target_point)
                 connection_points[3*i] = (math.sin(angle) + 1) / 2
                 connection_points[3*i+1] = (math.cos(angle) + 1) / 2
-                connection_points[3*i+2] = BodyUtils.distance_between_body_and_point(body, net['target_point']) / self.max_web_range
+                connection_points[3*i+2] = BodyUtils.distance_between_body_and_point(body, net.target_point) / self.max_web_range
         return connection_points
     
     def __net_release_pos(self):
@@ -102,8 +113,8 @@ class PlayerController:
             return None
         if len(self.lines) == 1:
             line = self.lines[0]
-            release_net_pos = line['target_point']
-            self.env_space.remove(line['shape'])
+            release_net_pos = line.target_point
+            self.__remove_line(line)
             self.lines.pop(0)
             return release_net_pos
         else:
@@ -112,11 +123,11 @@ class PlayerController:
             earliest_i = None
             for i in range(len(self.lines)):
                 line = self.lines[i]
-                if line['applied_time_step'] < min_time_step:
-                    min_time_step = line['applied_time_step']
+                if line.applied_time_step < min_time_step:
+                    min_time_step = line.applied_time_step
                     earliest_line = line
                     earliest_i = i
-            self.env_space.remove(earliest_line['shape'])
+            self.__remove_line(earliest_line)
             self.lines.pop(earliest_i)
             return None
 
@@ -138,15 +149,43 @@ class PlayerController:
     # Getters
 
     def get_pos(self):
-        return self.object['shape'].body.position
+        return self.object.shape.body.position
     
     def get_body(self):
-        return self.object['shape'].body
+        return self.object.shape.body
 
-    def get_observation(self):
-        observation = list((self.__get_net_connection_points()))
-        observation.extend(self.__get_rays_from_body())
-        return [round(ob, 3) for ob in observation]
+    def get_observation(self, rectangles=None, out=None):
+        ''' Writes the observation into out (a float32 row of observation_size) when given '''
+        if out is None:
+            out = np.empty(self.observation_size, dtype=np.float32)
+        out[:6] = self.__get_net_connection_points()
+        out[6:] = self.__get_rays(rectangles)
+        return np.round(out, 3, out=out)
+
+    # -------------------------------------------------------------------------
+    # State
+
+    def get_state(self):
+        body = self.get_body()
+        webs = tuple((tuple(line.target_point), line.shape.max, line.applied_time_step) for line in self.lines)
+        return (tuple(body.position), tuple(body.velocity), body.angle, body.angular_velocity, self.current_timestep, webs)
+
+    def set_state(self, state):
+        position, velocity, angle, angular_velocity, self.current_timestep, webs = state
+        for line in self.lines:
+            self.__remove_line(line)
+        # A new body has no cached contacts or solver bias velocity left from the previous run, so every restore
+        # of the same state continues the same way
+        shape = self.object.shape
+        self.env_space.remove(shape.body, shape)
+        shape = self.__create_player_shape(self.player_size, position)
+        shape.body.velocity = velocity
+        shape.body.angle = angle
+        shape.body.angular_velocity = angular_velocity
+        self.object.shape = shape
+        self.contacts = 0
+        self.lines = [self.__create_line(pymunk.Vec2d(*target_point), applied_time_step=applied_time_step, distance=distance)
+            for target_point, distance, applied_time_step in webs]
 
     # -------------------------------------------------------------------------
     # Net functions
@@ -158,7 +197,7 @@ class PlayerController:
         release_net_pos = self.__net_release_pos()
         if release_net_pos is None:
             return
-        body : pymunk.Body = self.object['shape'].body
+        body : pymunk.Body = self.object.shape.body
         velocity_vector = body.velocity
         if velocity_vector[0] < 20:
             if self.__set_pullup_speed(body, release_net_pos):
@@ -175,24 +214,13 @@ class PlayerController:
 
 
     def eject_net(self, target, point=False):
-        body = self.object['shape'].body
+        body = self.object.shape.body
         body_position = body.position
         if point:
             angle = math.atan2(target[1]-body_position[1], target[0]-body_position[0])
         else:
             angle = target
-        new_x = body_position[0]+ int(math.cos(angle) * self.max_web_range)
-        new_y = body_position[1]+ int(math.sin(angle) * self.max_web_range)
-        #segment_q = self.env_space.segment_query_first(body_position, (new_x, new_y), 1, pymunk.ShapeFilter(categories=0b01))
-        segment_q = self.env_space.segment_query(body_position, (new_x, new_y), 1, pymunk.ShapeFilter())
-        segment_q = [segment for segment in segment_q if segment.shape.body.position != body.position]
-        first_point = None
-        min_distance = 10000
-        for segment in segment_q:
-            distance = BodyUtils.distance_between_body_and_point(body, segment.point)
-            if distance < min_distance:
-                min_distance = distance
-                first_point = segment.point
+        first_point = self.ray_queries.get_hit_at_angle(body_position, angle)
         if first_point is not None:
             self.lines.append(self.__create_line(first_point))
         return first_point is None
@@ -200,27 +228,17 @@ class PlayerController:
     def step_nets(self):
         if len(self.lines) == 0:
             return
-        body = self.object['shape'].body
+        body = self.object.shape.body
         body_position = body.position
         for i, line in enumerate(self.lines):
-            old_target_point = line['target_point']
-            min_distance = BodyUtils.distance_between_body_and_point(body, old_target_point)
-            best_segment = None
-            segment_q = self.env_space.segment_query(body_position, old_target_point, 1, pymunk.ShapeFilter())
-            segment_q = [segment for segment in segment_q if segment.shape.body.position != body.position]
-            if len(segment_q) == 2 and len(set([segment.point for segment in segment_q])) == 1:
-                segment_q = [segment_q[0]]
-            for segment in segment_q:
-                distance = BodyUtils.distance_between_body_and_point(body, segment.point)
-                if distance < min_distance:
-                    min_distance = distance
-                    best_segment = segment
-            if best_segment is not None:
-                self.env_space.remove(line['shape'])
+            old_target_point = line.target_point
+            first_point = self.ray_queries.get_first_hit(body_position, old_target_point)
+            if first_point is not None and BodyUtils.distance_between_body_and_point(body, first_point) < BodyUtils.distance_between_body_and_point(body, old_target_point):
+                self.__remove_line(line)
                 self.lines.pop(i)
-                self.lines.append(self.__create_line(best_segment.point, applied_time_step=line['applied_time_step']))
+                self.lines.append(self.__create_line(first_point, applied_time_step=line.applied_time_step))
                 if len(self.lines) > 1:
-                    self.lines = sorted(self.lines, key=lambda k: k['applied_time_step'])       
+                    self.lines = sorted(self.lines, key=lambda k: k.applied_time_step)       
                 break
         self.current_timestep += 1
 
@@ -16,12 +16,8 @@ class GraphicsRenderer(RenderingParent):
 
     GRAPHICS_FOLDER = join(os.getcwd(), "Environment", "Rendering", "Graphics")
 
-    def __init__(self, display_size, score_bar_size):
-        pygame.init()
-        
-        
-        self.screen = pygame.display.set_mode(display_size)
-        self.clock = pygame.time.Clock()
+    def __init__(self, display_size, score_bar_size, headless=False):
+        self.create_screen(display_size, headless)
         self.score_bar_size = score_bar_size
 
         self.background = self.__load_image("background.png")
@@ -36,7 +32,7 @@ class GraphicsRenderer(RenderingParent):
         self.score_font = pygame.font.SysFont('Comic Sans MS', 30)
 
     def __load_image(self, image_name):
-        image = pygame.image.load(join(self.GRAPHICS_FOLDER, image_name)).convert_alpha()
+        image = self.convert_alpha(pygame.image.load(join(self.GRAPHICS_FOLDER, image_name)))
         return image
 
     def __check_for_events(self):
@@ -49,6 +45,10 @@ class GraphicsRenderer(RenderingParent):
         positions = body.position
         return (int(positions[0] - camera.offset.x), int(positions[1]) + self.score_bar_size)
 
+    def __get_center_of_shape(self, shape, camera : Camera):
+        bb = shape.bb
+        return (int((bb.left + bb.right) / 2 - camera.offset.x), int((bb.bottom + bb.top) / 2) + self.score_bar_size)
+
     def __get_angle_of_player(self, body):
         velocity = body.velocity
         return math.degrees(math.atan2(-velocity[1], velocity[0]))
@@ -65,33 +65,35 @@ class GraphicsRenderer(RenderingParent):
             self.screen.blit(rotated_image, new_rect) 
 
     def __render_object(self, object, camera : Camera, override_color=None):
-        if object['type'] == ObjectType.Player:
+        if object.type == ObjectType.Player:
             image = self.player_image
-        elif object['type'] == ObjectType.Roof:
+        elif object.type == ObjectType.Roof:
             image = self.roof_image
-        elif object['type'] == ObjectType.Obstacle:
+        elif object.type == ObjectType.Obstacle:
             image = self.obstacle_image
-        elif object['type'] == ObjectType.Net:
+        elif object.type == ObjectType.Net:
             image = self.net_image
         else:
             raise("Unrecognized type")
         
-        if object['drawShape'] == ObjectShapes.Line:
-            pos1 = self.__get_pos_of_body(object['shape'].a, camera)
-            pos2 = self.__get_pos_of_body(object['shape'].b, camera)
-            pygame.draw.line(self.screen, image, pos1, pos2, object['size'])
+        if object.draw_shape == ObjectShapes.Line:
+            pos1 = self.__get_pos_of_body(object.shape.a, camera)
+            pos2 = self.__get_pos_of_body(object.shape.b, camera)
+            pygame.draw.line(self.screen, image, pos1, pos2, object.size)
         else:
-            pos = self.__get_pos_of_body(object['shape'].body, camera)
-            if object['drawShape'] == ObjectShapes.Circle:
-                angle = self.__get_angle_of_player(object['shape'].body)
-                self.__render_graphic_in_correct_place(image, pos, object['size'], angle)
-            elif object['drawShape'] == ObjectShapes.Rectangle:
-                width = object['size'][0]
-                height = object['size'][1]
+            pos = self.__get_pos_of_body(object.shape.body, camera)
+            if object.draw_shape == ObjectShapes.Circle:
+                angle = self.__get_angle_of_player(object.shape.body)
+                self.__render_graphic_in_correct_place(image, pos, object.size, angle)
+            elif object.draw_shape == ObjectShapes.Rectangle:
+                # Obstacles can be shapes on a shared static body, their position is the center of the shape
+                pos = self.__get_center_of_shape(object.shape, camera)
+                width = object.size[0]
+                height = object.size[1]
                 pos_x_start = pos[0] - width//2
                 pos_y_start = pos[1] - height//2
                 if not isinstance(image, tuple):
-                    self.__render_graphic_in_correct_place(image, (pos_x_start, pos_y_start), object['size'])
+                    self.__render_graphic_in_correct_place(image, (pos_x_start, pos_y_start), object.size)
                 else:
                     pygame.draw.rect(self.screen, image, [pos_x_start, pos_y_start, width, height])
             else:
@@ -151,14 +153,14 @@ class GraphicsRenderer(RenderingParent):
 
 
     def render(self, render_dict : dict, score : int, high_score : int, debug=None):
-        self.__check_for_events()
+        if not self.headless:
+            self.__check_for_events()
         self.screen.blit(self.background, self.background_tuple)
         self.__render_objects(render_dict)
         self.__render_score_and_episode(score, high_score, render_dict)
         self.check_debug(render_dict['camera'], debug)
-        pygame.display.flip()
         # pygame.display.update()
-        self.clock.tick(90)
+        self.present()
 
         
 
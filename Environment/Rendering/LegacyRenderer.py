@@ -12,11 +12,9 @@ from Environment.RenderSectionHandler import RenderSectionHandler
 
 class LegacyRenderer(RenderingParent):
 
-    def __init__(self, display_size, score_bar_size):
-        pygame.init()
+    def __init__(self, display_size, score_bar_size, headless=False):
         self.display_size = display_size
-        self.screen = pygame.display.set_mode(self.display_size)
-        self.clock = pygame.time.Clock()
+        self.create_screen(self.display_size, headless)
         self.score_bar_size = score_bar_size
 
         self.background_colour = (97, 147, 173)
@@ -41,39 +39,46 @@ class LegacyRenderer(RenderingParent):
         positions = body.position
         return (int(positions[0] - camera.offset.x), int(positions[1]) + self.score_bar_size)
 
+    def __get_center_of_shape(self, shape, camera : Camera):
+        bb = shape.bb
+        return (int((bb.left + bb.right) / 2 - camera.offset.x), int((bb.bottom + bb.top) / 2) + self.score_bar_size)
+
     def __compute_finish_line_pos(self, x_pos, camera):
         return (x_pos - camera.offset.x , -100), (x_pos - camera.offset.x , camera.DISPLAY_H + 100)
 
     def __render_object(self, object, camera : Camera, override_color=None):
         if override_color is not None:
             colour = override_color
-        elif object['type'] == ObjectType.Player:
+        elif object.type == ObjectType.Player:
             colour = self.player_colour
-        elif object['type'] == ObjectType.Roof:
+        elif object.type == ObjectType.Roof:
             colour = self.roof_colour
-        elif object['type'] == ObjectType.Obstacle:
+        elif object.type == ObjectType.Obstacle:
             colour = self.obstacle_colour
-        elif object['type'] == ObjectType.Net:
+        elif object.type == ObjectType.Net:
             colour = self.net_colour
-        elif object['type'] == ObjectType.FinishLine:
+        elif object.type == ObjectType.FinishLine:
             colour = self.finish_colour
         else:
             raise("Unrecognized type")
         
-        if object['drawShape'] == ObjectShapes.Line:
-            pos1 = self.__get_pos_of_body(object['shape'].a, camera)
-            pos2 = self.__get_pos_of_body(object['shape'].b, camera)
-            pygame.draw.line(self.screen, colour, pos1, pos2, object['size'])
-        elif object['drawShape'] == ObjectShapes.FinishLine:
-            pos1, pos2 = self.__compute_finish_line_pos(object['value'], camera)
+        if object.draw_shape == ObjectShapes.Line:
+            pos1 = self.__get_pos_of_body(object.shape.a, camera)
+            pos2 = self.__get_pos_of_body(object.shape.b, camera)
+            pygame.draw.line(self.screen, colour, pos1, pos2, object.size)
+        elif object.draw_shape == ObjectShapes.FinishLine:
+            # A finish line keeps its x position as its size
+            pos1, pos2 = self.__compute_finish_line_pos(object.size, camera)
             pygame.draw.line(self.screen, self.finish_colour, pos1, pos2, 5)
         else:
-            pos = self.__get_pos_of_body(object['shape'].body, camera)
-            if object['drawShape'] == ObjectShapes.Circle:
-                pygame.draw.circle(self.screen, colour, pos, object['size'])
-            elif object['drawShape'] == ObjectShapes.Rectangle:
-                width = object['size'][0]
-                height = object['size'][1]
+            pos = self.__get_pos_of_body(object.shape.body, camera)
+            if object.draw_shape == ObjectShapes.Circle:
+                pygame.draw.circle(self.screen, colour, pos, object.size)
+            elif object.draw_shape == ObjectShapes.Rectangle:
+                # Obstacles can be shapes on a shared static body, their position is the center of the shape
+                pos = self.__get_center_of_shape(object.shape, camera)
+                width = object.size[0]
+                height = object.size[1]
                 pos_x_start = pos[0] - width//2
                 pos_y_start = pos[1] - height//2
                 pygame.draw.rect(self.screen, colour, [pos_x_start, pos_y_start, width, height])
@@ -150,13 +155,13 @@ class LegacyRenderer(RenderingParent):
     
 
     def render(self, render_dict : dict, score : int, high_score : int, debug=None):
-        self.__check_for_events()
+        if not self.headless:
+            self.__check_for_events()
         self.screen.fill(self.background_colour)
         self.__render_objects(render_dict)
         self.__render_score_and_episode(score, high_score, render_dict)
         self.check_debug(render_dict['camera'], debug)
-        pygame.display.update()
-        self.clock.tick(90)
+        self.present()
 
         
 
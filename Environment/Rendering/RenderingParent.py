@@ -1,16 +1,45 @@
 
+import os
 from abc import ABC, abstractmethod
+import numpy as np
+
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+import pygame
 
 
 
 class RenderingParent(ABC):
 
+    FRAME_RATE = 90
+
     @abstractmethod
     def render(self, render_dict : dict, score : int, high_score : int, debug=None):
         pass
 
-
-    
-    
-
-    
+    def create_screen(self, display_size, headless):
+        ''' A window, or with headless an offscreen surface that is drawn as fast as the env steps '''
+        pygame.init()
+        self.headless = headless
+        if headless:
+            self.screen = pygame.Surface(display_size)
+        else:
+            self.screen = pygame.display.set_mode(display_size)
+        self.clock = pygame.time.Clock()
+
+    def convert_alpha(self, image):
+        ''' The image in the pixel format of the screen, converting to the window format needs a window '''
+        if self.headless:
+            return image.convert(pygame.Surface((1, 1), pygame.SRCALPHA))
+        return image.convert_alpha()
+
+    def present(self):
+        ''' Shows the drawn frame in the window, headless renderers keep it for get_frame '''
+        if self.headless:
+            return
+        pygame.display.flip()
+        self.clock.tick(self.FRAME_RATE)
+
+    def get_frame(self):
+        ''' The screen as a read only (height, width, 3) uint8 array '''
+        width, height = self.screen.get_size()
+        return np.frombuffer(pygame.image.tobytes(self.screen, "RGB"), dtype=np.uint8).reshape(height, width, 3)
@@ -0,0 +1,90 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+import pygame
+
+
+''' Encodes rendered frames on a background thread so recording never holds up the env. The frames are piped to
+ffmpeg as an mp4 when ffmpeg is installed, without it every frame is saved as a png into a folder named after the
+video. A full queue drops the frame instead of waiting, dropped_frames counts them. An error of the encoder is raised
+by close '''
+
+class VideoWriter:
+
+    QUEUE_SIZE = 64 # About 200 MB of 1300x800 frames
+    CLOSE_POLL_TIME = 0.1 # Seconds between the checks whether the encoder is still alive while close waits for room
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.dropped_frames = 0
+        self.written_frames = 0
+        self.error = None
+        self.frames = queue.Queue(self.QUEUE_SIZE)
+        self.thread = threading.Thread(target=self.__encode, daemon=True)
+        self.thread.start()
+
+    def write(self, frame):
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def close(self):
+        ''' Waits for the queued frames to be encoded '''
+        if self.thread is None:
+            return
+        # An encoder that died leaves a full queue behind which nobody empties
+        while self.thread.is_alive():
+            try:
+                self.frames.put(None, timeout=self.CLOSE_POLL_TIME)
+                break
+            except queue.Full:
+                pass
+        self.thread.join()
+        self.thread = None
+        if self.error is not None:
+            raise Exception(f"encoding {self.path} failed after {self.written_frames} frames") from self.error
+
+    def __encode(self):
+        ffmpeg = shutil.which("ffmpeg")
+        process = None
+        try:
+            frame = self.frames.get()
+            while frame is not None:
+                if ffmpeg is None:
+                    self.__save_png(frame)
+                else:
+                    if process is None:
+                        process = self.__start_ffmpeg(ffmpeg, frame.shape)
+                    process.stdin.write(frame.tobytes())
+                self.written_frames += 1
+                frame = self.frames.get()
+        except Exception as error:
+            self.error = error
+        if process is not None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            process.wait()
+
+    def __start_ffmpeg(self, ffmpeg, frame_shape):
+        height, width, _ = frame_shape
+        return subprocess.Popen([
+            ffmpeg, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(self.fps), "-i", "-",
+            "-pix_fmt", "yuv420p", self.path,
+        ], stdin=subprocess.PIPE)
+
+    def __save_png(self, frame):
+        folder = os.path.splitext(self.path)[0]
+        if self.written_frames == 0:
+            os.makedirs(folder, exist_ok=True)
+        height, width, _ = frame.shape
+        image = pygame.image.frombuffer(frame.tobytes(), (width, height), "RGB")
+        pygame.image.save(image, os.path.join(folder, f"{self.written_frames:06d}.png"))
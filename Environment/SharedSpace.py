@@ -0,0 +1,29 @@
+import pymunk
+from Environment.Utils.RayQueryService import RayQueryService
+
+
+''' One pymunk space that several SpidermanEnv instances live in, so one step call advances all of them. Every
+instance has two collision categories of its own (see RayQueryService.get_filters) which keeps the instances from
+colliding with or seeing each other. The envs are stepped frame by frame together by SerialEnvironment. '''
+
+class SharedSpace:
+
+    def __init__(self):
+        self.space = pymunk.Space()
+        self.instances = 0
+
+    def add_instance(self):
+        RayQueryService.get_instance_categories(self.instances)
+        self.instances += 1
+        return self.instances - 1
+
+    def remove_instance_objects(self, instance):
+        ''' Takes the shapes of an instance out of the space together with their bodies and joints '''
+        categories = sum(RayQueryService.get_instance_categories(instance))
+        shapes = [shape for shape in self.space.shapes if shape.filter.categories & categories]
+        bodies = {shape.body for shape in shapes if shape.body is not self.space.static_body and shape.body.space is self.space}
+        constraints = [constraint for constraint in self.space.constraints if constraint.a in bodies or constraint.b in bodies]
+        self.space.remove(*constraints, *shapes, *bodies)
+
+    def step(self, dt):
+        self.space.step(dt)
@@ -3,51 +3,130 @@ import math
 import numpy as np
 from collections import deque
 import copy
+import random
 from Environment.Camera import Auto, Camera
+from Environment.LevelTape import LevelTape
 from Environment.ObstacleGenerator import ObstacleGenerator
 from Environment.PlayerController import PlayerController
-from Environment.Rendering.GraphicsRenderer import GraphicsRenderer
-from Environment.Rendering.LegacyRenderer import LegacyRenderer
-from Environment.Utils.BodyUtils import BodyUtils
+from Environment.Utils.ObservationModes import ObservationModes
+from Environment.Utils.PhysicsPool import PhysicsPool
+from Environment.Utils.PixelSensor import PixelSensor
+from Environment.Utils.RectangleUtils import RectangleUtils
+from Environment.Utils.RenderModes import RenderModes
 
 
 class SpidermanEnv:
 
     SCORE_BAR_SIZE = 85
     USE_LEGACY_RENDERER = False
+    USE_VECTORIZED_RAYS = True # False uses one pymunk segment query per ray
+    USE_MACRO_STEP = False # Only run physics on the skipped frames, validated in Benchmarks/MacroStepValidation.py
+    USE_WORLD_GEOMETRY = False # Obstacles on one static body and one roof segment, see Benchmarks/WorldGeometryBenchmark.py
+    # Spatial hash for the world geometry mode, None keeps the bounding box tree which was faster in the benchmark
+    SPATIAL_HASH_CELL_SIZE = None
+    SPATIAL_HASH_CELLS = 100 # Every step clears the whole table so it is kept small
+    USE_PHYSICS_POOL = True # Reuse obstacle boxes and web anchors, see Benchmarks/PhysicsPoolBenchmark.py
+    USE_FREE_FALL = False # Skip pymunk while the player flies without webs, see Benchmarks/FreeFallBenchmark.py
+    # Seconds per frame, frames per action and pymunk solver iterations. Every profile plays 0.1 seconds per action,
+    # compared with the default in Benchmarks/PhysicsProfileValidation.py
+    PHYSICS_PROFILES = {
+        "default" : {"frame_time" : 1/50, "frames" : 5, "iterations" : 10},
+        "fewer_iterations" : {"frame_time" : 1/50, "frames" : 5, "iterations" : 5},
+        "coarse" : {"frame_time" : 1/30, "frames" : 3, "iterations" : 10},
+        "fast" : {"frame_time" : 1/20, "frames" : 2, "iterations" : 5},
+    }
+    PHYSICS_PROFILE = "default"
+    FREE_FALL_CONTACT_MARGIN = 1
+    PIXEL_RESOLUTION = (96, 54) # Width and height of the ObservationModes.Pixels frames
+    PIXEL_STACK = 4
 
-    def __init__(self, eval=False, render=False, max_steps=20000):
+    def __init__(self, eval=False, render=False, max_steps=20000, level_tape=None, shared_space=None, physics_profile=None, render_mode=RenderModes.Human, observation_mode=ObservationModes.Features):
         display_size = (1300, 800)
         self.game_size = (display_size[0], display_size[1] - self.SCORE_BAR_SIZE)
-        self.environment_update_intervall = 1/50
+        self.physics_profile = self.PHYSICS_PROFILES[self.PHYSICS_PROFILE if physics_profile is None else physics_profile]
+        self.environment_update_intervall = self.physics_profile['frame_time']
         self.eval = eval
-        self.skipp_frames = 5
+        self.skipp_frames = self.physics_profile['frames']
+        # The camera speeds up every 9 seconds
+        self.scroll_speedup_frames = round(450 * Auto.REFERENCE_FRAME_TIME / self.environment_update_intervall)
         self.max_steps = max_steps
         self.debug_pos = False
+        # Path of a pre generated level tape, None generates obstacles while playing
+        self.level_tape = LevelTape.getInstance(level_tape) if level_tape is not None else None
 
         self.high_score = 0
         self.max_speed_reward = 0.5
         self.web_shooter_max_ammo = 10
         self.web_shooter_reload_speed_multiplier = 1.2 # Default 0.8
         self.web_shooter_current_ammo = self.web_shooter_max_ammo
+        # Next episode's world built ahead of time by prepare_reset, swapped in by reset
+        self.standby_world = None
+        # Boxes and joints of the old worlds handed to the new ones, created by the first world
+        self.physics_pool = None
+        # SharedSpace this env lives in together with other envs, None gives the env a space of its own
+        self.shared_space = shared_space
+        self.instance = shared_space.add_instance() if shared_space is not None else None
+        self.observation_mode = observation_mode
+        self.pixel_sensor = None
+        self.observation_dtype = np.float32
+        if observation_mode == ObservationModes.Pixels:
+            self.pixel_sensor = PixelSensor(self.game_size, self.PIXEL_RESOLUTION, self.PIXEL_STACK)
+            self.observation_dtype = np.uint8
         self.reset()
         self.observation_space = self.get_observation_size()
         self.rope_actions = 12
         self.action_space = self.rope_actions + 2
         self.render_screen = render
+        self.render_mode = render_mode
         self.renderer = None
+        self.video_writer = None
         if render:
+            headless = render_mode == RenderModes.RgbArray
+            # The renderers import pygame, envs that do not render never load it
             if self.USE_LEGACY_RENDERER:
-                self.renderer = LegacyRenderer(display_size, self.SCORE_BAR_SIZE)
+                from Environment.Rendering.LegacyRenderer import LegacyRenderer
+                self.renderer = LegacyRenderer(display_size, self.SCORE_BAR_SIZE, headless)
             else:
-                self.renderer = GraphicsRenderer(display_size, self.SCORE_BAR_SIZE)
+                from Environment.Rendering.GraphicsRenderer import GraphicsRenderer
+                self.renderer = GraphicsRenderer(display_size, self.SCORE_BAR_SIZE, headless)
 
 
-    def reset(self):
-        self.env_space = pymunk.Space()
-        self.env_space.gravity = (0, 150)
-        self.obstaclegenerator = ObstacleGenerator(self.env_space, self.game_size)
-        self.player = PlayerController(self.env_space, (150, int((self.game_size[1]//5))))
+    def __create_world(self):
+        if self.shared_space is not None:
+            self.shared_space.remove_instance_objects(self.instance)
+            env_space = self.shared_space.space
+        else:
+            env_space = pymunk.Space()
+        env_space.gravity = (0, 150)
+        env_space.iterations = self.physics_profile['iterations']
+        if self.USE_WORLD_GEOMETRY and self.SPATIAL_HASH_CELL_SIZE is not None:
+            env_space.use_spatial_hash(self.SPATIAL_HASH_CELL_SIZE, self.SPATIAL_HASH_CELLS)
+        level_number = random.randrange(len(self.level_tape)) if self.level_tape is not None else None
+        level = self.level_tape.get_level(level_number) if self.level_tape is not None else None
+        # Every world draws from a random of its own, seeded from the global one, so restored snapshots and clones
+        # continue the same stream instead of sharing the module's
+        rng = random.Random(random.getrandbits(64))
+        if self.physics_pool is None and self.USE_PHYSICS_POOL:
+            self.physics_pool = PhysicsPool()
+        physics_pool = self.physics_pool if self.USE_PHYSICS_POOL else None
+        obstaclegenerator = ObstacleGenerator(env_space, self.game_size, level, rng, world_geometry=self.USE_WORLD_GEOMETRY, physics_pool=physics_pool, instance=self.instance)
+        player = PlayerController(env_space, (150, int((self.game_size[1]//5))), physics_pool, self.instance, rng)
+        camera = Camera(player, self.game_size)
+        # follow = Follow(camera, player)
+        auto = Auto(camera, player, self.environment_update_intervall)
+        camera.set_method(auto)
+        return env_space, obstaclegenerator, player, camera, auto, level_number
+
+    def prepare_reset(self):
+        ''' Builds the world of the next episode while the worker is idle so reset only has to swap it in. A world in a
+        shared space would be stepped with the others, so it is built by reset '''
+        if self.standby_world is None and self.shared_space is None:
+            self.standby_world = self.__create_world()
+
+    def reset(self, out=None):
+        world = self.standby_world if self.standby_world is not None else self.__create_world()
+        self.standby_world = None
+        self.env_space, self.obstaclegenerator, self.player, self.camera, self.auto, self.level_number = world
         self.roof = []
         self.obstacles = []
         self.score = 0
@@ -55,12 +134,9 @@ class SpidermanEnv:
         self.scroll_timestep = 0
         self.start_scroll = False
         self.first_net_shot = False
-        self.camera = Camera(self.player, self.game_size)
-        # self.follow = Follow(self.camera, self.player)
-        self.auto = Auto(self.camera, self.player)
-        self.camera.set_method(self.auto)
         self.web_shooter_current_ammo = self.web_shooter_max_ammo
         self.limit_actions = False
+        self.frames_without_contact = 0
 
         # Rewards
         self.touching_an_object = False
@@ -71,14 +147,45 @@ class SpidermanEnv:
             self.position_history = 30
             self.last_position_list = deque([])
 
-        return self.get_observation()
+        if self.pixel_sensor is not None:
+            self.pixel_sensor.clear()
+        return self.get_observation(out)
+
+    def get_state(self):
+        ''' Snapshot of the running episode made of tuples and numpy arrays, it can be pickled and restored any
+        number of times with set_state. Contact and joint impulses are not part of it '''
+        return {
+            "player" : self.player.get_state(),
+            "obstacles" : self.obstaclegenerator.get_state(),
+            "camera" : self.camera.get_state(),
+            "level_number" : self.level_number,
+            "episode" : (self.score, self.current_timestep, self.scroll_timestep, self.start_scroll, self.first_net_shot,
+                self.web_shooter_current_ammo, self.limit_actions, self.last_score_given_reward),
+        }
+
+    def set_state(self, state, out=None):
+        ''' Restores a snapshot from get_state into the current space and returns its observation '''
+        if state['level_number'] != self.level_number:
+            self.level_number = state['level_number']
+            self.obstaclegenerator.level = self.level_tape.get_level(self.level_number) if self.level_number is not None else None
+        self.player.set_state(state['player'])
+        self.obstaclegenerator.set_state(state['obstacles'])
+        self.camera.set_state(state['camera'])
+        (self.score, self.current_timestep, self.scroll_timestep, self.start_scroll, self.first_net_shot,
+            self.web_shooter_current_ammo, self.limit_actions, self.last_score_given_reward) = state['episode']
+        self.roof, self.obstacles = self.obstaclegenerator.roof_list, self.obstaclegenerator.obstacles_list
+        self.frames_without_contact = 0
+        self.player.ray_queries.clear()
+        if self.pixel_sensor is not None:
+            self.pixel_sensor.clear()
+        return self.get_observation(out)
 
     # Debug
     def get_closes_obstacle(self, point):
         min_distance = 1000000
         closest_obstacle = None
         for obstacle in self.obstacles:
-            distance = BodyUtils.distance_between_body_and_point(obstacle['shape'].body, point)
+            distance = obstacle.shape.bb.center().get_distance(point)
             if distance < min_distance:
                 closest_obstacle = obstacle
                 min_distance = distance
@@ -87,25 +194,46 @@ class SpidermanEnv:
     def get_observation_size(self):
         return self.get_observation().shape[1]
 
-    def update_score(self):
-        current_score = int(self.player.get_pos().x / 100)
+    def update_score(self, player_x=None):
+        player_x = self.player.get_pos().x if player_x is None else player_x
+        current_score = int(player_x / 100)
         if current_score > self.score:
             self.score = current_score
             if self.score > self.high_score:
                 self.high_score = self.score
 
-    def get_observation(self):
+    def get_observation(self, out=None):
+        ''' Writes the observation into out (a preallocated row of observation_dtype) when given, else into a new
+        (1, size) array. Pixel observations without out are a view of the frame stack of the PixelSensor '''
+        if self.pixel_sensor is not None:
+            return self.__get_pixel_observation(out)
+        if out is None:
+            out = np.empty((1, 6 + self.player.observation_size), dtype=np.float32)
+        row = out.reshape(-1)
         body : pymunk.Body = self.player.get_body()
-        observation = [
+        velocity = body.velocity
+        position = body.position
+        max_speed = self.player.max_speed * 1.3
+        row[:6] = (
             self.web_shooter_current_ammo / self.web_shooter_max_ammo,
-            body.velocity.x / (self.player.max_speed * 1.3),
-            body.velocity.y / (self.player.max_speed * 1.3),
-            math.sqrt(body.velocity.x**2 + body.velocity.y**2) / (self.player.max_speed * 1.3),
-            (body.position.x - self.camera.offset.x) / self.camera.CONST.x,
-            body.position.y / self.game_size[1]
-        ]
-        observation.extend(self.player.get_observation())
-        return np.array(observation).reshape(1, -1)
+            velocity.x / max_speed,
+            velocity.y / max_speed,
+            math.sqrt(velocity.x**2 + velocity.y**2) / max_speed,
+            (position.x - self.camera.offset.x) / self.camera.CONST.x,
+            position.y / self.game_size[1]
+        )
+        rectangles = self.obstaclegenerator.get_rectangles() if self.USE_VECTORIZED_RAYS else None
+        self.player.get_observation(rectangles, row[6:])
+        return out
+
+    def __get_pixel_observation(self, out=None):
+        body = self.player.get_body()
+        web_points = [line.target_point for line in self.player.lines]
+        observation = self.pixel_sensor.observe((self.camera.offset.x, self.camera.offset.y), self.obstaclegenerator.get_rectangles(), body.position, self.player.player_size, web_points)
+        if out is None:
+            return observation.reshape(1, -1)
+        out.reshape(-1)[:] = observation.reshape(-1)
+        return out
 
 
     ''' Colliders not currently used '''
@@ -122,22 +250,22 @@ class SpidermanEnv:
         collision_handler.separate = self.release
 
 
-    def check_lose(self):
-        position = self.player.get_pos()
+    def check_lose(self, position=None):
+        position = self.player.get_pos() if position is None else position
         return position.y > self.game_size[1] or position.x + self.player.player_size*0.2 < self.camera.offset.x
     
     # Speed and survive
-    def get_reward_and_done(self):
-        if self.check_lose():
+    def get_reward_and_done(self, position=None, velocity=None):
+        ''' position and the x velocity replace the ones of the player body when given '''
+        if self.check_lose(position):
             return -350, True
-        body = self.player.get_body()
         reward = 0
 
         if self.launched_net:
             reward -= 0.5
             self.launched_net = False
 
-        velocity = body.velocity.x
+        velocity = self.player.get_body().velocity.x if velocity is None else velocity
         if velocity > 290:
             reward += 1 / self.skipp_frames
         if velocity > 230:
@@ -150,7 +278,7 @@ class SpidermanEnv:
             reward -= 0.1 / self.skipp_frames
         return reward, False
     
-    def __step_forward(self, action):
+    def __apply_action(self, action):
         if self.first_net_shot == False:
             self.first_net_shot = not self.player.eject_net(math.radians(270), point=False)
         if action != 0:
@@ -164,37 +292,162 @@ class SpidermanEnv:
                     self.web_shooter_current_ammo -= 1
                     angle = (360 // self.rope_actions) * (action - 2)
                     self.missed_net = self.player.eject_net(math.radians(angle))
-        
+
+    def __scroll_camera(self, player_x=None):
         if self.start_scroll:
-            self.camera.scroll()
+            self.camera.scroll(player_x)
             self.scroll_timestep += 1
-            if (self.scroll_timestep + 1) % 450 == 0 and isinstance(self.camera.method, Auto):
+            if (self.scroll_timestep + 1) % self.scroll_speedup_frames == 0 and isinstance(self.camera.method, Auto):
                 self.camera.method.set_scroll_speed(self.camera.method.last_scroll_speed + 0.1)
+
+    def __update_world(self, frames=1):
         self.roof, self.obstacles = self.obstaclegenerator.step(self.camera.offset.x)
+        self.player.ray_queries.clear()
         self.player.step_nets()
-        self.update_score()
-        self.web_shooter_current_ammo += self.web_shooter_reload_speed_multiplier * self.environment_update_intervall
+        self.__update_score_and_ammo(frames)
+
+    def __update_score_and_ammo(self, frames=1, player_x=None):
+        self.update_score(player_x)
+        self.web_shooter_current_ammo += self.web_shooter_reload_speed_multiplier * self.environment_update_intervall * frames
         self.web_shooter_current_ammo = round(min(self.web_shooter_current_ammo, self.web_shooter_max_ammo), 3)
+
+    def __physics_step(self):
         self.env_space.step(self.environment_update_intervall)
+        self.__after_physics()
+
+    def __after_physics(self):
+        self.player.ray_queries.clear()
+        self.frames_without_contact = 0 if self.player.contacts != 0 else self.frames_without_contact + 1
+
+    def __can_free_fall(self):
+        # Once no contact is left in pymunk's arbiter cache the body has no solver bias velocity and nothing to warm start
+        return self.first_net_shot and len(self.player.lines) == 0 and self.frames_without_contact > self.env_space.collision_persistence
+
+    def __free_fall(self, frames):
+        ''' Runs up to frames frames without an action or pymunk. The player is moved with the same semi-implicit Euler
+        update as env_space.step, so the path is the same, up to the first frame where its bounding box touches a
+        rectangle. Obstacles spawn further right than the player can get in a step. Returns the reward of every frame
+        run and done '''
+        body = self.player.get_body()
+        dt = self.environment_update_intervall
+        gravity = self.env_space.gravity
+        x, y = body.position
+        velocity_x, velocity_y = body.velocity
+        path = []
+        for _ in range(frames):
+            x, y = x + velocity_x * dt, y + velocity_y * dt
+            velocity_x, velocity_y = velocity_x + gravity.x * dt, velocity_y + gravity.y * dt
+            path.append((x, y, velocity_x, velocity_y))
+        rectangles = self.obstaclegenerator.get_rectangles()
+        radius = self.player.player_size + self.FREE_FALL_CONTACT_MARGIN
+        x_path, y_path = [frame[0] for frame in path], [frame[1] for frame in path]
+        close = RectangleUtils.overlapping((min(x_path) - radius, min(y_path) - radius, max(x_path) + radius, max(y_path) + radius), rectangles)
+        if close.any():
+            rectangles = rectangles[close]
+            for frame, (x, y, _, _) in enumerate(path):
+                if RectangleUtils.overlapping((x - radius, y - radius, x + radius, y + radius), rectangles).any():
+                    path = path[:frame]
+                    break
+        if len(path) == 0:
+            return [], False
+
+        # Same bookkeeping as __update_world, the obstacle generator only runs on frames where it adds something and
+        # the obstacles that left the screen are removed at the end
+        rewards, done = [], False
+        player_x = body.position.x
+        angle, angular_velocity = body.angle, body.angular_velocity
+        evict_x = self.camera.offset.x
+        for x, y, velocity_x, velocity_y in path:
+            self.__scroll_camera(player_x)
+            evict_x = max(evict_x, self.camera.offset.x)
+            if self.obstaclegenerator.has_work(self.camera.offset.x):
+                self.obstaclegenerator.step(self.camera.offset.x)
+            self.__update_score_and_ammo(1, player_x)
+            player_x = x
+            angle = angle + angular_velocity * dt
+            reward, done = self.get_reward_and_done(pymunk.Vec2d(x, y), velocity_x)
+            rewards.append(reward)
+            if done:
+                break
+        self.obstaclegenerator.remove_old_obstacles(evict_x)
+        self.roof, self.obstacles = self.obstaclegenerator.roof_list, self.obstaclegenerator.obstacles_list
+        body.position = x, y
+        body.velocity = velocity_x, velocity_y
+        body.angle = angle
+        self.player.ray_queries.clear()
+        self.frames_without_contact += len(rewards)
+        return rewards, done
+
+    def __step_forward(self, action):
+        self.prepare_frame(action)
+        self.__physics_step()
         return self.get_reward_and_done()
 
-    def step(self, actions):
+    ''' Frame by frame stepping for envs in a shared space: begin_step, then per frame prepare_frame, one step of the
+    shared space and finish_frame, then end_step '''
+    def begin_step(self):
         self.launched_net = False
         self.missed_net = False
-        total_reward = 0
 
-        # Skipp frames to speed up learning
-        for _ in range(self.skipp_frames):
-            if self.render_screen:
-                self.render()
-            reward, done = self.__step_forward(actions)
-            actions = 0
+    def prepare_frame(self, action):
+        self.__apply_action(action)
+        self.__scroll_camera()
+        self.__update_world()
+
+    def finish_frame(self):
+        self.__after_physics()
+        return self.get_reward_and_done()
+
+    def __macro_step(self, action):
+        ''' Obstacles, web wrapping, score and ammo are updated once per action, the skipped frames only run the
+        camera, the physics and the reward and lose checks '''
+        self.__apply_action(action)
+        self.__scroll_camera()
+        self.__update_world(self.skipp_frames)
+        total_reward = 0
+        for frame in range(self.skipp_frames):
+            if frame != 0:
+                self.__scroll_camera()
+            self.__physics_step()
+            reward, done = self.get_reward_and_done()
             total_reward += reward
             if done:
                 break
-        
+        self.update_score()
+        return total_reward, done
+
+    def step(self, actions, out=None):
+        if self.shared_space is not None:
+            raise Exception("envs in a shared space are stepped together, see SerialEnvironment")
+        self.begin_step()
+        total_reward = 0
+
+        draw_frames = self.__draws_frames()
+        if self.USE_MACRO_STEP and not draw_frames:
+            total_reward, done = self.__macro_step(actions)
+        else:
+            # Skipp frames to speed up learning
+            frame = 0
+            while frame < self.skipp_frames:
+                if draw_frames:
+                    self.__draw_frame()
+                rewards, done = [], False
+                if self.USE_FREE_FALL and actions == 0 and not draw_frames and self.__can_free_fall():
+                    rewards, done = self.__free_fall(self.skipp_frames - frame)
+                if len(rewards) == 0:
+                    reward, done = self.__step_forward(actions)
+                    rewards = [reward]
+                actions = 0
+                frame += len(rewards)
+                for reward in rewards:
+                    total_reward += reward
+                if done:
+                    break
+        return self.end_step(total_reward, done, out)
+
+    def end_step(self, total_reward, done, out=None):
         self.current_timestep += 1
-        observation = self.get_observation()
+        observation = self.get_observation(out)
         self.limit_actions = len(self.player.lines) >= 2
         info = {
          'score' : self.score
@@ -214,7 +467,23 @@ class SpidermanEnv:
         #     print("timesteps:", self.current_timestep)
         return observation, total_reward, done, info
 
+    def __draws_frames(self):
+        ''' A window shows every frame, offscreen only the recorded frames are drawn '''
+        return self.render_screen and (self.render_mode == RenderModes.Human or self.video_writer is not None)
+
+    def __draw_frame(self):
+        self.__draw()
+        if self.video_writer is not None:
+            self.video_writer.write(self.renderer.get_frame())
+
     def render(self):
+        ''' Draws the current frame, with RenderModes.RgbArray it is returned as a (height, width, 3) uint8 array '''
+        self.__draw()
+        if self.render_mode == RenderModes.RgbArray:
+            return self.renderer.get_frame()
+        return None
+
+    def __draw(self):
         if self.renderer is None:
             raise Exception("environment must be set to visual in order to render")
         render_objects = [  
@@ -234,5 +503,21 @@ class SpidermanEnv:
             debug = self.last_position_list[0]
         self.renderer.render(render_dict, self.score, self.high_score, debug)
 
+    def start_recording(self, path):
+        ''' Writes every rendered frame to path on a background thread, see VideoWriter '''
+        if self.renderer is None:
+            raise Exception("environment must be set to visual in order to record")
+        self.stop_recording()
+        from Environment.Rendering.VideoWriter import VideoWriter
+        self.video_writer = VideoWriter(path, round(1 / self.environment_update_intervall))
+
+    def stop_recording(self):
+        if self.video_writer is not None:
+            self.video_writer.close()
+        self.video_writer = None
+
+    def close(self):
+        self.stop_recording()
+
     
     
\ No newline at end of file
@@ -0,0 +1,12 @@
+''' Something in the world the renderers draw: the pymunk shape (or joint for webs), its size, how it is drawn and
+what it is. Slotted, obstacles are created and looked up every frame '''
+
+class Entity:
+
+    __slots__ = ("shape", "size", "draw_shape", "type")
+
+    def __init__(self, shape, size, draw_shape, type):
+        self.shape = shape
+        self.size = size
+        self.draw_shape = draw_shape
+        self.type = type
@@ -0,0 +1,6 @@
+
+from enum import Enum
+
+class ObservationModes(Enum):
+    Features = 1 # Player state and ray distances as float32
+    Pixels = 2 # Stacked uint8 frames of the camera view, see Environment/Utils/PixelSensor.py
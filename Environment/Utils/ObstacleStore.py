@@ -0,0 +1,75 @@
+import numpy as np
+
+
+''' Obstacles kept sorted by their center x. Rectangles live in one array so clearance checks and ray casts are
+vectorized, lookups by x use a binary search and old obstacles are dropped by moving the start index. '''
+
+class ObstacleStore:
+
+    def __init__(self, capacity=64):
+        self.rectangles = np.empty((capacity, 4))
+        self.center_x = np.empty(capacity)
+        self.objects = [None] * capacity
+        self.start = 0
+        self.end = 0
+        self.objects_view = []
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __make_room(self):
+        count = len(self)
+        if self.start >= len(self.objects) // 2:
+            # Compact to the front, at least half the array is free afterwards so this stays amortized constant time
+            self.rectangles[:count] = self.rectangles[self.start:self.end]
+            self.center_x[:count] = self.center_x[self.start:self.end]
+            self.objects[:count] = self.objects[self.start:self.end]
+            self.objects[count:self.end] = [None] * (self.end - count)
+            self.start, self.end = 0, count
+        else:
+            capacity = len(self.objects) * 2
+            self.rectangles = np.resize(self.rectangles, (capacity, 4))
+            self.center_x = np.resize(self.center_x, capacity)
+            self.objects.extend([None] * (capacity - len(self.objects)))
+
+    def insert(self, rectangle, object):
+        if self.end == len(self.objects):
+            self.__make_room()
+        center_x = (rectangle[0] + rectangle[2]) / 2
+        # Obstacles are spawned at the right edge so this is an append except for the first ones
+        i = self.end
+        if len(self) != 0 and center_x < self.center_x[self.end - 1]:
+            i = self.start + int(np.searchsorted(self.center_x[self.start:self.end], center_x, side='right'))
+            self.rectangles[i + 1:self.end + 1] = self.rectangles[i:self.end]
+            self.center_x[i + 1:self.end + 1] = self.center_x[i:self.end]
+            self.objects[i + 1:self.end + 1] = self.objects[i:self.end]
+        self.rectangles[i] = rectangle
+        self.center_x[i] = center_x
+        self.objects[i] = object
+        self.end += 1
+        self.objects_view = None
+
+    def evict_before(self, x):
+        ''' Removes every obstacle with its center left of x and returns them '''
+        count = int(np.searchsorted(self.center_x[self.start:self.end], x, side='left'))
+        if count == 0:
+            return []
+        evicted = self.objects[self.start:self.start + count]
+        self.objects[self.start:self.start + count] = [None] * count
+        self.start += count
+        self.objects_view = None
+        return evicted
+
+    def window(self, left_x, right_x=np.inf):
+        ''' Rectangles of the obstacles with left_x < center x <= right_x '''
+        first = self.start + int(np.searchsorted(self.center_x[self.start:self.end], left_x, side='right'))
+        last = self.start + int(np.searchsorted(self.center_x[self.start:self.end], right_x, side='right'))
+        return self.rectangles[first:last]
+
+    def get_rectangles(self):
+        return self.rectangles[self.start:self.end]
+
+    def get_objects(self):
+        if self.objects_view is None:
+            self.objects_view = self.objects[self.start:self.end]
+        return self.objects_view
@@ -0,0 +1,67 @@
+import pymunk
+
+
+''' Keeps the static boxes and web anchors that were taken out of a space and hands them out again, moved and resized,
+instead of allocating new cffi backed bodies and shapes. The caller still adds and removes them from the space. An env
+keeps its pool across resets, boxes of an old space are only reused where they fit the new one. Counts what was
+allocated and what was reused. '''
+
+class PhysicsPool:
+
+    def __init__(self):
+        self.free_boxes = []
+        self.free_anchors = []
+        self.allocations = 0
+        self.allocations_avoided = 0
+
+    def get_counters(self):
+        return {
+            "allocations" : self.allocations,
+            "allocations_avoided" : self.allocations_avoided,
+        }
+
+    def acquire_box(self, pos, size, shared_body=None):
+        ''' Box shape of size centered at pos, on its own static body or as world coordinates on shared_body '''
+        left, top = pos[0] - size[0] / 2, pos[1] - size[1] / 2
+        right, bottom = pos[0] + size[0] / 2, pos[1] + size[1] / 2
+        # A pool belongs to one env so the free boxes are all of the same kind as the requested one, but boxes on the
+        # shared body of an earlier space can not be moved to another body
+        while len(self.free_boxes) != 0:
+            shape, body = self.free_boxes.pop()
+            if shared_body is not None and body is not shared_body:
+                continue
+            if shared_body is None:
+                body.position = pos
+                left, top, right, bottom = left - pos[0], top - pos[1], right - pos[0], bottom - pos[1]
+            # Same vertex order as Poly.create_box, a different first vertex can change the contacts
+            shape.unsafe_set_vertices([(right, top), (right, bottom), (left, bottom), (left, top)])
+            self.allocations_avoided += 2 if shared_body is None else 1
+            return shape
+        if shared_body is None:
+            body = pymunk.Body(body_type=pymunk.Body.STATIC)
+            body.position = pos
+            self.allocations += 2
+            return pymunk.Poly.create_box(body, size)
+        self.allocations += 1
+        return pymunk.Poly.create_box_bb(shared_body, pymunk.BB(left, top, right, bottom))
+
+    def release_box(self, shape):
+        # Shapes only keep a weak reference to their body
+        self.free_boxes.append((shape, shape.body))
+
+    def acquire_joint(self, body, target_point, distance):
+        ''' Slide joint of max length distance from the center of body to a static anchor at target_point '''
+        # Only the anchor is reused, a reused joint would warm start with the impulse it accumulated and move the player
+        # differently than a new joint, and pymunk has no way to clear it
+        if len(self.free_anchors) != 0:
+            target = self.free_anchors.pop()
+            self.allocations_avoided += 1
+        else:
+            target = pymunk.Body(body_type=pymunk.Body.STATIC)
+            self.allocations += 1
+        target.position = target_point
+        self.allocations += 1
+        return pymunk.SlideJoint(body, target, (0, 0), (0, 0), 0, distance)
+
+    def release_joint(self, joint):
+        self.free_anchors.append(joint.b)
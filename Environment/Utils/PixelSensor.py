@@ -0,0 +1,102 @@
+import math
+import numpy as np
+
+
+''' Rasterizes the camera view into a small uint8 image with numpy fills, without pygame or a display. Rectangles are
+[left, top, right, bottom] rows like in RaySensor. The latest frames are kept in one buffer and a stacked observation
+is a view of it, so consecutive observations share their frames. A returned stack stays unchanged while at least the
+next (BUFFERED_STACKS - 3) * stack frames are drawn, one per observation and stack for the first one of an episode,
+keep a copy to hold on to it longer. '''
+
+class PixelSensor:
+
+    OBSTACLE_VALUE = 255
+    PLAYER_VALUE = 170
+    WEB_VALUE = 85
+    BUFFERED_STACKS = 8
+
+    def __init__(self, view_size, resolution=(96, 54), stack=4):
+        self.resolution = resolution
+        self.stack = stack
+        width, height = resolution
+        self.scale = np.array((width / view_size[0], height / view_size[1]))
+        # View coordinates of the pixel centers
+        self.pixel_x = (np.arange(width) + 0.5) / self.scale[0]
+        self.pixel_y = (np.arange(height) + 0.5) / self.scale[1]
+        self.frames = np.zeros((self.BUFFERED_STACKS * stack, height, width), dtype=np.uint8)
+        self.index = stack - 1
+        self.new_episode = True
+
+    def get_observation_size(self):
+        return self.stack * self.resolution[0] * self.resolution[1]
+
+    def clear(self):
+        ''' The next observation starts a new episode, its stack is filled with its first frame '''
+        self.new_episode = True
+
+    def observe(self, offset, rectangles, player_position, player_radius, web_points):
+        ''' Draws the newest frame and returns the last stack frames as a (stack, height, width) view '''
+        # The first stack of an episode takes fresh slots, the stack before it may be a terminal observation still in use
+        frame = self.__next_frame(self.stack if self.new_episode else 1)
+        self.__draw_rectangles(frame, np.asarray(rectangles, dtype=np.float64).reshape(-1, 4), offset)
+        self.__draw_webs(frame, player_position, web_points, offset)
+        self.__draw_circle(frame, player_position, player_radius, offset)
+        if self.new_episode:
+            self.frames[self.index - self.stack + 1:self.index] = frame
+            self.new_episode = False
+        return self.frames[self.index - self.stack + 1:self.index + 1]
+
+    def __next_frame(self, new_frames):
+        ''' Moves past new_frames slots and returns the last one cleared '''
+        if self.index + new_frames >= len(self.frames):
+            # Move the frames the next stacks still need to the front, once every BUFFERED_STACKS stacks
+            kept = self.stack - new_frames
+            self.frames[:kept] = self.frames[self.index - kept + 1:self.index + 1]
+            self.index = kept - 1
+        self.index += new_frames
+        frame = self.frames[self.index]
+        frame.fill(0)
+        return frame
+
+    def __draw_rectangles(self, frame, rectangles, offset):
+        if len(rectangles) == 0:
+            return
+        # A pixel is covered when its center is inside a rectangle, rows (M, H) x columns (M, W)
+        columns = (self.pixel_x >= rectangles[:, 0:1] - offset[0]) & (self.pixel_x < rectangles[:, 2:3] - offset[0])
+        rows = (self.pixel_y >= rectangles[:, 1:2] - offset[1]) & (self.pixel_y < rectangles[:, 3:4] - offset[1])
+        covered = np.dot(rows.T.astype(np.float32), columns.astype(np.float32))
+        frame[covered > 0] = self.OBSTACLE_VALUE
+
+    def __draw_circle(self, frame, position, radius, offset):
+        x, y = position[0] - offset[0], position[1] - offset[1]
+        # Only the pixels of the bounding box of the circle are tested
+        left, right = self.__pixel_range(x - radius, x + radius, self.scale[0], frame.shape[1])
+        top, bottom = self.__pixel_range(y - radius, y + radius, self.scale[1], frame.shape[0])
+        if left >= right or top >= bottom:
+            return
+        inside = ((self.pixel_y[top:bottom, None] - y)**2 + (self.pixel_x[None, left:right] - x)**2) <= radius**2
+        box = frame[top:bottom, left:right]
+        box[inside] = self.PLAYER_VALUE
+        # Keep a player smaller than a pixel visible
+        column, row = math.floor(x * self.scale[0]), math.floor(y * self.scale[1])
+        if 0 <= column < frame.shape[1] and 0 <= row < frame.shape[0]:
+            frame[row, column] = self.PLAYER_VALUE
+
+    def __pixel_range(self, low, high, scale, size):
+        return min(max(math.floor(low * scale), 0), size), min(max(math.floor(high * scale) + 1, 0), size)
+
+    def __draw_webs(self, frame, position, web_points, offset):
+        if len(web_points) == 0:
+            return
+        starts = np.array([position[0] - offset[0], position[1] - offset[1]])
+        ends = np.asarray(web_points, dtype=np.float64).reshape(-1, 2) - offset
+        # One sample per pixel along the longest axis of the longest web
+        samples = int(np.abs((ends - starts) * self.scale).max()) + 2
+        fractions = (np.arange(samples) / (samples - 1))[None, :, None]
+        points = starts + (ends[:, None, :] - starts) * fractions
+        self.__set_pixels(frame, points.reshape(-1, 2), self.WEB_VALUE)
+
+    def __set_pixels(self, frame, points, value):
+        pixels = np.floor(points * self.scale).astype(np.int64)
+        visible = (pixels[:, 0] >= 0) & (pixels[:, 0] < frame.shape[1]) & (pixels[:, 1] >= 0) & (pixels[:, 1] < frame.shape[0])
+        frame[pixels[visible, 1], pixels[visible, 0]] = value
@@ -0,0 +1,81 @@
+import math
+import pymunk
+import numpy as np
+from Environment.Utils.RaySensor import RaySensor
+
+
+''' All segment queries of the player go through here. The player and the world shapes have their own collision
+categories so pymunk leaves the player out of the queries, only the nearest hit is asked for and the hits are kept
+until clear is called after the world changed, so web shots along an observation ray reuse the observation hit.
+Envs sharing one space (see SharedSpace) pass their instance number and get two categories of their own. '''
+
+class RayQueryService:
+
+    PLAYER_CATEGORY = 0b01
+    WORLD_CATEGORY = 0b10
+    PLAYER_FILTER = pymunk.ShapeFilter(categories=PLAYER_CATEGORY)
+    WORLD_FILTER = pymunk.ShapeFilter(categories=WORLD_CATEGORY)
+    QUERY_FILTER = pymunk.ShapeFilter(mask=WORLD_CATEGORY)
+    MAX_INSTANCES = 16 # Two of the 32 categories per instance
+
+    def __init__(self, env_space, number_of_rays=24, max_range=1000, ray_radius=1, instance=None):
+        self.env_space = env_space
+        _, _, self.query_filter = RayQueryService.get_filters(instance)
+        self.max_range = max_range
+        self.ray_radius = ray_radius
+        self.ray_sensor = RaySensor(number_of_rays, max_range, ray_radius)
+        self.ray_angles = [math.radians(360/number_of_rays * i) for i in range(number_of_rays)]
+        self.hits = {}
+        self.ray_origin = None
+        self.ray_distances = None
+        self.ray_points = None
+
+    @staticmethod
+    def get_instance_categories(instance):
+        if instance >= RayQueryService.MAX_INSTANCES:
+            raise Exception("a shared space holds at most %d instances" % RayQueryService.MAX_INSTANCES)
+        return RayQueryService.PLAYER_CATEGORY << 2 * instance, RayQueryService.WORLD_CATEGORY << 2 * instance
+
+    @staticmethod
+    def get_filters(instance=None):
+        ''' Player, world and query filter, the ones of an instance only collide and query within the instance '''
+        if instance is None:
+            return RayQueryService.PLAYER_FILTER, RayQueryService.WORLD_FILTER, RayQueryService.QUERY_FILTER
+        player, world = RayQueryService.get_instance_categories(instance)
+        return pymunk.ShapeFilter(categories=player, mask=world), pymunk.ShapeFilter(categories=world, mask=player), pymunk.ShapeFilter(mask=world)
+
+    def clear(self):
+        self.hits.clear()
+        self.ray_origin = None
+
+    def get_first_hit(self, start, end):
+        ''' Nearest point of a world shape on the segment from start to end, None when nothing is hit '''
+        key = (tuple(start), tuple(end))
+        if key not in self.hits:
+            query = self.env_space.segment_query_first(start, end, self.ray_radius, self.query_filter)
+            self.hits[key] = query.point if query is not None else None
+        return self.hits[key]
+
+    def get_rays(self, origin, rectangles=None):
+        ''' Distance to the nearest hit of every sensor ray, inf for a miss. The rays are cast against the rectangles
+        in one numpy pass when given, else with one pymunk query per ray '''
+        origin = tuple(origin)
+        if rectangles is not None:
+            distances, points = self.ray_sensor.cast(origin, rectangles[None])
+            self.ray_distances, self.ray_points = distances[0], points[0]
+        else:
+            ends = self.ray_sensor.ray_offsets + origin
+            hits = [self.get_first_hit(origin, end) for end in map(tuple, ends.tolist())]
+            self.ray_points = np.array([hit if hit is not None else (np.nan, np.nan) for hit in hits])
+            self.ray_distances = np.array([math.hypot(hit[0] - origin[0], hit[1] - origin[1]) if hit is not None else RaySensor.NO_HIT for hit in hits])
+        self.ray_origin = origin
+        return self.ray_distances.copy()
+
+    def get_hit_at_angle(self, origin, angle):
+        ''' Nearest hit of a max range ray, taken from the last get_rays when it is one of the sensor rays '''
+        origin = tuple(origin)
+        index = self.ray_sensor.ray_index_from_angle(angle)
+        if self.ray_origin == origin and self.ray_angles[index] == angle:
+            return pymunk.Vec2d(*self.ray_points[index]) if np.isfinite(self.ray_distances[index]) else None
+        end = (origin[0] + int(math.cos(angle) * self.max_range), origin[1] + int(math.sin(angle) * self.max_range))
+        return self.get_first_hit(origin, end)
@@ -0,0 +1,76 @@
+import math
+import numpy as np
+
+
+''' Casts all sensor rays against axis aligned rectangles in one numpy pass instead of one pymunk segment query per ray.
+Rectangles are given as [left, top, right, bottom] rows, the same layout is used by every caller. '''
+
+class RaySensor:
+
+    NO_HIT = np.inf
+
+    def __init__(self, number_of_rays=24, max_range=1000, ray_radius=1):
+        self.number_of_rays = number_of_rays
+        self.max_range = max_range
+        self.ray_radius = ray_radius
+        # Same truncation as the pymunk queries so the ray end points are identical
+        self.ray_offsets = np.array([
+            (int(math.cos(math.radians(360/number_of_rays * i)) * max_range),
+             int(math.sin(math.radians(360/number_of_rays * i)) * max_range))
+            for i in range(number_of_rays)
+        ], dtype=np.float64)
+
+    def ray_index_from_angle(self, angle):
+        return int(round(math.degrees(angle) / (360 / self.number_of_rays))) % self.number_of_rays
+
+    def cast(self, origins, rectangles, mask=None):
+        ''' origins (B, 2), rectangles (B, M, 4) -> distances (B, R) and hit points (B, R, 2) '''
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+        starts = np.broadcast_to(origins[:, None, :], (origins.shape[0], self.number_of_rays, 2))
+        ends = starts + self.ray_offsets[None, :, :]
+        fractions, points = self.cast_segments(starts, ends, rectangles, mask)
+        distances = np.where(np.isfinite(fractions), np.hypot(points[..., 0] - starts[..., 0], points[..., 1] - starts[..., 1]), self.NO_HIT)
+        return distances, points
+
+    def cast_segments(self, starts, ends, rectangles, mask=None):
+        ''' starts/ends (B, K, 2), rectangles (B, M, 4) -> segment fraction of the first hit (B, K) and hit points (B, K, 2) '''
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        rectangles = np.asarray(rectangles, dtype=np.float64)
+        if rectangles.ndim == 2:
+            rectangles = np.broadcast_to(rectangles[None], (starts.shape[0],) + rectangles.shape)
+        batch, number_of_segments = starts.shape[0], starts.shape[1]
+        if rectangles.shape[1] == 0:
+            return np.full((batch, number_of_segments), self.NO_HIT), np.full((batch, number_of_segments, 2), np.nan)
+
+        origin = starts[:, :, None, :]
+        direction = (ends - starts)[:, :, None, :]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            inverse = 1.0 / direction
+            t_low = (rectangles[:, None, :, 0:2] - origin) * inverse
+            t_high = (rectangles[:, None, :, 2:4] - origin) * inverse
+            # A segment parallel to an axis gives +-inf, fmin/fmax skip the nan of a start exactly on the edge
+            t_near = np.fmin(t_low, t_high)
+            t_far = np.fmax(t_low, t_high)
+            # pymunk only tests shapes whose bounding box the bare segment crosses, the query radius then thickens the
+            # segment which is the same as growing the rectangle by that radius
+            t_near_thick = t_near - self.ray_radius * np.abs(inverse)
+        raw_enter = np.maximum(t_near[..., 0], t_near[..., 1])
+        raw_exit = np.minimum(t_far[..., 0], t_far[..., 1])
+        t_enter = np.maximum(t_near_thick[..., 0], t_near_thick[..., 1])
+
+        hit = (raw_enter <= raw_exit) & (raw_exit >= 0) & (raw_enter <= 1)
+        if mask is not None:
+            hit &= np.asarray(mask, dtype=bool)[:, None, :]
+        t_enter = np.where(hit, np.maximum(t_enter, 0), np.inf)
+
+        closest = np.argmin(t_enter, axis=-1)
+        fractions = np.take_along_axis(t_enter, closest[..., None], axis=-1)[..., 0]
+
+        # The reported point lies on the rectangle itself, moved back from the thick segment along the face normal
+        x_face = np.take_along_axis(t_near_thick[..., 0] >= t_near_thick[..., 1], closest[..., None], axis=-1)[..., 0]
+        segment_direction = ends - starts
+        points = starts + segment_direction * np.where(np.isfinite(fractions), fractions, np.nan)[..., None]
+        points[..., 0] += np.where(x_face, np.sign(segment_direction[..., 0]) * self.ray_radius, 0)
+        points[..., 1] += np.where(x_face, 0, np.sign(segment_direction[..., 1]) * self.ray_radius)
+        return fractions, points
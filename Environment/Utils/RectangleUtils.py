@@ -0,0 +1,24 @@
+import numpy as np
+
+
+''' Numpy helpers for axis aligned rectangles stored as [left, top, right, bottom] rows '''
+
+class RectangleUtils:
+
+    @staticmethod
+    def from_center(center, size, integer_half_size=False):
+        half_size = np.asarray(size) // 2 if integer_half_size else np.asarray(size) / 2
+        return np.array([center[0] - half_size[0], center[1] - half_size[1], center[0] + half_size[0], center[1] + half_size[1]], dtype=np.float64)
+
+    @staticmethod
+    def closest_distance(rectangle, rectangles):
+        ''' Same result as ComputeClosestDistance, gap along one axis when the other overlaps, else the corner distance '''
+        rectangles = np.asarray(rectangles, dtype=np.float64)
+        x_gap = np.maximum(np.maximum(rectangles[..., 0] - rectangle[..., 2], rectangle[..., 0] - rectangles[..., 2]), 0)
+        y_gap = np.maximum(np.maximum(rectangles[..., 1] - rectangle[..., 3], rectangle[..., 1] - rectangles[..., 3]), 0)
+        return np.hypot(x_gap, y_gap)
+
+    @staticmethod
+    def overlapping(rectangle, rectangles):
+        ''' Mask of the rectangles that overlap or touch rectangle '''
+        return (rectangles[:, 0] <= rectangle[2]) & (rectangles[:, 2] >= rectangle[0]) & (rectangles[:, 1] <= rectangle[3]) & (rectangles[:, 3] >= rectangle[1])
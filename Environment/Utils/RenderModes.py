@@ -0,0 +1,6 @@
+
+from enum import Enum
+
+class RenderModes(Enum):
+    Human = "human" # A window at a capped frame rate
+    RgbArray = "rgb_array" # Offscreen without a frame rate cap, render returns the frame
@@ -0,0 +1,15 @@
+from Environment.Utils.Entity import Entity
+from Environment.Utils.ObjectShapes import ObjectShapes
+from Environment.Utils.ObjectType import ObjectType
+
+
+''' A web of the player, the joint is the shape. Keeps the point it is attached to and the time step it was shot at '''
+
+class Web(Entity):
+
+    __slots__ = ("target_point", "applied_time_step")
+
+    def __init__(self, joint, target_point, applied_time_step, size=4):
+        Entity.__init__(self, joint, size, ObjectShapes.Line, ObjectType.Net)
+        self.target_point = target_point
+        self.applied_time_step = applied_time_step
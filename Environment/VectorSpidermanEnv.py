@@ -0,0 +1,385 @@
+import math
+import random
+import numpy as np
+from Environment.Utils.RaySensor import RaySensor
+from Environment.Utils.RectangleUtils import RectangleUtils
+
+
+''' Runs N Spiderman games in lockstep with the whole state kept in numpy arrays (one row per game).
+The physics is a small rigid body solver for one circle, two slide joints and axis aligned boxes that follows
+the same step order as pymunk (positions, then gravity, then iterative velocity constraints with bias), so the
+games match SpidermanEnv closely but not bit for bit. Finished games are reset inside step like SerialEnvironment. '''
+
+class VectorSpidermanEnv:
+
+    MAX_OBSTACLES = 32
+    ROOF_INDEX = 0
+    MAX_WEBS = 2
+    ROOF_SIZE = 40
+    ROOF_LENGTH = 1e7
+    SCORE_BAR_SIZE = 85
+
+    def __init__(self, n_envs, max_steps=20000, seed=None):
+        display_size = (1300, 800)
+        self.n_envs = n_envs
+        self.game_size = (display_size[0], display_size[1] - self.SCORE_BAR_SIZE)
+        self.environment_update_intervall = 1/50
+        self.skipp_frames = 5
+        self.max_steps = max_steps
+        self.gravity = np.array([0, 150], dtype=np.float64)
+        self.solver_iterations = 10
+        self.collision_slop = 0.1
+        self.error_bias_coefficient = 1 - math.pow(math.pow(1 - 0.1, 60), self.environment_update_intervall)
+
+        # Player
+        self.player_size = 20
+        self.max_speed = 600
+        self.max_web_range = 1000
+        self.number_of_rays = 24
+        self.ray_sensor = RaySensor(self.number_of_rays, self.max_web_range)
+        # Ammo, velocity, speed and position, sin, cos and distance per web and the rays, as SpidermanEnv lays them out
+        self.observation_size = 6 + 3 * self.MAX_WEBS + self.number_of_rays
+
+        # Web shooter
+        self.web_shooter_max_ammo = 10
+        self.web_shooter_reload_speed_multiplier = 1.2
+        self.rope_actions = 12
+        self.action_space = self.rope_actions + 2
+
+        # Obstacles, same values as ObstacleGenerator
+        self.min_empty_distance = 150
+        self.max_obstacle_side_length = 600
+        self.min_obstacle_side_length = 35
+        self.obstacle_fequency_pixels = 200
+        self.start_obstacles = [
+            ((400, 300), (50, 200)),
+            ((75, self.game_size[1] - 50), (50, 100)),
+            ((1150, self.game_size[1] - 60), (50, 250)),
+        ]
+
+        # Camera, same values as Auto
+        self.camera_const_x = 300
+        self.max_scroll_speed = 2.4
+        self.start_scroll_speed = 0.4
+
+        n = n_envs
+        self.position = np.zeros((n, 2))
+        self.velocity = np.zeros((n, 2))
+        self.web_anchor = np.zeros((n, self.MAX_WEBS, 2))
+        self.web_length = np.zeros((n, self.MAX_WEBS))
+        self.web_time_step = np.zeros((n, self.MAX_WEBS), dtype=np.int64)
+        self.web_active = np.zeros((n, self.MAX_WEBS), dtype=bool)
+        self.net_time_step = np.zeros(n, dtype=np.int64)
+        self.obstacles = np.zeros((n, self.MAX_OBSTACLES + 1, 4))
+        self.obstacles[:, self.ROOF_INDEX] = (-self.ROOF_LENGTH, 0, self.ROOF_LENGTH, self.ROOF_SIZE)
+        self.obstacle_valid = np.zeros((n, self.MAX_OBSTACLES + 1), dtype=bool)
+        self.last_obstacle_addition = np.zeros(n)
+        self.offset_float = np.zeros(n)
+        self.offset = np.zeros(n)
+        self.scroll_speed = np.zeros(n)
+        self.float_speed = np.zeros(n)
+        self.scroll_timestep = np.zeros(n, dtype=np.int64)
+        self.start_scroll = np.zeros(n, dtype=bool)
+        self.first_net_shot = np.zeros(n, dtype=bool)
+        self.web_shooter_current_ammo = np.zeros(n)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.high_score = 0
+        self.current_timestep = np.zeros(n, dtype=np.int64)
+        self.rewards = np.zeros(n)
+
+        # Game i draws the same numbers as a SpidermanEnv reset after random.seed(seed + i), whose world random is
+        # seeded from the global one
+        self.rngs = [random.Random(None if seed is None else random.Random(seed + i).getrandbits(64)) for i in range(n)]
+        self.observation_space = self.reset().shape[1]
+
+    # -------------------------------------------------------------------------
+    # Reset
+
+    def __reset_env(self, i):
+        rng = self.rngs[i]
+        x_variation = int(rng.random() * 150) - 50
+        y_variation = int(rng.random() * 100) - 40
+        self.position[i] = (150 + x_variation, int(self.game_size[1]//5) + y_variation)
+        self.velocity[i] = 0
+        self.web_active[i] = False
+        self.net_time_step[i] = 0
+        # The roof is only created on the first step, same as ObstacleGenerator.update_roof
+        self.obstacle_valid[i] = False
+        for j, (pos, size) in enumerate(self.start_obstacles):
+            self.obstacles[i, j + 1] = RectangleUtils.from_center(pos, size)
+            self.obstacle_valid[i, j + 1] = True
+        self.last_obstacle_addition[i] = 0
+        self.offset_float[i] = 0
+        self.offset[i] = 0
+        self.scroll_speed[i] = self.start_scroll_speed
+        self.float_speed[i] = self.max_scroll_speed * self.start_scroll_speed
+        self.scroll_timestep[i] = 0
+        self.start_scroll[i] = False
+        self.first_net_shot[i] = False
+        self.web_shooter_current_ammo[i] = self.web_shooter_max_ammo
+        self.score[i] = 0
+        self.current_timestep[i] = 0
+        self.rewards[i] = 0
+
+    def reset(self):
+        for i in range(self.n_envs):
+            self.__reset_env(i)
+        return self.get_observation()
+
+    # -------------------------------------------------------------------------
+    # Webs
+
+    def __get_obstacles(self, env_ids=slice(None)):
+        # New obstacles take the first free slot, so the columns after the last used one can be skipped
+        used_columns = np.nonzero(self.obstacle_valid.any(axis=0))[0]
+        columns = used_columns[-1] + 1 if len(used_columns) != 0 else 1
+        return self.obstacles[env_ids, :columns], self.obstacle_valid[env_ids, :columns]
+
+    def __eject_nets(self, env_ids, ray_ids):
+        ''' Shoots one web per env along the given observation ray, returns which envs hit something '''
+        starts = self.position[env_ids][:, None, :]
+        ends = starts + self.ray_sensor.ray_offsets[ray_ids][:, None, :]
+        fractions, points = self.ray_sensor.cast_segments(starts, ends, *self.__get_obstacles(env_ids))
+        hit = np.isfinite(fractions[:, 0]) & (self.web_active[env_ids].sum(axis=1) < self.MAX_WEBS)
+        env_ids, points = env_ids[hit], points[hit, 0]
+        slots = self.web_active[env_ids].sum(axis=1)
+        self.web_anchor[env_ids, slots] = points
+        self.web_length[env_ids, slots] = np.hypot(*(self.position[env_ids] - points).T)
+        self.web_time_step[env_ids, slots] = self.net_time_step[env_ids]
+        self.web_active[env_ids, slots] = True
+        return hit
+
+    def __pop_first_web(self, env_ids):
+        # Webs are kept ordered by the time they were applied so the first slot is always the earliest one
+        self.web_anchor[env_ids, 0] = self.web_anchor[env_ids, 1]
+        self.web_length[env_ids, 0] = self.web_length[env_ids, 1]
+        self.web_time_step[env_ids, 0] = self.web_time_step[env_ids, 1]
+        self.web_active[env_ids, 0] = self.web_active[env_ids, 1]
+        self.web_active[env_ids, 1] = False
+
+    def __release_nets(self, env_ids):
+        web_count = self.web_active[env_ids].sum(axis=1)
+        env_ids = env_ids[web_count > 0]
+        single_web = self.web_active[env_ids].sum(axis=1) == 1
+        release_ids = env_ids[single_web]
+        release_pos = self.web_anchor[release_ids, 0].copy()
+        self.__pop_first_web(env_ids)
+
+        velocity = self.velocity[release_ids]
+        position = self.position[release_ids]
+        angle = np.degrees(np.arctan2(position[:, 1] - release_pos[:, 1], position[:, 0] - release_pos[:, 0]))
+        pullup = (velocity[:, 0] < 20) & (angle >= 85) & (angle <= 105) & (velocity[:, 1] <= 150)
+        self.velocity[release_ids[pullup], 1] = -150
+
+        boost_ids = release_ids[~pullup]
+        velocity = velocity[~pullup]
+        speed = np.minimum(np.hypot(velocity[:, 0], velocity[:, 1]), self.max_speed)
+        angle = np.arctan2(velocity[:, 1], velocity[:, 0])
+        new_speed = np.minimum(speed * 1.25, self.max_speed)
+        self.velocity[boost_ids] = np.trunc(np.stack([np.cos(angle) * new_speed, np.sin(angle) * new_speed], axis=1))
+
+    def __step_nets(self):
+        has_webs = self.web_active.any(axis=1)
+        if not has_webs.any():
+            return
+        env_ids = np.nonzero(has_webs)[0]
+        starts = np.repeat(self.position[env_ids][:, None, :], self.MAX_WEBS, axis=1)
+        anchors = self.web_anchor[env_ids]
+        fractions, points = self.ray_sensor.cast_segments(starts, anchors, *self.__get_obstacles(env_ids))
+        anchor_distance = np.hypot(*(anchors - starts).transpose(2, 0, 1))
+        hit_distance = np.hypot(*(points - starts).transpose(2, 0, 1))
+        wrap = self.web_active[env_ids] & np.isfinite(fractions) & (hit_distance < anchor_distance)
+
+        # Like PlayerController.step_nets only the first wrapping web is moved each frame
+        wrap_envs = wrap.any(axis=1)
+        slots = np.argmax(wrap, axis=1)[wrap_envs]
+        wrap_ids = env_ids[wrap_envs]
+        self.web_anchor[wrap_ids, slots] = points[wrap_envs, slots]
+        self.web_length[wrap_ids, slots] = hit_distance[wrap_envs, slots]
+        self.net_time_step[env_ids] += 1
+
+    # -------------------------------------------------------------------------
+    # World
+
+    def __scroll(self):
+        ids = np.nonzero(self.start_scroll)[0]
+        self.offset_float[ids] = np.maximum(self.position[ids, 0] - self.camera_const_x, self.offset_float[ids] + self.float_speed[ids])
+        self.offset[ids] = np.round(self.offset_float[ids])
+        self.scroll_timestep[ids] += 1
+        speed_up = ids[(self.scroll_timestep[ids] + 1) % 450 == 0]
+        new_speed = np.clip(self.scroll_speed[speed_up] + 0.1, 0, 1)
+        self.scroll_speed[speed_up] = np.round(new_speed, 2)
+        self.float_speed[speed_up] = self.max_scroll_speed * new_speed
+
+    def __create_random_obstacle(self, i, left_bar, x_spawn_pos):
+        rng = self.rngs[i]
+        centers = (self.obstacles[i, 1:, 0] + self.obstacles[i, 1:, 2]) / 2
+        close_obstacles = self.obstacles[i, 1:][self.obstacle_valid[i, 1:] & (centers > left_bar)]
+        free_slots = np.nonzero(~self.obstacle_valid[i, 1:])[0] + 1
+        if len(free_slots) == 0:
+            return
+        attempts = 15
+        for _ in range(attempts):
+            x_length = int(rng.random() * (self.max_obstacle_side_length - self.min_obstacle_side_length) + self.min_obstacle_side_length)
+            y_length = int(max(rng.random() * (self.max_obstacle_side_length - x_length - self.min_obstacle_side_length), 0) + self.min_obstacle_side_length)
+            random_y_pos = int(rng.random() * self.game_size[1])
+            candidate = RectangleUtils.from_center((x_spawn_pos, random_y_pos), (x_length, y_length), integer_half_size=True)
+            if len(close_obstacles) == 0 or RectangleUtils.closest_distance(candidate, close_obstacles).min() >= self.min_empty_distance:
+                self.obstacles[i, free_slots[0]] = RectangleUtils.from_center((x_spawn_pos, random_y_pos), (x_length, y_length))
+                self.obstacle_valid[i, free_slots[0]] = True
+                self.last_obstacle_addition[i] = x_spawn_pos
+                return
+
+    def __step_obstacles(self, active):
+        left_bar = self.offset
+        self.obstacle_valid[:, self.ROOF_INDEX] = True
+        centers = (self.obstacles[:, 1:, 0] + self.obstacles[:, 1:, 2]) / 2
+        self.obstacle_valid[:, 1:] &= centers >= (left_bar - 300)[:, None]
+        x_spawn_pos = left_bar + self.game_size[0] * 1.5
+        for i in np.nonzero(active & (x_spawn_pos > self.obstacle_fequency_pixels + self.last_obstacle_addition))[0]:
+            self.__create_random_obstacle(i, left_bar[i], x_spawn_pos[i])
+
+    # -------------------------------------------------------------------------
+    # Physics
+
+    def __solve_contacts(self):
+        ''' Circle against boxes, zero elasticity and friction like the pymunk shapes '''
+        rectangles, valid = self.__get_obstacles()
+        closest = np.clip(self.position[:, None, :], rectangles[..., 0:2], rectangles[..., 2:4])
+        delta = self.position[:, None, :] - closest
+        distance = np.hypot(delta[..., 0], delta[..., 1])
+        penetration = np.where(valid, self.player_size - distance, -np.inf)
+        contact = np.argmax(penetration, axis=1)
+        rows = np.arange(self.n_envs)
+        penetration = penetration[rows, contact]
+        touching = penetration > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normal = delta[rows, contact] / distance[rows, contact][:, None]
+        # Center inside the box, push out along the shallowest side
+        inside = touching & (distance[rows, contact] == 0)
+        if inside.any():
+            box = rectangles[rows, contact][inside]
+            pos = self.position[inside]
+            sides = np.stack([pos[:, 0] - box[:, 0], pos[:, 1] - box[:, 1], box[:, 2] - pos[:, 0], box[:, 3] - pos[:, 1]], axis=1)
+            side = np.argmin(sides, axis=1)
+            directions = np.array([[-1, 0], [0, -1], [1, 0], [0, 1]], dtype=np.float64)
+            normal[inside] = directions[side]
+            penetration[inside] = self.player_size + sides[np.arange(len(side)), side]
+        return touching, np.where(touching[:, None], normal, 0), np.where(touching, penetration, 0)
+
+    def __physics_step(self):
+        dt = self.environment_update_intervall
+        self.position += self.velocity * dt
+        touching, normal, penetration = self.__solve_contacts()
+
+        self.velocity += self.gravity * dt
+        delta = self.position[:, None, :] - self.web_anchor
+        distance = np.hypot(delta[..., 0], delta[..., 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            web_normal = np.where(distance[..., None] > 0, delta / distance[..., None], 0)
+        stretched = self.web_active & (distance > self.web_length)
+        web_bias = self.error_bias_coefficient * (distance - self.web_length) / dt
+
+        # The slide joints only pull and the contacts only push, each solved a few times since they interact
+        for _ in range(self.solver_iterations):
+            for k in range(self.MAX_WEBS):
+                radial_velocity = np.sum(self.velocity * web_normal[:, k], axis=1)
+                correction = np.where(stretched[:, k], np.maximum(radial_velocity + web_bias[:, k], 0), 0)
+                self.velocity -= correction[:, None] * web_normal[:, k]
+            normal_velocity = np.sum(self.velocity * normal, axis=1)
+            correction = np.where(touching, np.minimum(normal_velocity, 0), 0)
+            self.velocity -= correction[:, None] * normal
+
+        # pymunk resolves overlap with a separate bias velocity that only moves the position
+        self.position += normal * (self.error_bias_coefficient * np.maximum(penetration - self.collision_slop, 0))[:, None]
+
+    # -------------------------------------------------------------------------
+    # Game loop
+
+    def check_lose(self):
+        return (self.position[:, 1] > self.game_size[1]) | (self.position[:, 0] + self.player_size*0.2 < self.offset)
+
+    def get_reward_and_done(self, launched_net):
+        lost = self.check_lose()
+        velocity = self.velocity[:, 0]
+        reward = np.where(launched_net, -0.5, 0.0)
+        reward += np.where(velocity > 290, 1 / self.skipp_frames, 0)
+        reward += np.where(velocity > 230, 0.7 / self.skipp_frames, 0)
+        reward += np.where(velocity > 180, 0.3 / self.skipp_frames, np.where(velocity > 90, 0.1 / self.skipp_frames, np.where(np.abs(velocity) < 10, -0.1 / self.skipp_frames, 0)))
+        return np.where(lost, -350, reward), lost
+
+    def __step_forward(self, actions, active, launched_net):
+        needs_first_net = np.nonzero(~self.first_net_shot)[0]
+        if len(needs_first_net) != 0:
+            self.first_net_shot[needs_first_net] = self.__eject_nets(needs_first_net, np.full(len(needs_first_net), self.ray_sensor.ray_index_from_angle(math.radians(270))))
+
+        self.start_scroll |= actions != 0
+        self.__release_nets(np.nonzero(actions == 1)[0])
+        can_shoot = (actions >= 2) & (self.web_active.sum(axis=1) < self.MAX_WEBS) & (self.web_shooter_current_ammo >= 1)
+        shooters = np.nonzero(can_shoot)[0]
+        if len(shooters) != 0:
+            launched_net[shooters] = True
+            self.web_shooter_current_ammo[shooters] -= 1
+            angles = np.radians((360 // self.rope_actions) * (actions[shooters] - 2))
+            self.__eject_nets(shooters, [self.ray_sensor.ray_index_from_angle(angle) for angle in angles])
+
+        self.__scroll()
+        self.__step_obstacles(active)
+        self.__step_nets()
+        self.score = np.where(active, np.maximum(self.score, (self.position[:, 0] / 100).astype(np.int64)), self.score)
+        self.web_shooter_current_ammo = np.round(np.minimum(self.web_shooter_current_ammo + self.web_shooter_reload_speed_multiplier * self.environment_update_intervall, self.web_shooter_max_ammo), 3)
+        self.__physics_step()
+        reward, lost = self.get_reward_and_done(launched_net)
+        launched_net &= lost
+        return reward, lost
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64).reshape(self.n_envs)
+        launched_net = np.zeros(self.n_envs, dtype=bool)
+        active = np.ones(self.n_envs, dtype=bool)
+        total_reward = np.zeros(self.n_envs)
+
+        # Skipp frames to speed up learning, finished games are frozen until the reset below
+        for _ in range(self.skipp_frames):
+            reward, lost = self.__step_forward(actions, active, launched_net)
+            actions = np.zeros(self.n_envs, dtype=np.int64)
+            total_reward += np.where(active, reward, 0)
+            active &= ~lost
+
+        self.current_timestep += 1
+        dones = ~active | (self.current_timestep > self.max_steps)
+        self.high_score = max(self.high_score, int(self.score.max()))
+        self.rewards += total_reward
+
+        totalReward = []
+        total_score = []
+        for i in np.nonzero(dones)[0]:
+            total_score.append(int(self.score[i]))
+            totalReward.append(self.rewards[i])
+            self.__reset_env(i)
+        infos = {
+            'totalReward' : totalReward,
+            'total_score' : total_score,
+        }
+        return self.get_observation(), total_reward, dones, infos
+
+    def get_observation(self):
+        max_speed = self.max_speed * 1.3
+        speed = np.hypot(self.velocity[:, 0], self.velocity[:, 1])
+        observation = np.empty((self.n_envs, self.observation_size), dtype=np.float32)
+        observation[:, 0] = self.web_shooter_current_ammo / self.web_shooter_max_ammo
+        observation[:, 1] = self.velocity[:, 0] / max_speed
+        observation[:, 2] = self.velocity[:, 1] / max_speed
+        observation[:, 3] = speed / max_speed
+        observation[:, 4] = (self.position[:, 0] - self.offset) / self.camera_const_x
+        observation[:, 5] = self.position[:, 1] / self.game_size[1]
+
+        delta = self.position[:, None, :] - self.web_anchor
+        angle = np.arctan2(delta[..., 1], delta[..., 0])
+        connection_points = np.stack([(np.sin(angle) + 1) / 2, (np.cos(angle) + 1) / 2, np.hypot(delta[..., 0], delta[..., 1]) / self.max_web_range], axis=2)
+        connection_points = np.where(self.web_active[..., None], connection_points, -1)
+
+        distances, _ = self.ray_sensor.cast(self.position, *self.__get_obstacles())
+        rays = np.where(np.isfinite(distances), np.round(distances, 3) / self.max_web_range, 1)
+        observation[:, 6:] = np.round(np.concatenate([connection_points.reshape(self.n_envs, -1), rays], axis=1), 3)
+        return observation
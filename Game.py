@@ -1,6 +1,8 @@
 import time
 import traceback
 
+import numpy as np
+
 from Utils.Enums.Agents import Agents
 from Utils.Trainer import Trainer
 
@@ -24,6 +26,9 @@ def train_agents(trainer, max_episodes_or_timesteps, train):
             loss = trainer.end_of_episode_update()
             trainer.push_end_of_episode_info(episode_or_timestep, loss, reward, time_step, done, info)
             trainer.print()
+        trainer.env.close()
+    elif trainer.async_batch_size is not None:
+        train_agents_async(trainer, max_episodes_or_timesteps)
     else:
         obs = trainer.reset()
         for episode_or_timestep in range(max_episodes_or_timesteps):
@@ -37,12 +42,37 @@ def train_agents(trainer, max_episodes_or_timesteps, train):
             obs = new_obs
             trainer.push_step_info(episode_or_timestep, loss, reward, episode_or_timestep, env_done, info)
             trainer.print()
-        trainer.env.shutDownMultiprocessing()
+        trainer.env.close()
 
     if train:
         trainer.save_model()
 
 
+def train_agents_async(trainer, max_timesteps):
+    ''' Every timestep acts on the envs that finished their step first, the transition of an env is its
+    observation when its action was sent and the observation its step returned '''
+    obs = trainer.reset()
+    env_ids = np.arange(obs.shape[0])
+    sent_obs = np.zeros_like(obs)
+    sent_actions = np.zeros(obs.shape[0], dtype=np.int64)
+    for timestep in range(max_timesteps):
+        actions, _ = trainer.get_actions(obs, timestep, env_ids)
+        sent_obs[env_ids] = obs
+        sent_actions[env_ids] = actions
+        trainer.step_async(actions, env_ids)
+        new_obs, reward, env_done, info, env_ids = trainer.step_wait()
+        if trainer.RESTART_TEXT in info:
+            obs = info[trainer.RESTART_OBSERVATION]
+            env_ids = np.arange(obs.shape[0])
+            continue
+        trainer.store_transition(sent_obs[env_ids], new_obs, sent_actions[env_ids], reward, env_done, env_ids)
+        loss = trainer.step_update()
+        obs = new_obs
+        trainer.push_step_info(timestep, loss, reward, timestep, env_done, info)
+        trainer.print()
+    trainer.env.close()
+
+
 def start_game(agent_type, parallel_training, max_episodes_or_timesteps, train, render=False, catch_error_mode=True, model=None, save_name=None):
     render = True if not train else render
     parallel_training = False if render else parallel_training
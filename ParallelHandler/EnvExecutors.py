@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+''' How a SerialEnvironment steps its envs: one after another, on a thread pool (pymunk releases the GIL in its C
+calls) or each env in a process of its own '''
+
+class EnvExecutors(Enum):
+    Serial = "Serial"
+    Thread = "Thread"
+    Process = "Process"
@@ -1,9 +1,12 @@
 import multiprocessing as mp
+from multiprocessing.connection import wait
 import random
-import gym
 import numpy as np
 
+from ParallelHandler.EnvExecutors import EnvExecutors
 from ParallelHandler.SerialEnvironment import SerialEnvironment
+from ParallelHandler.StepBuffers import StepBuffers
+from ParallelHandler.WorkerPool import WorkerPool
 
 
 
@@ -11,51 +14,110 @@ class ParallelEnvironments(object):
 
     RESTART_STRING = "restart"
     BASE_SEED = 123
+    # Actions and step results go through shared StepBuffers and the pipes only carry a buffer index, see
+    # Benchmarks/SharedMemoryTransportBenchmark.py
+    USE_SHARED_MEMORY = True
+    # Take warm workers from the WorkerPool shared by all instances and give them back on close, instead of spawning
+    # new interpreters. set_mp_context is ignored then, the pool uses a forkserver context of its own
+    USE_WORKER_POOL = True
 
-    def __init__(self, environment_class, processes, envs_per_process, set_mp_context=True):
+    def __init__(self, environment_class, processes, envs_per_process, set_mp_context=True, shared_space=False, executor=EnvExecutors.Serial):
         self.parent_pipes = []
         self.processes = []
         self.env_name = environment_class
         self.num_processes = processes
         self.envs_per_process = envs_per_process
-        if set_mp_context:
-            mp.set_start_method('spawn')
-        for i in range(self.num_processes):
-            parent_pipe, child_pipe = mp.Pipe()
-            process = mp.Process(target=ParallelEnvironments.worker_proc, args=(environment_class, child_pipe, i, envs_per_process))
-            self.parent_pipes.append(parent_pipe)
-            self.processes.append(process)
+        self.pool = WorkerPool.get_shared_pool() if self.USE_WORKER_POOL else None
+        if self.pool is not None:
+            self.observation_space, self.action_space, observation_dtype = self.pool.get_spaces(environment_class)
+        else:
+            if set_mp_context:
+                mp.set_start_method('spawn')
+            temp_env = environment_class()
+            self.observation_space, self.action_space, observation_dtype = temp_env.observation_space, temp_env.action_space, temp_env.observation_dtype
+        self.buffers = None
+        if self.USE_SHARED_MEMORY:
+            self.buffers = StepBuffers(processes * envs_per_process, self.observation_space, observation_dtype, shared=True)
+        worker_args = [(environment_class, i, envs_per_process, shared_space, executor, self.buffers) for i in range(processes)]
+        if self.pool is not None:
+            self.workers = self.pool.acquire(processes)
+            self.pool.run(self.workers, ParallelEnvironments.pool_worker_proc, worker_args)
+            self.processes = [process for process, _ in self.workers]
+            self.parent_pipes = [pipe for _, pipe in self.workers]
+        else:
+            for environment_class, i, *args in worker_args:
+                parent_pipe, child_pipe = mp.Pipe()
+                process = mp.Process(target=ParallelEnvironments.worker_proc, args=(environment_class, child_pipe, i, *args))
+                self.parent_pipes.append(parent_pipe)
+                self.processes.append(process)
 
-        for p in self.processes:
-            p.start()
+            for p in self.processes:
+                p.start()
 
-        temp_env = environment_class()
-        self.action_space = temp_env.action_space
-        self.observation_space = temp_env.observation_space
         self.limit_actions = np.array([False] * processes * envs_per_process) 
+        # Workers started by step_async whose results were not taken by step_wait yet
+        self.stepping_workers = []
+
+    @staticmethod
+    def pool_worker_proc(pipe, environment, worker_id, num_envs, shared_space, executor, buffers):
+        return ParallelEnvironments.worker_proc(environment, pipe, worker_id, num_envs, shared_space, executor, buffers)
 
     @staticmethod
-    def worker_proc(environment, pipe, worker_id, num_envs):
-        env = SerialEnvironment(environment, num_envs)
+    def worker_proc(environment, pipe, worker_id, num_envs, shared_space=False, executor=EnvExecutors.Serial, buffers=None):
+        first_row = worker_id * num_envs if buffers is not None else 0
+        env = SerialEnvironment(environment, num_envs, shared_space, executor, buffers, first_row)
         np.random.seed(ParallelEnvironments.BASE_SEED + worker_id)
         random.seed(ParallelEnvironments.BASE_SEED + worker_id)
+        ParallelEnvironments.__prepare_resets(env)
         while True:
             cmd, actions = pipe.recv()
             if cmd == "step":
                 try:
-                    response = env.step(actions)
-                    pipe.send((response))
+                    if buffers is not None:
+                        env.step(buffers.actions[first_row:first_row + num_envs])
+                        pipe.send(env.buffer_index)
+                    else:
+                        response = env.step(actions)
+                        pipe.send((response))
                 except:
-                    pipe.send((-1, -1, -1, {ParallelEnvironments.RESTART_STRING : True}))
+                    if buffers is not None:
+                        pipe.send(ParallelEnvironments.RESTART_STRING)
+                    else:
+                        pipe.send((-1, -1, -1, {ParallelEnvironments.RESTART_STRING : True}))
+                # The learner is busy with the batch now, build the worlds for the next resets meanwhile
+                ParallelEnvironments.__prepare_resets(env)
             elif cmd == "reset":
-                pipe.send((env.reset()))
+                obs = env.reset()
+                pipe.send(env.buffer_index if buffers is not None else obs)
+                ParallelEnvironments.__prepare_resets(env)
+            elif cmd == "release":
+                # Back to the WorkerPool, the shared buffers of the next envs are mapped anew
+                env.close()
+                del env
+                if buffers is not None:
+                    buffers.close()
+                pipe.send(WorkerPool.RELEASED)
+                return
             elif cmd == "quit":
                 # print("Worker quitting.")
-                break
+                env.close()
+                return "quit"
             else:
                 raise ValueError("Unrecognized command:", cmd)
 
+    @staticmethod
+    def __prepare_resets(env):
+        # Every command got its one reply already, a failed standby world is only reported and reset builds it then
+        try:
+            env.prepare_resets()
+        except Exception as error:
+            print("Error while preparing the next resets:", error)
+
     def step(self, actions):
+        if len(self.stepping_workers) != 0:
+            raise Exception("Collect the pending step_async results with step_wait first")
+        if self.buffers is not None:
+            return self.__step_shared_memory(actions)
         totalReward = []
         idx, inc = 0, self.envs_per_process
         actions = np.array(actions)
@@ -92,11 +154,122 @@ class ParallelEnvironments(object):
         # self.limit_actions = np.array(limit_actions)
         return obs, rewards, dones, infos
 
+    def __step_shared_memory(self, actions):
+        ''' The returned arrays are views of the shared buffers, valid until the step after the next one '''
+        self.buffers.actions[:] = actions
+        for pipe in self.parent_pipes:
+            pipe.send(("step", None))
+        indexes = self.__receive_buffer_indexes()
+        dones = self.__read_buffer(self.buffers.dones, indexes)
+        infos = {
+            'totalReward' : self.__read_buffer(self.buffers.episode_rewards, indexes)[dones].tolist(),
+            'total_score' : self.__read_buffer(self.buffers.episode_scores, indexes)[dones].tolist(),
+        }
+        return self.__read_buffer(self.buffers.observations, indexes), self.__read_buffer(self.buffers.rewards, indexes), dones, infos
+
+    def __receive_buffer_indexes(self):
+        ''' The buffer every worker wrote, each worker swaps its own buffers with every step and reset '''
+        indexes = [pipe.recv() for pipe in self.parent_pipes]
+        if self.RESTART_STRING in indexes:
+            raise Exception("Multiprocess step failed")
+        return np.array(indexes)
+
+    def __read_buffer(self, buffer, indexes):
+        ''' The rows the workers wrote, a view when they all wrote the same buffer. Partial step_wait batches leave
+        the workers on different buffers, their rows are gathered into a copy then '''
+        if (indexes == indexes[0]).all():
+            return buffer[indexes[0]]
+        rows = np.repeat(indexes, self.envs_per_process)
+        return buffer[rows, np.arange(len(rows))]
+
+    def step_async(self, actions, env_ids=None):
+        ''' Starts the step of the envs env_ids, all by default, and returns without waiting for it. The envs of a
+        worker step together, so env_ids have to be whole workers like the ones step_wait returns '''
+        workers = self.__get_workers(env_ids)
+        actions = np.asarray(actions).reshape(len(workers), self.envs_per_process)
+        for worker, worker_actions in zip(workers, actions):
+            if worker in self.stepping_workers:
+                raise Exception(f"Worker {worker} is still stepping")
+            if self.buffers is not None:
+                self.buffers.actions[self.__get_rows(worker)] = worker_actions
+                self.parent_pipes[worker].send(("step", None))
+            else:
+                self.parent_pipes[worker].send(("step", worker_actions))
+            self.stepping_workers.append(worker)
+
+    def step_wait(self, batch_size=None):
+        ''' Waits until batch_size envs, all stepping ones by default, finished their step and returns their
+        obs, rewards, dones, infos and env ids. The other envs keep stepping and are returned by later calls, so
+        a slow worker does not stall the batch. batch_size has to be a multiple of envs_per_process '''
+        if batch_size is None:
+            batch_size = len(self.stepping_workers) * self.envs_per_process
+        if batch_size <= 0 or batch_size % self.envs_per_process != 0 or batch_size // self.envs_per_process > len(self.stepping_workers):
+            raise Exception(f"Can not wait for {batch_size} envs, {len(self.stepping_workers)} workers of {self.envs_per_process} envs are stepping")
+        responses = {}
+        while len(responses) < batch_size // self.envs_per_process:
+            ready_pipes = wait([self.parent_pipes[worker] for worker in self.stepping_workers])
+            for pipe in ready_pipes[:batch_size // self.envs_per_process - len(responses)]:
+                worker = self.parent_pipes.index(pipe)
+                responses[worker] = pipe.recv()
+                self.stepping_workers.remove(worker)
+
+        obs, rewards, dones = [], [], []
+        totalReward, total_score = [], []
+        for worker in sorted(responses):
+            if self.buffers is not None:
+                ob, reward, done, info = self.__read_worker_buffers(worker, responses[worker])
+            else:
+                ob, reward, done, info = responses[worker]
+            if self.RESTART_STRING in info:
+                raise Exception("Multiprocess step failed")
+            obs.append(ob)
+            rewards.append(reward)
+            dones.append(done)
+            totalReward.extend(info['totalReward'])
+            total_score.extend(info['total_score'])
+        infos = {
+            'totalReward' : totalReward,
+            'total_score' : total_score,
+        }
+        env_ids = self.__get_env_ids(sorted(responses))
+        return np.concatenate(obs, axis=0), np.concatenate(rewards, axis=0), np.concatenate(dones, axis=0), infos, env_ids
+
+    def __read_worker_buffers(self, worker, index):
+        if index == self.RESTART_STRING:
+            return None, None, None, {self.RESTART_STRING : True}
+        rows = self.__get_rows(worker)
+        dones = self.buffers.dones[index, rows]
+        infos = {
+            'totalReward' : self.buffers.episode_rewards[index, rows][dones].tolist(),
+            'total_score' : self.buffers.episode_scores[index, rows][dones].tolist(),
+        }
+        return self.buffers.observations[index, rows], self.buffers.rewards[index, rows], dones, infos
+
+    def __get_rows(self, worker):
+        return slice(worker * self.envs_per_process, (worker + 1) * self.envs_per_process)
+
+    def __get_env_ids(self, workers):
+        return np.concatenate([np.arange(self.envs_per_process) + worker * self.envs_per_process for worker in workers])
+
+    def __get_workers(self, env_ids):
+        if env_ids is None:
+            return list(range(self.num_processes))
+        env_ids = np.asarray(env_ids)
+        workers = env_ids[::self.envs_per_process] // self.envs_per_process
+        whole_workers = self.__get_env_ids(workers)
+        if len(env_ids) != len(whole_workers) or np.any(env_ids != whole_workers):
+            raise Exception("env_ids have to cover whole workers")
+        return workers.tolist()
+
     def reset(self):
+        if len(self.stepping_workers) != 0:
+            raise Exception("Collect the pending step_async results with step_wait first")
         # Send reset commands
         for i in range(self.num_processes):
             self.parent_pipes[i].send(("reset", 0))
 
+        if self.buffers is not None:
+            return self.__read_buffer(self.buffers.observations, self.__receive_buffer_indexes())
         # Read states
         obs = []
         for i in range(self.num_processes):
@@ -110,3 +283,12 @@ class ParallelEnvironments(object):
                 self.parent_pipes[i].send(("quit", 0))
             except:
                 pass
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self.workers)
+            self.stepping_workers = []
+        else:
+            self.shutDownMultiprocessing()
+        if self.buffers is not None:
+            self.buffers.unlink()
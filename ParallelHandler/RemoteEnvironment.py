@@ -0,0 +1,106 @@
+import multiprocessing as mp
+import random
+import traceback
+
+import numpy as np
+
+
+''' One env running in a process of its own behind the methods SerialEnvironment uses. A step is sent with send_step
+and collected with receive_step so the steps of several remote envs overlap. The process builds the standby world of
+the next reset after every reply, so prepare_reset does nothing here. The process seeds random and np.random with the
+seed it is given, so remote envs started from one parent do not play the same worlds. An error in the process is sent
+back with the reply and raised by the call waiting for it. '''
+
+class RemoteEnvironment:
+
+    def __init__(self, environment_class, seed=None):
+        self.pipe, child_pipe = mp.Pipe()
+        self.process = mp.Process(target=RemoteEnvironment.worker_proc, args=(environment_class, child_pipe, seed),
+            daemon=True)
+        self.process.start()
+        self.observation_space, self.action_space, self.observation_dtype = self.__call("get_spaces")
+
+    @staticmethod
+    def worker_proc(environment_class, pipe, seed=None):
+        # A forked process starts with the random state of its parent
+        random.seed(seed)
+        np.random.seed(None if seed is None else seed % 2**32)
+        env = None
+        while True:
+            cmd, args = pipe.recv()
+            if cmd == "quit":
+                break
+            # Replies are (error, response), the error is the traceback of a failed command or None
+            try:
+                if env is None:
+                    env = environment_class()
+                if cmd == "step":
+                    observation, reward, done, info = env.step(*args)
+                    response = (observation[0], reward, done, info)
+                elif cmd == "reset":
+                    response = env.reset()[0]
+                elif cmd == "get_state":
+                    response = env.get_state()
+                elif cmd == "set_state":
+                    response = env.set_state(*args)[0]
+                elif cmd == "get_spaces":
+                    response = (env.observation_space, env.action_space, env.observation_dtype)
+                else:
+                    raise ValueError("Unrecognized command:", cmd)
+                reply = (None, response)
+            except Exception:
+                reply = (traceback.format_exc(), None)
+            pipe.send(reply)
+            # Every command gets one reply, a failed standby world is only reported and reset builds it then
+            try:
+                if env is not None:
+                    env.prepare_reset()
+            except Exception as error:
+                print("Error while preparing the next reset:", error)
+
+    def __call(self, cmd, *args):
+        self.pipe.send((cmd, args))
+        return self.__receive()
+
+    def __receive(self):
+        error, response = self.pipe.recv()
+        if error is not None:
+            raise Exception(f"Remote env failed:\n{error}")
+        return response
+
+    def send_step(self, action):
+        self.pipe.send(("step", (action,)))
+
+    def receive_step(self, out=None):
+        observation, reward, done, info = self.__receive()
+        if out is not None:
+            out[:] = observation
+        return observation, reward, done, info
+
+    def step(self, action, out=None):
+        self.send_step(action)
+        return self.receive_step(out)
+
+    def reset(self, out=None):
+        observation = self.__call("reset")
+        if out is not None:
+            out[:] = observation
+        return observation
+
+    def get_state(self):
+        return self.__call("get_state")
+
+    def set_state(self, state, out=None):
+        observation = self.__call("set_state", state)
+        if out is not None:
+            out[:] = observation
+        return observation
+
+    def prepare_reset(self):
+        pass
+
+    def close(self):
+        try:
+            self.pipe.send(("quit", None))
+        except:
+            pass
@@ -1,61 +1,180 @@
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from Environment.SharedSpace import SharedSpace
+from ParallelHandler.EnvExecutors import EnvExecutors
+from ParallelHandler.RemoteEnvironment import RemoteEnvironment
+from ParallelHandler.StepBuffers import StepBuffers
 
 
 
 
 class SerialEnvironment(object):
-    def __init__(self, environment_class, n_envs):
+    def __init__(self, environment_class, n_envs, shared_space=False, executor=EnvExecutors.Serial, buffers=None, first_row=0):
         self.envs = []
         self.n_envs = n_envs
+        self.executor = executor
+        if shared_space and executor != EnvExecutors.Serial:
+            raise Exception("envs in a shared space can only be stepped serially")
+        # All envs in one pymunk space, stepped frame by frame together with one space step per frame
+        self.shared_space = SharedSpace() if shared_space else None
         for i in range(n_envs):
-            env = environment_class()
+            if executor == EnvExecutors.Process:
+                # Drawn from the random of this process, which ParallelEnvironments seeds per worker
+                env = RemoteEnvironment(environment_class, random.getrandbits(64))
+            else:
+                env = environment_class(shared_space=self.shared_space) if shared_space else environment_class()
             self.envs.append(env)
+        self.thread_pool = ThreadPoolExecutor(n_envs) if executor == EnvExecutors.Thread else None
         self.rewards = np.zeros(n_envs)
+        # Every env writes its observation straight into its row. Two buffers are swapped each call so the
+        # observation returned by the previous step stays valid while the caller stores the transition. The rows
+        # from first_row on of shared StepBuffers are used when given
+        if buffers is None:
+            buffers = StepBuffers(n_envs, self.envs[0].observation_space, self.envs[0].observation_dtype)
+        rows = slice(first_row, first_row + n_envs)
+        self.observation_buffers = buffers.observations[:, rows]
+        self.reward_buffers = buffers.rewards[:, rows]
+        self.done_buffers = buffers.dones[:, rows]
+        self.episode_reward_buffers = buffers.episode_rewards[:, rows]
+        self.episode_score_buffers = buffers.episode_scores[:, rows]
+        self.buffer_index = 0
+        # Last observation of the envs that finished in the latest step, before they were reset
+        self.final_observations = np.zeros((n_envs, self.envs[0].observation_space), dtype=self.envs[0].observation_dtype)
 
     def step(self, actions):
-        obs = []
-        rewards = []
-        dones = []
+        self.buffer_index = 1 - self.buffer_index
+        obs = self.observation_buffers[self.buffer_index]
+        rewards = self.reward_buffers[self.buffer_index]
+        dones = self.done_buffers[self.buffer_index]
+        episode_rewards = self.episode_reward_buffers[self.buffer_index]
+        episode_scores = self.episode_score_buffers[self.buffer_index]
         infos = {}
         totalReward = []
         total_score = []
         # limit_actions = [False] * self.n_envs
-        for i in range(self.n_envs):
-            try:
-                ob, reward, done, info = self.envs[i].step(actions[i])
-            except:
-                print("Error while stepping env. Resetting.")
-                reward, done = 0, True
-                info = { 'score' : 0 }
+        if self.shared_space is not None:
+            results = self.__step_shared(actions, obs)
+        elif self.executor == EnvExecutors.Thread:
+            results = list(self.thread_pool.map(self.__step_env, range(self.n_envs), actions, obs))
+        elif self.executor == EnvExecutors.Process:
+            results = self.__step_remote(actions, obs)
+        else:
+            results = (self.__step_env(i, actions[i], obs[i]) for i in range(self.n_envs))
+        for i, (reward, done, info) in enumerate(results):
             self.rewards[i] += reward
             if done:
+                self.final_observations[i] = obs[i]
                 total_score.append(info['score'])
                 try:
-                    ob = self.envs[i].reset()
+                    self.envs[i].reset(obs[i])
                 except:
                     print("Error while resetting env. Trying again")
-                    ob = self.envs[i].reset()
+                    self.envs[i].reset(obs[i])
                 totalReward.append(self.rewards[i])
+                episode_rewards[i] = self.rewards[i]
+                episode_scores[i] = info['score']
                 self.rewards[i] = 0
             # limit_actions[i] = self.envs[i].limit_actions
-            obs.append(ob.reshape(1,-1))
-            rewards.append(reward)
-            dones.append(done)
+            rewards[i] = reward
+            dones[i] = done
         
         infos = {
             'totalReward' : totalReward,
             'total_score' : total_score,
             # 'limit_actions' : limit_actions
         }
-        obs = np.concatenate(obs, axis=0)
-        rewards = np.stack(rewards)
         return obs, rewards, dones, infos
 
+    def __step_env(self, i, action, out):
+        try:
+            _, reward, done, info = self.envs[i].step(action, out)
+        except:
+            print("Error while stepping env. Resetting.")
+            reward, done = 0, True
+            info = { 'score' : 0 }
+        return reward, done, info
+
+    def __step_remote(self, actions, obs):
+        for env, action in zip(self.envs, actions):
+            env.send_step(action)
+        return [self.__receive_remote(env, out) for env, out in zip(self.envs, obs)]
+
+    def __receive_remote(self, env, out):
+        try:
+            _, reward, done, info = env.receive_step(out)
+        except:
+            print("Error while stepping env. Resetting.")
+            reward, done = 0, True
+            info = { 'score' : 0 }
+        return reward, done, info
+
+    def __step_shared(self, actions, obs):
+        frames, dt = self.envs[0].skipp_frames, self.envs[0].environment_update_intervall
+        total_rewards = [0] * self.n_envs
+        dones = [False] * self.n_envs
+        # The shared space keeps moving the players of finished envs, their state at the end is put back
+        finished_bodies = {}
+        for env in self.envs:
+            env.begin_step()
+        running = list(range(self.n_envs))
+        for frame in range(frames):
+            for i in running:
+                self.envs[i].prepare_frame(actions[i] if frame == 0 else 0)
+            self.shared_space.step(dt)
+            still_running = []
+            for i in running:
+                reward, done = self.envs[i].finish_frame()
+                total_rewards[i] += reward
+                if done:
+                    dones[i] = True
+                    body = self.envs[i].player.get_body()
+                    finished_bodies[i] = (body, body.position, body.velocity, body.angle, body.angular_velocity)
+                else:
+                    still_running.append(i)
+            running = still_running
+            if len(running) == 0:
+                break
+        for i, (body, position, velocity, angle, angular_velocity) in finished_bodies.items():
+            body.position, body.velocity = position, velocity
+            body.angle, body.angular_velocity = angle, angular_velocity
+            self.envs[i].player.ray_queries.clear()
+        return [self.envs[i].end_step(total_rewards[i], dones[i], obs[i])[1:] for i in range(self.n_envs)]
+
+    def get_states(self):
+        return [env.get_state() for env in self.envs]
+
+    def set_states(self, states, env_ids=None):
+        ''' Restores one snapshot per env, a single snapshot is cloned into every env so rollouts can fan out from it.
+        Episode rewards of the restored envs start from zero, the other envs keep their current observation '''
+        env_ids = range(self.n_envs) if env_ids is None else env_ids
+        if isinstance(states, dict):
+            states = [states] * len(env_ids)
+        current_obs = self.observation_buffers[self.buffer_index]
+        self.buffer_index = 1 - self.buffer_index
+        obs = self.observation_buffers[self.buffer_index]
+        obs[:] = current_obs
+        for i, state in zip(env_ids, states):
+            self.envs[i].set_state(state, obs[i])
+            self.rewards[i] = 0
+        return obs
+
+    def prepare_resets(self):
+        ''' Refills the standby worlds of the envs that were reset, call it while waiting for the next actions '''
+        for env in self.envs:
+            env.prepare_reset()
+
     def reset(self):
-        obs = []
-        for e in self.envs:
-            obs.append(e.reset().reshape(1,-1))
-        obs = np.concatenate(obs, axis=0)
-        return obs
\ No newline at end of file
+        self.buffer_index = 1 - self.buffer_index
+        obs = self.observation_buffers[self.buffer_index]
+        for i, e in enumerate(self.envs):
+            e.reset(obs[i])
+        return obs
+
+    def close(self):
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown()
+        if self.executor == EnvExecutors.Process:
+            for env in self.envs:
+                env.close()
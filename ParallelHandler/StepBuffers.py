@@ -0,0 +1,68 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+
+''' The rows SerialEnvironment writes its step results into: observations, rewards, dones and the reward and score of
+the episodes that just finished, each twice so the results of the previous call stay valid, and the actions of the
+next step. With shared=True they live in one multiprocessing.shared_memory block, the ParallelEnvironments workers
+read their actions from it and write their rows, and the learner reads all of them without pickling or copying.
+Pickled shared buffers only carry the name of the block. '''
+
+class StepBuffers:
+
+    ALIGNMENT = 64
+
+    def __init__(self, n_envs, observation_size, observation_dtype=np.float32, shared=False):
+        self.layout = (n_envs, observation_size, np.dtype(observation_dtype).str)
+        self.memory = shared_memory.SharedMemory(create=True, size=self.__get_size()) if shared else None
+        self.__create_arrays()
+
+    def __get_fields(self):
+        n_envs, observation_size, observation_dtype = self.layout
+        return (
+            ("observations", (2, n_envs, observation_size), np.dtype(observation_dtype)),
+            ("rewards", (2, n_envs), np.dtype(np.float32)),
+            ("dones", (2, n_envs), np.dtype(bool)),
+            ("episode_rewards", (2, n_envs), np.dtype(np.float32)),
+            ("episode_scores", (2, n_envs), np.dtype(np.float32)),
+            ("actions", (n_envs,), np.dtype(np.int64)),
+        )
+
+    def __get_field_size(self, shape, dtype):
+        size = int(np.prod(shape)) * dtype.itemsize
+        return -(-size // self.ALIGNMENT) * self.ALIGNMENT
+
+    def __get_size(self):
+        return sum(self.__get_field_size(shape, dtype) for _, shape, dtype in self.__get_fields())
+
+    def __create_arrays(self):
+        offset = 0
+        for name, shape, dtype in self.__get_fields():
+            if self.memory is None:
+                array = np.zeros(shape, dtype=dtype)
+            else:
+                array = np.ndarray(shape, dtype=dtype, buffer=self.memory.buf, offset=offset)
+            offset += self.__get_field_size(shape, dtype)
+            setattr(self, name, array)
+
+    def __getstate__(self):
+        if self.memory is None:
+            return self.__dict__
+        return {"layout" : self.layout, "memory" : self.memory}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.memory is not None:
+            self.__create_arrays()
+
+    def close(self):
+        ''' Unmaps the shared block in this process, the arrays can not be used afterwards '''
+        if self.memory is not None:
+            for name, _, _ in self.__get_fields():
+                delattr(self, name)
+            self.memory.close()
+
+    def unlink(self):
+        ''' Frees the shared block once every process let go of it, called by the process that created it '''
+        if self.memory is not None:
+            self.memory.unlink()
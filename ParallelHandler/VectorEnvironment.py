@@ -0,0 +1,46 @@
+import random
+import gym
+import numpy as np
+
+from ParallelHandler.EnvExecutors import EnvExecutors
+from ParallelHandler.SerialEnvironment import SerialEnvironment
+
+
+''' Gym style vector env that steps all envs in this process with a SerialEnvironment, for batched inference
+without worker processes. step keeps the (obs, rewards, dones, infos) form of ParallelEnvironments, finished envs
+are reset inside step and their last observation is in infos['final_observation'] where infos['_final_observation']
+is True. The returned arrays are preallocated and reused every other step. '''
+
+class VectorEnvironment(object):
+
+    def __init__(self, environment_class, n_envs, shared_space=False, executor=EnvExecutors.Serial):
+        self.env = SerialEnvironment(environment_class, n_envs, shared_space, executor)
+        self.num_envs = n_envs
+        observation_size = self.env.envs[0].observation_space
+        observation_dtype = self.env.envs[0].observation_dtype
+        # Pixel observations are uint8 frames
+        low, high = (0, 255) if observation_dtype == np.uint8 else (-np.inf, np.inf)
+        self.single_observation_space = gym.spaces.Box(low, high, (observation_size,), dtype=observation_dtype)
+        self.single_action_space = gym.spaces.Discrete(self.env.envs[0].action_space)
+        self.observation_space = gym.spaces.Box(low, high, (n_envs, observation_size), dtype=observation_dtype)
+        self.action_space = gym.spaces.MultiDiscrete(np.full(n_envs, self.single_action_space.n))
+        self.final_observation_mask = np.zeros(n_envs, dtype=bool)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+        self.final_observation_mask[:] = False
+        return self.env.reset()
+
+    def step(self, actions):
+        obs, rewards, dones, infos = self.env.step(actions)
+        np.copyto(self.final_observation_mask, dones)
+        infos['final_observation'] = self.env.final_observations
+        infos['_final_observation'] = self.final_observation_mask
+        return obs, rewards, dones, infos
+
+    def close(self):
+        if self.env is not None:
+            self.env.close()
+        self.env = None
@@ -0,0 +1,136 @@
+import atexit
+import multiprocessing as mp
+import pickle
+
+
+''' Worker processes kept alive between ParallelEnvironments instances. They are forked from a forkserver that
+imported the main module and the env modules once, so starting one takes milliseconds instead of the second of a
+spawned interpreter, where there is no forkserver, on Windows, they are spawned instead. A worker runs the targets it
+is sent one after another, and goes back to the pool when the ParallelEnvironments using it is closed, so a new or
+restarted Trainer gets warm workers without starting any process.
+The observation size, action count and observation dtype of every environment class are asked from a worker once and
+cached, the parent never builds an env. '''
+
+class WorkerPool:
+
+    START_METHOD = "forkserver"
+    PRELOAD_MODULES = ["__main__", "Environment.SpidermanEnv", "ParallelHandler.ParallelEnvironments"]
+    RELEASED = "released"
+    RELEASE_TIMEOUT = 5 # Seconds a worker gets to finish its step and close its envs before it is killed
+    QUIT_TIMEOUT = 1
+
+    shared_pool = None
+
+    def __init__(self):
+        start_method = self.START_METHOD if self.START_METHOD in mp.get_all_start_methods() else "spawn"
+        self.context = mp.get_context(start_method)
+        if start_method == "forkserver":
+            self.context.set_forkserver_preload(self.PRELOAD_MODULES)
+        self.workers = []
+        self.idle_workers = []
+        self.spaces = {}
+        atexit.register(self.close)
+
+    @classmethod
+    def get_shared_pool(cls):
+        ''' The pool of this process, created on first use '''
+        if cls.shared_pool is None:
+            cls.shared_pool = WorkerPool()
+        return cls.shared_pool
+
+    @staticmethod
+    def worker_proc(pipe):
+        while True:
+            cmd, args = pipe.recv()
+            if cmd == "run":
+                target, target_args = args
+                # A target returns when it is done or released, and with "quit" when the worker was stopped
+                if target(pipe, *target_args) == "quit":
+                    break
+            elif cmd == "quit":
+                break
+            else:
+                raise ValueError("Unrecognized command:", cmd)
+
+    @staticmethod
+    def get_spaces_proc(pipe, environment_class):
+        env = environment_class()
+        pipe.send((env.observation_space, env.action_space, env.observation_dtype))
+        env.close()
+
+    def __start_worker(self):
+        parent_pipe, child_pipe = self.context.Pipe()
+        process = self.context.Process(target=WorkerPool.worker_proc, args=(child_pipe,))
+        process.start()
+        child_pipe.close()
+        self.workers.append((process, parent_pipe))
+        return process, parent_pipe
+
+    def prefork(self, n_workers):
+        ''' Starts workers until n_workers are idle '''
+        self.workers = [(process, pipe) for process, pipe in self.workers if process.is_alive()]
+        self.idle_workers = [(process, pipe) for process, pipe in self.idle_workers if process.is_alive()]
+        while len(self.idle_workers) < n_workers:
+            self.idle_workers.append(self.__start_worker())
+
+    def acquire(self, n_workers):
+        ''' n_workers idle (process, pipe) pairs, started when the pool has too few '''
+        self.prefork(n_workers)
+        workers, self.idle_workers = self.idle_workers[:n_workers], self.idle_workers[n_workers:]
+        return workers
+
+    def run(self, workers, target, args_per_worker):
+        ''' Calls target(pipe, *args) in every worker, the target talks to the caller through the pipe until the
+        worker is released '''
+        for (_, pipe), args in zip(workers, args_per_worker):
+            pipe.send(("run", (target, args)))
+
+    def release(self, workers):
+        ''' Stops the targets of the workers and takes them back. Replies of steps still running are dropped, and
+        workers that do not stop in time are killed and replaced by the next acquire '''
+        for _, pipe in workers:
+            try:
+                pipe.send(("release", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process, pipe in workers:
+            if self.__wait_for_release(pipe):
+                self.idle_workers.append((process, pipe))
+            else:
+                process.kill()
+                process.join()
+                self.workers.remove((process, pipe))
+
+    def __wait_for_release(self, pipe):
+        try:
+            while pipe.poll(self.RELEASE_TIMEOUT):
+                if pipe.recv() == self.RELEASED:
+                    return True
+        except (EOFError, OSError):
+            pass
+        return False
+
+    def get_spaces(self, environment_class):
+        ''' (observation size, action count, observation dtype) of the envs environment_class creates '''
+        # Envs configured with functools.partial pickle to the same bytes when they have the same arguments
+        key = pickle.dumps(environment_class)
+        if key not in self.spaces:
+            workers = self.acquire(1)
+            self.run(workers, WorkerPool.get_spaces_proc, [(environment_class,)])
+            self.spaces[key] = workers[0][1].recv()
+            self.idle_workers.extend(workers)
+        return self.spaces[key]
+
+    def close(self):
+        ''' Stops every worker, busy ones included '''
+        for process, pipe in self.workers:
+            try:
+                pipe.send(("quit", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process, _ in self.workers:
+            process.join(self.QUIT_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+        self.workers = []
+        self.idle_workers = []
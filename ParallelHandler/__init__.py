@@ -1,2 +1,3 @@
+from ParallelHandler.EnvExecutors import EnvExecutors
 from ParallelHandler.ParallelEnvironments import ParallelEnvironments
 from ParallelHandler.SerialEnvironment import SerialEnvironment
\ No newline at end of file
@@ -2,11 +2,13 @@
 
 
 
-import time
-import gym
+from functools import partial
 import numpy as np
-from Agents.QAgents.StateAgents.StateAgent import StateAgent
+from Agents.ScriptedPolicy import ScriptedPolicy
 from Environment.SpidermanEnv import SpidermanEnv
+from Environment.Utils.ObservationModes import ObservationModes
+from Environment.Utils.RenderModes import RenderModes
+from ParallelHandler.EnvExecutors import EnvExecutors
 from ParallelHandler.ParallelEnvironments import ParallelEnvironments
 from Utils.Enums import Agents
 from Utils.Enums.ExplorationTypes import ExplorationTypes
@@ -22,17 +24,43 @@ class Trainer:
     def __init__(self, agent_type, paralell_training, max_episodes_or_timesteps, train, render=False, print_rate=5, model=None, save_name=None, fail_safe=False):
         self.processes = 8
         self.envs_per_process = 4
+        self.in_process_envs = False # Step the processes*envs_per_process envs in this process instead of worker processes
+        self.shared_space = False # The envs of a worker in one pymunk space, at most 16, see Benchmarks/SharedSpaceBenchmark.py
+        self.env_executor = EnvExecutors.Serial # How each worker steps its envs, see Benchmarks/EnvExecutorBenchmark.py
+        # Act on the first this many envs that finished their step while the others keep stepping, a multiple of
+        # envs_per_process. None waits for all envs, see Benchmarks/AsyncStepBenchmark.py
+        self.async_batch_size = None
+        self.level_tape = None # Path of a LevelTape file to play pre generated levels
+        self.physics_profile = None # Name of one of SpidermanEnv.PHYSICS_PROFILES, None keeps SpidermanEnv.PHYSICS_PROFILE
+        self.render_mode = RenderModes.Human # RenderModes.RgbArray renders offscreen at simulation speed, for machines without a display
+        self.video_path = None # Records the rendered episodes to this file, see Environment/Rendering/VideoWriter.py
+        self.observation_mode = ObservationModes.Features # ObservationModes.Pixels gives stacked frames for convolutional policies
+        self.environment_class = partial(SpidermanEnv, level_tape=self.level_tape, physics_profile=self.physics_profile, render_mode=self.render_mode, observation_mode=self.observation_mode)
+        # ScriptedPolicy actions instead of random ones until the agent starts training, and the share of actions it
+        # takes over afterwards. See Benchmarks/ScriptedPrefillBenchmark.py
+        self.scripted_prefill = False
+        self.scripted_action_ratio = 0
+        self.scripted_policy = None
+        if self.scripted_prefill or self.scripted_action_ratio > 0:
+            if self.observation_mode != ObservationModes.Features:
+                raise Exception("the scripted policy reads feature observations")
+            self.scripted_policy = ScriptedPolicy()
         self.paralell_training = paralell_training
+        if self.async_batch_size is not None and (not paralell_training or self.in_process_envs):
+            raise Exception("async stepping needs the worker processes of ParallelEnvironments")
         if paralell_training:
             self.agent_action_batch = self.processes*self.envs_per_process
-            self.env = ParallelEnvironments(SpidermanEnv, self.processes, self.envs_per_process)
+            self.env = self.__create_parallel_environments()
             print_rate = 1000
             mean_print_values = print_rate
         else:
             self.agent_action_batch = 1
-            self.env = SpidermanEnv(not train, render)
+            self.env = self.__create_environment(train, render)
             mean_print_values = 10
-        env_sizes = (self.env.observation_space, self.env.action_space)
+        if paralell_training and self.in_process_envs:
+            env_sizes = (self.env.single_observation_space.shape[0], self.env.single_action_space.n)
+        else:
+            env_sizes = (self.env.observation_space, self.env.action_space)
         self.__create_agent(agent_type, env_sizes, train, save_name, self.agent_action_batch)
         self.train = train
         self.render = render
@@ -45,8 +73,22 @@ class Trainer:
         self.training_progress_handler = TrainingProgressHandler(True, paralell_training, print_rate=print_rate, mean_episodes=mean_print_values)
 
 
+    def __create_parallel_environments(self, set_mp_context=True):
+        if self.in_process_envs:
+            from ParallelHandler.VectorEnvironment import VectorEnvironment
+            return VectorEnvironment(self.environment_class, self.processes*self.envs_per_process, self.shared_space, self.env_executor)
+        return ParallelEnvironments(self.environment_class, self.processes, self.envs_per_process, set_mp_context, self.shared_space, self.env_executor)
+
+    def __create_environment(self, train, render):
+        env = self.environment_class(not train, render)
+        if render and self.video_path is not None:
+            env.start_recording(self.video_path)
+        return env
+
     def __create_agent(self, agent_type, env_sizes, train, save_name, agent_action_batch_size):
+        # torch is only loaded here, the spawned workers re-import the main module and need none of it
         if agent_type == Agents.StateAgent:
+            from Agents.QAgents.StateAgents.StateAgent import StateAgent
             self.agent = StateAgent(env_sizes[0], env_sizes[1], not train, save_name, agent_action_batch_size=agent_action_batch_size)
         else:
             raise("not implemented")
@@ -54,16 +96,15 @@ class Trainer:
     def restart_environment(self):
         self.agent.reset(True)
         if self.paralell_training:
+            # The workers go back to the WorkerPool, or are killed there when they hang, and are reused right away
             try:
-                self.env.shutDownMultiprocessing()
+                self.env.close()
             except:
                 pass
-            time.sleep(3)
-            self.env = None
-            time.sleep(1)
-            self.env = ParallelEnvironments(SpidermanEnv, self.processes, self.envs_per_process, False)
+            self.env = self.__create_parallel_environments(False)
         else:
-            self.env = SpidermanEnv(not self.train, self.render)
+            self.env.close()
+            self.env = self.__create_environment(self.train, self.render)
         return self.env.reset()
 
     def reset(self):
@@ -71,16 +112,30 @@ class Trainer:
             self.agent.reset()
         return self.env.reset().reshape(self.agent_action_batch, -1)
 
-    def get_actions(self, obs, episode_or_timestep):
+    def get_actions(self, obs, episode_or_timestep, env_ids=None):
         self.last_episode_or_timestep = episode_or_timestep
         second_action_value = None
-        epsilon = self.exploration.get_exploration(episode_or_timestep)
-        actions = self.agent.get_action(obs, epsilon)
+        prefill = self.scripted_prefill and self.agent.is_collecting_before_training()
+        # Only random actions are replaced while prefilling, an epsilon of 1 skips the network
+        epsilon = 1 if prefill else self.exploration.get_exploration(episode_or_timestep)
+        if env_ids is None:
+            actions = self.agent.get_action(obs, epsilon)
+        else:
+            actions = self.agent.get_action(obs, epsilon, env_ids=env_ids)
         if isinstance(actions, tuple):
             second_action_value = actions[1]
             actions = actions[0]
+        if self.scripted_policy is not None:
+            actions = self.__mix_scripted_actions(obs, actions, 1 if prefill else self.scripted_action_ratio)
         return actions, second_action_value
 
+    def __mix_scripted_actions(self, obs, actions, ratio):
+        if ratio == 0:
+            return actions
+        scripted_actions = self.scripted_policy.get_actions(obs)
+        use_scripted = np.random.random(len(scripted_actions)) < ratio
+        return np.where(use_scripted, scripted_actions, actions).tolist()
+
     def step(self, actions):
         if isinstance(actions, tuple):
             actions = actions[0]
@@ -101,6 +156,26 @@ class Trainer:
             observations, rewards, done, info = self.env.step(actions)
         return observations, rewards, done, info
 
+    def step_async(self, actions, env_ids):
+        if isinstance(actions, tuple):
+            actions = actions[0]
+        self.env.step_async(actions, env_ids)
+
+    def step_wait(self):
+        ''' Results of the first async_batch_size envs that finished their step and their env ids '''
+        if self.fail_safe:
+            try:
+                return self.env.step_wait(self.async_batch_size)
+            except Exception as e:
+                print("Error occured, restarting environments")
+                obs = self.restart_environment()
+                info = {
+                    'obs' : obs,
+                    'restart' : True
+                }
+                return -1, -1, -1, info, None
+        return self.env.step_wait(self.async_batch_size)
+
 
     ''' Agent handlers '''
     def store_transition(self, *args):